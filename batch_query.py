@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Script to answer a file of queries in one batch, e.g. for offline evaluation.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from src.config import BACKEND_OLLAMA, BACKEND_OPENAI, DEFAULT_BACKEND, validate_config
+from src.rag_service import RagService
+
+
+def read_queries(path: str) -> list:
+    """
+    Read queries from a file
+
+    Args:
+        path: File with one query per line, or JSON lines with a "query" field
+            ("-" for stdin)
+
+    Returns:
+        List of query strings
+    """
+    f = sys.stdin if path == "-" else open(path)
+    try:
+        queries = []
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line)["query"]
+            queries.append(line)
+        return queries
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def result_record(index: int, result: dict) -> dict:
+    """
+    Convert a batch result into a JSON-serializable record
+
+    Args:
+        index: Position of the query in the input
+        result: Result from RagService.batch_query
+
+    Returns:
+        Record with the query, response, sources and error
+    """
+    return {
+        "index": index,
+        "query": result["query"],
+        "response": result["response"],
+        "sources": [
+            {
+                "source": doc.metadata.get("source"),
+                "date": doc.metadata.get("date"),
+                "topic": doc.metadata.get("topic"),
+            }
+            for doc in result["source_documents"]
+        ],
+        "error": result["error"],
+    }
+
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Answer a file of queries in one batch")
+    parser.add_argument(
+        "queries",
+        type=str,
+        help="File with one query per line, or JSON lines with a \"query\" field (- for stdin)",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        default="-",
+        help="JSON lines file to write the results to (default: stdout)",
+    )
+    parser.add_argument(
+        "--backend",
+        "-b",
+        type=str,
+        choices=(BACKEND_OPENAI, BACKEND_OLLAMA),
+        default=DEFAULT_BACKEND,
+        help=f"Backend to answer with (default: {DEFAULT_BACKEND})",
+    )
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        type=int,
+        help="Maximum number of concurrent LLM calls (default: the backend's concurrency limit)",
+    )
+    parser.add_argument(
+        "--where",
+        type=str,
+        help="Metadata filter as JSON, e.g. '{\"year\": 2024}'",
+    )
+    args = parser.parse_args()
+
+    # Validate configuration
+    is_valid, error = validate_config(args.backend)
+    if not is_valid:
+        print(f"Error: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    queries = read_queries(args.queries)
+    where = json.loads(args.where) if args.where else None
+
+    service = RagService(auto_index=False)
+    try:
+        service.get_backend(args.backend)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        print("Vector store not found. Please run test_rag.py first.", file=sys.stderr)
+        sys.exit(1)
+
+    # Write each result as soon as it is ready, so partial runs are not lost
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+
+    def write_result(index: int, result: dict) -> None:
+        output.write(json.dumps(result_record(index, result)) + "\n")
+        output.flush()
+
+    start = time.perf_counter()
+    try:
+        results = service.batch_query(
+            queries,
+            backend=args.backend,
+            where=where,
+            max_concurrency=args.concurrency,
+            on_result=write_result,
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    failed = sum(1 for result in results if result is None or result["error"] is not None)
+    print(
+        f"Answered {len(queries) - failed}/{len(queries)} queries in {elapsed:.1f}s "
+        f"({len(queries) / elapsed if elapsed else 0:.1f} queries/s)",
+        file=sys.stderr,
+    )
+    sys.exit(1 if failed else 0)
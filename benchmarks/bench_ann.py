@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark IVF search of the NumPy vector store against exact search.
+
+Fills a NumpyVectorStore with synthetic clustered embeddings (no embedding
+model or text processing involved, so a million rows take a few minutes),
+trains the IVF index, then reports per-query latency and recall@k at
+several nprobe values next to exact search.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ann --rows 1000000 --dimensions 384
+    python -m benchmarks.bench_ann --rows 200000 --dtype int8 --nprobe 1,4,16,64
+"""
+
+import argparse
+import sys
+import tempfile
+
+import numpy as np
+
+from benchmarks.metrics import Timer, summarize_latencies
+from src.numpy_store import NumpyVectorStore
+
+
+def synthetic_vectors(rng, centers, count, noise):
+    labels = rng.integers(0, len(centers), count)
+    return (centers[labels] + rng.normal(scale=noise, size=(count, centers.shape[1]))).astype(np.float32)
+
+
+def timed_searches(store, queries, k, nprobe):
+    results = []
+    latencies = []
+    with Timer() as total:
+        for query in queries:
+            with Timer() as timer:
+                results.append({chunk_id for chunk_id, _, _ in store.search_with_ids(query, k, nprobe=nprobe)})
+            latencies.append(timer.elapsed)
+    return results, summarize_latencies(latencies, total.elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000, help="Stored embeddings")
+    parser.add_argument("--dimensions", type=int, default=384, help="Embedding size")
+    parser.add_argument("--clusters", type=int, default=1000, help="Topics the embeddings are drawn around")
+    parser.add_argument("--noise", type=float, default=0.8, help="Spread of the embeddings around their topic")
+    parser.add_argument("--dtype", choices=("float32", "float16", "int8"), default="float32", help="Stored vector type")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0 for the square root of the rows)")
+    parser.add_argument("--nprobe", default="1,4,8,16,32", help="Comma-separated nprobe values")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per setting")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(size=(args.clusters, args.dimensions))
+    queries = synthetic_vectors(rng, centers, args.queries, args.noise)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        store = NumpyVectorStore(workdir, dtype=args.dtype, nlist=args.nlist)
+        batch = 50000
+        with Timer() as timer:
+            for start in range(0, args.rows, batch):
+                count = min(batch, args.rows - start)
+                store.add_vectors(
+                    [f"chunk-{i}" for i in range(start, start + count)],
+                    synthetic_vectors(rng, centers, count, args.noise),
+                    [""] * count,
+                    [{}] * count,
+                )
+            store.persist()
+        print(f"Stored {args.rows} x {args.dimensions} {args.dtype} vectors in {timer.elapsed:.1f}s")
+
+        with Timer() as timer:
+            store.build_ann_index()
+        print(f"Trained the IVF index in {timer.elapsed:.1f}s")
+
+        exact, summary = timed_searches(store, queries, args.k, nprobe=0)
+        print(f"exact        p50 {summary['p50_ms']:8.2f} ms  p95 {summary['p95_ms']:8.2f} ms")
+        for nprobe in (int(value) for value in args.nprobe.split(",")):
+            approximate, summary = timed_searches(store, queries, args.k, nprobe)
+            recall = np.mean([len(found & expected) / len(expected) for found, expected in zip(approximate, exact)])
+            print(f"nprobe {nprobe:<5} p50 {summary['p50_ms']:8.2f} ms  p95 {summary['p95_ms']:8.2f} ms  "
+                  f"recall@{args.k} {recall:.3f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Load test the async query path against stub OpenAI and Ollama backends.
+
+Indexes the meeting summaries with the stub's embeddings, then answers the
+same number of distinct queries with RagService.aquery at increasing
+concurrency levels and reports throughput and latency percentiles. With
+enough headroom in the backend's concurrency limit, throughput should grow
+with concurrency; past OLLAMA_MAX_CONCURRENCY the Ollama backend levels off
+by design.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_async_queries
+    python -m benchmarks.bench_async_queries --backends ollama --ollama-max-concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.metrics import percentile
+from benchmarks.stub_server import StubBackendServer
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def configure_environment(server, workdir, args):
+    # src.config reads the environment at import time, so this runs before importing src
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = server.openai_base_url
+    os.environ["OLLAMA_BASE_URL"] = server.ollama_base_url
+    os.environ["CHROMA_PERSIST_DIRECTORY"] = str(workdir / "chroma")
+    os.environ["DOCUMENT_STORE_DIRECTORY"] = str(REPO_ROOT / "meetings")
+    os.environ["EMBEDDING_CACHE_PATH"] = str(workdir / "embedding_cache.sqlite")
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"
+    if args.ollama_max_concurrency is not None:
+        os.environ["OLLAMA_MAX_CONCURRENCY"] = str(args.ollama_max_concurrency)
+    if args.openai_max_concurrency is not None:
+        os.environ["OPENAI_MAX_CONCURRENCY"] = str(args.openai_max_concurrency)
+
+
+async def run_level(service, backend, concurrency, num_queries, offset):
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with gate:
+            start = time.perf_counter()
+            await service.aquery(f"What was decided about item {offset + i}?", backend)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(num_queries)))
+    elapsed = time.perf_counter() - start
+    return num_queries / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", default="openai,ollama", help="Comma-separated backends to test")
+    parser.add_argument("--queries", type=int, default=64, help="Queries per concurrency level")
+    parser.add_argument("--levels", default="1,4,16,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--latency", type=float, default=0.01, help="Stub latency per request (s)")
+    parser.add_argument("--generation-latency", type=float, default=0.2, help="Stub completion latency (s)")
+    parser.add_argument("--ollama-max-concurrency", type=int, help="Override OLLAMA_MAX_CONCURRENCY")
+    parser.add_argument("--openai-max-concurrency", type=int, help="Override OPENAI_MAX_CONCURRENCY")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    ok = True
+
+    with StubBackendServer(latency=args.latency, generation_latency=args.generation_latency) as server, \
+            tempfile.TemporaryDirectory() as workdir:
+        configure_environment(server, Path(workdir), args)
+
+        from src.rag_service import RagService
+
+        service = RagService()
+        offset = 0
+        for backend in args.backends.split(","):
+            print(f"{backend} (limit {service.get_concurrency_limit(backend).limit}):")
+            throughputs = []
+            for concurrency in levels:
+                server.max_generation_concurrency = 0
+                try:
+                    service.get_backend(backend)
+                    throughput, latencies = asyncio.run(
+                        run_level(service, backend, concurrency, args.queries, offset)
+                    )
+                except Exception as e:
+                    print(f"  failed: {e}")
+                    ok = False
+                    break
+                offset += args.queries
+                throughputs.append(throughput)
+                print(
+                    f"  concurrency {concurrency:>3}: {throughput:7.1f} queries/s  "
+                    f"p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+                    f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms  "
+                    f"backend max in flight {server.max_generation_concurrency}"
+                )
+
+            if len(throughputs) == len(levels):
+                print(f"  speedup at concurrency {levels[-1]}: {throughputs[-1] / throughputs[0]:.1f}x")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Check the embedding scheduler against the stub OpenAI and Ollama endpoints.
+
+Embeds the same texts with the plain LangChain clients and with an
+EmbeddingScheduler while the stub injects latency and rate-limit errors,
+verifies that both produce identical vectors, and reports throughput.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_embedding_scheduler
+"""
+
+import argparse
+import sys
+import time
+
+from langchain_community.embeddings import OllamaEmbeddings
+from langchain_openai import OpenAIEmbeddings
+
+from benchmarks.stub_server import StubBackendServer
+from src.vector_store import EmbeddingScheduler
+
+
+def run(texts, embeddings, label):
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<10} {len(texts) / elapsed:8.1f} texts/s  ({elapsed:.2f}s)")
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--texts", type=int, default=200, help="Number of texts to embed")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub latency per request (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Fraction of 429 responses")
+    parser.add_argument("--batch-size", type=int, default=16, help="Scheduler batch size (OpenAI)")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="Scheduler concurrency")
+    args = parser.parse_args()
+
+    texts = [f"Meeting note {i}: discussed item {i % 17} with owner {i % 5}" for i in range(args.texts)]
+    ok = True
+
+    # Plain clients run without failures; the scheduled runs must match them despite 429s
+    with StubBackendServer(latency=args.latency) as clean, \
+            StubBackendServer(latency=args.latency, failure_rate=args.failure_rate) as flaky:
+        for backend in ("ollama", "openai"):
+            print(f"{backend}:")
+            if backend == "ollama":
+                # Mirrors get_embedding_model: one text per scheduled request
+                batch_size = 1
+                plain = OllamaEmbeddings(model="stub", base_url=clean.ollama_base_url)
+                inner = OllamaEmbeddings(model="stub", base_url=flaky.ollama_base_url)
+            else:
+                # Send raw text so the check does not need tiktoken's encoding files
+                batch_size = args.batch_size
+                plain = OpenAIEmbeddings(
+                    model="text-embedding-3-small", openai_api_key="stub",
+                    openai_api_base=clean.openai_base_url, chunk_size=batch_size,
+                    check_embedding_ctx_length=False,
+                )
+                inner = OpenAIEmbeddings(
+                    model="text-embedding-3-small", openai_api_key="stub",
+                    openai_api_base=flaky.openai_base_url, max_retries=0, chunk_size=batch_size,
+                    check_embedding_ctx_length=False,
+                )
+
+            scheduler = EmbeddingScheduler(
+                inner,
+                batch_size=batch_size,
+                max_in_flight=args.max_in_flight,
+                tokens_per_minute=0,
+                max_retries=10,
+                retry_backoff=0.01,
+            )
+
+            expected = run(texts, plain, "plain")
+            actual = run(texts, scheduler, "scheduled")
+            print(f"  requests={scheduler.requests} retries={scheduler.retries} "
+                  f"stub max concurrency={flaky.max_concurrency}")
+
+            if actual != expected:
+                print("  MISMATCH: scheduled vectors differ from plain vectors")
+                ok = False
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Check the cold import time of the query entry points against a budget.
+
+Imports each module of the query path in fresh interpreters, reports the
+median import time, and fails if one exceeds its budget or loads a module
+that only indexing or an unselected backend needs. Use it in CI or before
+a release to catch startup regressions of query.py.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import_time
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Module imported by each stage of query.py, and its share of the budget
+STAGES = (
+    ("query", 0.1),
+    ("src.query_router", 0.8),
+    ("src.rag_service", 1.0),
+)
+
+# Modules loaded only when indexing or when a backend is selected
+DEFERRED_MODULES = (
+    "chromadb",
+    "langchain_community.document_loaders",
+    "langchain_community.embeddings",
+    "langchain_community.vectorstores",
+    "langchain_ollama",
+    "langchain_openai",
+    "langchain_text_splitters",
+    "src.watcher",
+)
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, runs):
+    seconds = []
+    loaded = []
+    code = PROBE.format(module=module, deferred=DEFERRED_MODULES)
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        seconds.append(result["seconds"])
+        loaded = result["loaded"]
+    return statistics.median(seconds), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument(
+        "--budget", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET", "1.2")),
+        help="Budget in seconds for the slowest stage; the others get their share (default: 1.2)",
+    )
+    args = parser.parse_args()
+
+    ok = True
+    for module, share in STAGES:
+        seconds, loaded = measure(module, args.runs)
+        budget = args.budget * share
+        status = "ok" if seconds <= budget else "OVER BUDGET"
+        print(f"  {module:<18} {seconds * 1000:7.1f} ms  (budget {budget * 1000:.0f} ms)  {status}")
+        if loaded:
+            print(f"    loads deferred modules: {', '.join(loaded)}")
+        ok = ok and seconds <= budget and not loaded
+
+    print("ok" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
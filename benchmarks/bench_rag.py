@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmarks of ingestion, re-indexing, retrieval and full queries.
+
+Generates a synthetic meeting corpus, then runs the real indexing and query
+code with deterministic fake embeddings and LLM (benchmarks/fakes.py), so
+no OpenAI key or Ollama server is needed and results are comparable across
+commits. Reports throughput, p50/p95/p99 latency and peak RSS per
+benchmark and the on-disk size of the index after ingestion, and writes
+them as JSON with --output; pass a previous results file with --baseline
+to print the change of each metric. With --trace, the per-stage breakdown
+from src.tracing is reported as well. The cold_start benchmark opens the
+index and answers one retrieval in a fresh process, and reports that
+process's RSS. With --vector-store numpy, the ann benchmark reports the
+latency and recall@k of IVF searches at several nprobe values against exact
+search. The batch benchmark answers all queries with RagService.batch_query
+and splits its time between batched retrieval and concurrent generation.
+The filtered benchmark retrieves with a filter on the last year of meetings;
+with --shard-by it only searches that year's shards. --embeddings hashing
+replaces the fake embeddings with the in-process HashingEmbeddings model.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_rag --files 1000 --output results.json
+    python -m benchmarks.bench_rag --files 1000 --baseline results.json
+    python -m benchmarks.bench_rag --files 1000 --vector-store numpy --baseline results.json
+    python -m benchmarks.bench_rag --files 10000 --shard-by month --baseline results.json
+    python -m benchmarks.bench_rag --files 1000 --embeddings hashing --baseline results.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.corpus import generate_corpus, generate_queries, modify_corpus
+from benchmarks.fakes import FakeEmbeddings, FakeLLM
+from benchmarks.metrics import PeakRssSampler, Timer, directory_size_mb, summarize_latencies
+
+
+BENCHMARKS = ("ingest", "reindex", "cold_start", "retrieval", "filtered", "query", "batch", "ann")
+
+# Metrics where a lower value is better, used to flag regressions against a baseline
+LOWER_IS_BETTER = (
+    "elapsed_s", "p50_ms", "p95_ms", "p99_ms", "max_ms", "peak_rss_mb",
+    "import_s", "open_ms", "first_query_ms", "rss_mb", "index_mb", "retrieve_s", "generate_s",
+    "prompt_tokens_avg",
+)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Opens the index and runs one query in a fresh process, so nothing is cached in memory
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from benchmarks.fakes import FakeEmbeddings
+from benchmarks.metrics import current_rss_mb
+from src.vector_store import get_vector_store
+imported = time.perf_counter()
+vector_store = get_vector_store(sys.argv[3], FakeEmbeddings(dimensions=int(sys.argv[1])))
+opened = time.perf_counter()
+vector_store.similarity_search(sys.argv[2], k=4)
+searched = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "open_ms": (opened - imported) * 1000,
+    "first_query_ms": (searched - opened) * 1000,
+    "rss_mb": current_rss_mb(),
+}))
+"""
+
+
+def configure_environment(workdir, args):
+    # src.config reads the environment at import time, so this runs before importing src
+    os.environ["VECTOR_STORE_BACKEND"] = args.vector_store
+    os.environ["NUMPY_STORE_DTYPE"] = args.numpy_dtype
+    os.environ["SHARD_BY"] = args.shard_by
+    os.environ["CHROMA_PERSIST_DIRECTORY"] = str(workdir / "index")
+    os.environ["DOCUMENT_STORE_DIRECTORY"] = str(workdir / "corpus")
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure_cold_start(args, query, index_dir):
+    output = subprocess.run(
+        [sys.executable, "-c", COLD_START_SCRIPT, str(args.dimensions), query, str(index_dir)],
+        capture_output=True, text=True, check=True, cwd=REPO_ROOT,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def recall_at_k(approximate, exact):
+    # Fraction of the exact top-k results the approximate search found, averaged over queries
+    return sum(
+        len({chunk_id for chunk_id, _, _ in found} & {chunk_id for chunk_id, _, _ in expected}) / max(len(expected), 1)
+        for found, expected in zip(approximate, exact)
+    ) / max(len(exact), 1)
+
+
+def benchmark_ann(args, vector_store, query_embeddings):
+    # The corpus is usually below ANN_MIN_ROWS, so the IVF index is built explicitly
+    if not vector_store.has_ann_index:
+        with Timer() as timer:
+            vector_store.build_ann_index()
+        print(f"Built the IVF index in {timer.elapsed:.1f}s")
+
+    results = {}
+    exact = []
+    results["ann_exact"] = time_operations(
+        lambda embedding=embedding: exact.append(vector_store.search_with_ids(embedding, args.ann_k, nprobe=0))
+        for embedding in query_embeddings
+    )
+    for nprobe in (int(value) for value in args.nprobe.split(",")):
+        approximate = []
+        summary = time_operations(
+            lambda embedding=embedding: approximate.append(
+                vector_store.search_with_ids(embedding, args.ann_k, nprobe=nprobe)
+            )
+            for embedding in query_embeddings
+        )
+        results[f"ann_nprobe_{nprobe}"] = {**summary, f"recall_at_{args.ann_k}": recall_at_k(approximate, exact)}
+    return results
+
+
+def time_operations(operations):
+    latencies = []
+    with Timer() as total:
+        for operation in operations:
+            with Timer() as timer:
+                operation()
+            latencies.append(timer.elapsed)
+    return summarize_latencies(latencies, total.elapsed)
+
+
+def run_benchmarks(args, workdir):
+    from src.config import RETRIEVAL_MODE
+    from src.index_manifest import get_index_directory
+    from src.rag_service import RagService
+    from src.tracing import collect_timings, configure_tracing, get_metrics_registry
+    from src.vector_store import filtered_search_by_vector, get_vector_store, sync_vector_store
+
+    if args.trace:
+        configure_tracing(enabled=True, trace_file=args.trace_file or "")
+
+    corpus_dir = workdir / "corpus"
+    if args.embeddings == "hashing":
+        from src.hashing_embeddings import HashingEmbeddings
+
+        embeddings = HashingEmbeddings(dimensions=args.dimensions)
+    else:
+        embeddings = FakeEmbeddings(
+            dimensions=args.dimensions,
+            latency=args.embedding_latency,
+            latency_per_text=args.embedding_latency_per_text,
+        )
+    # The service looks for the index of the embedding model under CHROMA_PERSIST_DIRECTORY
+    index_dir = get_index_directory(workdir / "index", embeddings.model_name)
+    llm = FakeLLM(latency=args.llm_latency, token_latency=args.llm_token_latency)
+    queries = generate_queries(args.queries, seed=args.seed)
+    selected = args.benchmarks.split(",")
+    results = {}
+
+    with Timer() as timer:
+        paths = generate_corpus(corpus_dir, args.files, seed=args.seed)
+    print(f"Generated {len(paths)} files in {timer.elapsed:.1f}s")
+
+    def sync():
+        return sync_vector_store(
+            directory=corpus_dir, persist_directory=index_dir, embedding_model=embeddings
+        )[1]
+
+    # Ingestion is needed by every other benchmark, so it always runs
+    with PeakRssSampler() as rss, Timer() as timer:
+        stats = sync()
+    if "ingest" in selected:
+        results["ingest"] = {
+            "files": stats["added"],
+            "chunks": stats["chunks"],
+            "elapsed_s": timer.elapsed,
+            "files_per_s": stats["added"] / timer.elapsed,
+            "chunks_per_s": stats["chunks"] / timer.elapsed,
+            "embedding_calls": getattr(embeddings, "calls", 0),
+            "index_mb": directory_size_mb(index_dir),
+            "peak_rss_mb": rss.peak_mb,
+        }
+
+    if "reindex" in selected:
+        with PeakRssSampler() as rss, Timer() as timer:
+            stats = sync()
+        results["reindex_unchanged"] = {
+            "files": stats["unchanged"],
+            "elapsed_s": timer.elapsed,
+            "files_per_s": stats["unchanged"] / timer.elapsed,
+            "peak_rss_mb": rss.peak_mb,
+        }
+
+        modified = modify_corpus(paths, args.modified_fraction, seed=args.seed)
+        with PeakRssSampler() as rss, Timer() as timer:
+            stats = sync()
+        results["reindex_modified"] = {
+            "files": len(modified),
+            "updated": stats["updated"],
+            "chunks": stats["chunks"],
+            "elapsed_s": timer.elapsed,
+            "files_per_s": stats["updated"] / timer.elapsed,
+            "peak_rss_mb": rss.peak_mb,
+        }
+
+    if "cold_start" in selected:
+        results["cold_start"] = measure_cold_start(args, queries[0], index_dir)
+
+    service = RagService(
+        persist_directory=workdir / "index",
+        auto_index=False,
+        embedding_factory=lambda backend: embeddings,
+        llm_factory=lambda backend: llm,
+    )
+    resources = service.get_backend(args.backend)
+
+    if "retrieval" in selected:
+        with PeakRssSampler() as rss:
+            summary = time_operations(
+                lambda query=query: resources.retriever.invoke(query) for query in queries
+            )
+        results["retrieval"] = {**summary, "peak_rss_mb": rss.peak_mb}
+
+    if "filtered" in selected:
+        # The corpus spans 2020-2024 (see generate_corpus)
+        vector_store = get_vector_store(index_dir, embeddings)
+        where = {"year": 2024}
+        with PeakRssSampler() as rss:
+            summary = time_operations(
+                lambda query=query: filtered_search_by_vector(
+                    vector_store, embeddings.embed_query(query), where, 4, index_dir
+                )
+                for query in queries
+            )
+        results["filtered"] = {**summary, "peak_rss_mb": rss.peak_mb}
+
+    if "query" in selected:
+        with PeakRssSampler() as rss:
+            summary = time_operations(
+                lambda query=query: service.query(query, args.backend) for query in queries
+            )
+        results["query"] = {**summary, "peak_rss_mb": rss.peak_mb}
+
+    if "batch" in selected:
+        with PeakRssSampler() as rss, collect_timings() as timings, Timer() as timer:
+            batch_results = service.batch_query(queries, args.backend, max_concurrency=args.batch_concurrency)
+        results["batch"] = {
+            "queries": len(queries),
+            "errors": sum(1 for result in batch_results if result["error"] is not None),
+            "elapsed_s": timer.elapsed,
+            "queries_per_s": len(queries) / timer.elapsed,
+            "retrieve_s": timings.get("retrieve", 0.0),
+            "generate_s": timings.get("generate", 0.0),
+            "prompt_tokens_avg": timings.get("prompt_tokens", 0) / len(set(queries)),
+            "peak_rss_mb": rss.peak_mb,
+        }
+
+    if "ann" in selected and args.vector_store == "numpy" and args.shard_by == "none":
+        query_embeddings = embeddings.embed_documents(queries)
+        results.update(benchmark_ann(args, get_vector_store(index_dir, embeddings), query_embeddings))
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "retrieval_mode": RETRIEVAL_MODE,
+            "vector_store": args.vector_store,
+            "shard_by": args.shard_by,
+            "embeddings": args.embeddings,
+            "args": vars(args),
+        },
+        "results": results,
+        "stages": get_metrics_registry().snapshot() if args.trace else {},
+    }
+
+
+def print_results(report, baseline=None):
+    baseline_results = (baseline or {}).get("results", {})
+    for name, metrics in report["results"].items():
+        print(f"{name}:")
+        for metric, value in metrics.items():
+            line = f"  {metric:<18} {value:12.2f}" if isinstance(value, float) else f"  {metric:<18} {value:>12}"
+            previous = baseline_results.get(name, {}).get(metric)
+            if isinstance(value, float) and isinstance(previous, (int, float)) and previous:
+                change = (value - previous) / previous * 100
+                worse = change > 0 if metric in LOWER_IS_BETTER else change < 0
+                line += f"  {change:+7.1f}%{'  (worse)' if worse and abs(change) >= 10 else ''}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=1000, help="Corpus size (100 to 100k files)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries for the retrieval and query benchmarks")
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS), help="Comma-separated benchmarks to run")
+    parser.add_argument("--backend", default="openai", help="Backend name the fakes stand in for")
+    parser.add_argument("--vector-store", choices=("chroma", "numpy"), default="chroma", help="Vector store backend")
+    parser.add_argument("--numpy-dtype", choices=("float32", "float16", "int8"), default="float32", help="NumPy store vector type")
+    parser.add_argument("--shard-by", choices=("none", "year", "month"), default="none", help="Shard the vector store by meeting date")
+    parser.add_argument("--nprobe", default="1,4,8,16", help="Comma-separated IVF nprobe values for the ann benchmark")
+    parser.add_argument("--ann-k", type=int, default=10, help="Results per query for recall@k in the ann benchmark")
+    parser.add_argument("--batch-concurrency", type=int, help="Concurrent LLM calls in the batch benchmark (default: the backend's limit)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the corpus and queries")
+    parser.add_argument("--embeddings", choices=("fake", "hashing"), default="fake", help="Embedding model")
+    parser.add_argument("--dimensions", type=int, default=256, help="Embedding size")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Fake embedding latency per call (s)")
+    parser.add_argument("--embedding-latency-per-text", type=float, default=0.0, help="Fake embedding latency per text (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Fake LLM latency before the first token (s)")
+    parser.add_argument("--llm-token-latency", type=float, default=0.0, help="Fake LLM latency per token (s)")
+    parser.add_argument("--modified-fraction", type=float, default=0.05, help="Fraction of files changed before re-indexing")
+    parser.add_argument("--trace", action="store_true", help="Enable tracing and report per-stage times")
+    parser.add_argument("--trace-file", type=str, help="With --trace, also write spans to this JSONL file")
+    parser.add_argument("--workdir", type=str, help="Directory for the corpus and index (default: a temporary directory)")
+    parser.add_argument("--output", "-o", type=str, help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", type=str, help="Previous JSON results to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = Path(args.workdir or tmpdir)
+        workdir.mkdir(parents=True, exist_ok=True)
+        configure_environment(workdir, args)
+        report = run_benchmarks(args, workdir)
+
+    print_results(report, baseline)
+    if report["stages"]:
+        print("stages:")
+        for stage, summary in sorted(report["stages"].items(), key=lambda item: -item[1].get("total_s", 0)):
+            print(f"  {stage:<20} {summary.get('count', 0):8g} calls  {summary.get('total_s', 0):9.3f}s total  "
+                  f"{summary.get('mean_ms', 0):9.3f} ms mean")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
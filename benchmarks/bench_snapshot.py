@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark index snapshots and check that rebuilds never expose a partial index.
+
+Indexes a synthetic corpus with fake embeddings, then reports the time to
+export the index to a snapshot file, to open the snapshot (which maps it
+without reading it), to verify its checksums and to import it into a new
+store, next to the time the initial ingestion took. Finally it rebuilds the
+index in the background while a reader thread keeps opening it and
+searching, and fails if any of those searches errors or comes back empty.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_snapshot --files 1000
+    python -m benchmarks.bench_snapshot --files 1000 --vector-store numpy
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from benchmarks.corpus import generate_corpus, generate_queries
+from benchmarks.fakes import FakeEmbeddings
+from benchmarks.metrics import Timer
+
+
+def configure_environment(workdir, args):
+    # src.config reads the environment at import time, so this runs before importing src
+    os.environ["VECTOR_STORE_BACKEND"] = args.vector_store
+    os.environ["CHROMA_PERSIST_DIRECTORY"] = str(workdir / "index")
+    os.environ["DOCUMENT_STORE_DIRECTORY"] = str(workdir / "corpus")
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+
+def run_benchmarks(args, workdir):
+    from src.index_snapshot import IndexSnapshot, export_index, import_index
+    from src.index_swap import build_index
+    from src.vector_store import get_vector_store, sync_vector_store
+
+    corpus_dir = workdir / "corpus"
+    index_dir = workdir / "index"
+    snapshot_path = workdir / "index.ragsnap"
+    embeddings = FakeEmbeddings(
+        dimensions=args.dimensions,
+        latency=args.embedding_latency,
+    )
+    results = {}
+
+    generate_corpus(corpus_dir, args.files, seed=args.seed)
+    with Timer() as timer:
+        _, stats = sync_vector_store(corpus_dir, index_dir, embeddings)
+    results["ingest_s"] = timer.elapsed
+    results["chunks"] = stats["chunks"]
+
+    with Timer() as timer:
+        export_index(snapshot_path, index_dir, embeddings)
+    results["export_s"] = timer.elapsed
+    results["snapshot_mb"] = snapshot_path.stat().st_size / (1024 * 1024)
+
+    open_times = []
+    for _ in range(args.runs):
+        with Timer() as timer:
+            with IndexSnapshot(snapshot_path) as snapshot:
+                snapshot.embeddings[-1].sum()
+        open_times.append(timer.elapsed)
+    results["open_ms"] = statistics.median(open_times) * 1000
+
+    with IndexSnapshot(snapshot_path) as snapshot, Timer() as timer:
+        snapshot.verify()
+    results["verify_ms"] = timer.elapsed * 1000
+
+    with Timer() as timer:
+        import_index(snapshot_path, workdir / "imported", embeddings, verify=False)
+    results["import_s"] = timer.elapsed
+
+    # New readers open the index while it is rebuilt and swapped
+    queries = generate_queries(50, seed=args.seed)
+    done = threading.Event()
+    reads = {"searches": 0, "failures": 0}
+
+    def read():
+        while not done.is_set():
+            query = queries[reads["searches"] % len(queries)]
+            try:
+                vector_store = get_vector_store(index_dir, embeddings)
+                if not vector_store.similarity_search(query, k=4):
+                    reads["failures"] += 1
+            except Exception as e:
+                print(f"Search failed during rebuild: {e}")
+                reads["failures"] += 1
+            reads["searches"] += 1
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        with Timer() as timer:
+            build_index(corpus_dir, index_dir, embeddings)
+    finally:
+        done.set()
+        reader.join()
+    results["rebuild_s"] = timer.elapsed
+    results["searches_during_rebuild"] = reads["searches"]
+    results["failed_searches"] = reads["failures"]
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=1000, help="Corpus size (100 to 100k files)")
+    parser.add_argument("--vector-store", choices=("chroma", "numpy"), default="chroma", help="Vector store backend")
+    parser.add_argument("--dimensions", type=int, default=256, help="Fake embedding size")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Fake embedding latency per call (s)")
+    parser.add_argument("--runs", type=int, default=20, help="Times the snapshot is opened")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the corpus and queries")
+    parser.add_argument("--workdir", type=str, help="Directory for the corpus and index (default: a temporary directory)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = Path(args.workdir or tmpdir)
+        workdir.mkdir(parents=True, exist_ok=True)
+        configure_environment(workdir, args)
+        results = run_benchmarks(args, workdir)
+
+    for metric, value in results.items():
+        print(f"  {metric:<24} {value:10.3f}" if isinstance(value, float) else f"  {metric:<24} {value:10d}")
+    ok = results["failed_searches"] == 0
+    print("ok" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
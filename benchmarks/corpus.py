@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic corpus of meeting summaries for benchmarks.
+
+Files are created with create_meeting_summary, so names and headers follow
+the same conventions as real summaries, and the template sections are then
+filled with deterministic generated content. Files are spread over
+YEAR/MONTH subdirectories so that large corpora (100k files) stay easy to
+browse.
+
+Run from the repository root:
+
+    python -m benchmarks.corpus --files 1000 --output-dir /tmp/meetings
+"""
+
+import argparse
+import datetime
+import random
+from pathlib import Path
+from typing import List
+
+from create_meeting import create_meeting_summary
+
+
+TOPICS = [
+    "Sprint Planning", "Design Review", "Architecture Sync", "Client Check-in",
+    "Budget Review", "Retrospective", "Security Review", "Release Planning",
+    "Hiring Committee", "Product Roadmap", "Incident Postmortem", "Vendor Evaluation",
+    "Marketing Sync", "Data Platform Review", "Onboarding Plan", "Quarterly Planning",
+]
+
+PEOPLE = [
+    "John Doe", "Jane Smith", "Bob Johnson", "Sarah Lee", "Mike Chen", "Priya Patel",
+    "Carlos Garcia", "Emma Wilson", "Liam Brown", "Olivia Davis", "Noah Martin",
+    "Ava Thompson", "Lucas White", "Mia Harris", "Ethan Clark", "Sofia Lewis",
+]
+
+SUBJECTS = [
+    "the customer portal", "the billing service", "the mobile app", "the data warehouse",
+    "the login flow", "the search feature", "the onboarding emails", "the API gateway",
+    "the reporting dashboard", "the payment provider", "the CI pipeline", "the design system",
+    "the support ticket system", "the notification service", "the analytics export",
+    "the document management module", "the admin console", "the pricing page",
+]
+
+CHOICES = [
+    "React", "PostgreSQL", "Kubernetes", "a two-week sprint cadence", "feature flags",
+    "a phased rollout", "GraphQL", "an external audit", "weekly demos", "Redis caching",
+    "a dedicated on-call rotation", "server-side rendering", "a new vendor", "Terraform",
+]
+
+VERBS = [
+    "prepare", "review", "draft", "update", "benchmark", "document", "migrate",
+    "test", "estimate", "present", "clean up", "prototype",
+]
+
+CONCERNS = [
+    "latency", "cost", "test coverage", "accessibility", "security", "scalability",
+    "the timeline", "technical debt", "user feedback", "data quality", "compliance",
+]
+
+
+def _sentence(rng: random.Random) -> str:
+    return rng.choice([
+        f"{rng.choice(PEOPLE)} raised concerns about {rng.choice(CONCERNS)} in {rng.choice(SUBJECTS)}.",
+        f"The team compared {rng.choice(CHOICES)} with {rng.choice(CHOICES)} for {rng.choice(SUBJECTS)}.",
+        f"Work on {rng.choice(SUBJECTS)} is {rng.randint(10, 95)}% complete and on track.",
+        f"{rng.choice(PEOPLE)} summarized client feedback on {rng.choice(SUBJECTS)}, mostly about {rng.choice(CONCERNS)}.",
+        f"Estimates for {rng.choice(SUBJECTS)} grew by {rng.randint(1, 8)} days because of {rng.choice(CONCERNS)}.",
+    ])
+
+
+def _meeting_body(rng: random.Random, date: datetime.date, participants: List[str]) -> str:
+    first_names = [name.split()[0] for name in participants]
+    next_date = date + datetime.timedelta(days=rng.choice([7, 14]))
+
+    sections = [
+        ("Agenda", [f"{rng.choice(VERBS).capitalize()} {rng.choice(SUBJECTS)}" for _ in range(rng.randint(2, 5))]),
+        ("Discussion", [_sentence(rng) for _ in range(rng.randint(2, 10))]),
+        ("Decisions", [
+            f"We will use {rng.choice(CHOICES)} for {rng.choice(SUBJECTS)}"
+            for _ in range(rng.randint(1, 4))
+        ]),
+        ("Action Items", [
+            f"{rng.choice(first_names)}: {rng.choice(VERBS).capitalize()} {rng.choice(SUBJECTS)} "
+            f"(Due: {(date + datetime.timedelta(days=rng.randint(2, 14))).strftime('%B %d').replace(' 0', ' ')})"
+            for _ in range(rng.randint(1, 5))
+        ]),
+        ("Next Steps", [f"Follow up on {rng.choice(CONCERNS)} for {rng.choice(SUBJECTS)}" for _ in range(rng.randint(1, 3))]),
+    ]
+
+    body = ""
+    for heading, items in sections:
+        body += f"\n## {heading}\n" + "".join(f"- {item}\n" for item in items)
+    body += f"\n## Next Meeting\n{next_date.strftime('%B %d, %Y').replace(' 0', ' ')}\n"
+    return body
+
+
+def generate_corpus(
+    output_dir: Path,
+    num_files: int,
+    seed: int = 0,
+    start_date: str = "2020-01-01",
+    years: int = 5,
+) -> List[Path]:
+    """
+    Generate meeting summary files
+
+    The same arguments always produce the same files.
+
+    Args:
+        output_dir: Directory to write the corpus to
+        num_files: Number of files to generate
+        seed: Random seed
+        start_date: Date of the first meeting (YYYY-MM-DD)
+        years: Number of years the meetings are spread over
+
+    Returns:
+        List of created file paths
+    """
+    rng = random.Random(seed)
+    first_day = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
+    span_days = 365 * years
+    paths = []
+
+    for i in range(num_files):
+        date = first_day + datetime.timedelta(days=i * span_days // max(1, num_files))
+        participants = rng.sample(PEOPLE, rng.randint(2, 6))
+
+        # The index keeps file names unique when several meetings share a day
+        file_path = Path(create_meeting_summary(
+            topic=f"{rng.choice(TOPICS)} {i}",
+            date=date.isoformat(),
+            participants=", ".join(participants),
+            output_dir=str(Path(output_dir) / f"{date.year}" / f"{date.month:02d}"),
+        ))
+
+        # Keep the generated header and replace the empty template sections
+        header = file_path.read_text().split("\n## ", 1)[0].rstrip("\n") + "\n"
+        file_path.write_text(header + _meeting_body(rng, date, participants))
+        paths.append(file_path)
+
+    return paths
+
+
+def modify_corpus(paths: List[Path], fraction: float, seed: int = 0) -> List[Path]:
+    """
+    Append a line to a deterministic subset of the corpus
+
+    Args:
+        paths: Corpus file paths
+        fraction: Fraction of files to modify
+        seed: Random seed
+
+    Returns:
+        List of modified file paths
+    """
+    rng = random.Random(seed)
+    count = min(len(paths), max(1, round(len(paths) * fraction))) if fraction > 0 else 0
+    modified = sorted(rng.sample(list(paths), count))
+    for file_path in modified:
+        with open(file_path, "a") as f:
+            f.write(f"\n## Notes\n- {_sentence(rng)}\n")
+    return modified
+
+
+def generate_queries(num_queries: int, seed: int = 0) -> List[str]:
+    """
+    Generate questions in the style users ask about meeting summaries
+
+    Args:
+        num_queries: Number of queries
+        seed: Random seed
+
+    Returns:
+        List of queries
+    """
+    rng = random.Random(seed)
+    templates = [
+        lambda: f"What did we decide about {rng.choice(SUBJECTS)}?",
+        lambda: f"What are the action items for {rng.choice(PEOPLE).split()[0]}?",
+        lambda: f"Who raised concerns about {rng.choice(CONCERNS)}?",
+        lambda: f"When did we choose {rng.choice(CHOICES)}?",
+        lambda: f"What was discussed in the last {rng.choice(TOPICS).lower()}?",
+    ]
+    return [rng.choice(templates)() for _ in range(num_queries)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=1000, help="Number of files (100 to 100k)")
+    parser.add_argument("--output-dir", "-o", type=str, required=True, help="Directory to write the corpus to")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    paths = generate_corpus(Path(args.output_dir), args.files, seed=args.seed)
+    print(f"Created {len(paths)} meeting summaries in {args.output_dir}")
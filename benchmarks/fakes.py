@@ -0,0 +1,128 @@
+"""
+Deterministic local Embeddings and LLM for benchmarks.
+
+FakeEmbeddings hashes words into a fixed-size bag-of-words vector, so
+similar texts get similar vectors and retrieval results are meaningful,
+while FakeLLM builds its answer from the prompt. Both sleep for a
+configurable latency to stand in for the network and model time of real
+backends.
+"""
+
+import random
+import re
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import LLM
+from langchain_core.outputs import GenerationChunk
+
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=100_000)
+def _bucket(word: str, dimensions: int) -> int:
+    return zlib.crc32(word.encode("utf-8")) % dimensions
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words embeddings with simulated latency
+    """
+
+    def __init__(
+        self,
+        dimensions: int = 256,
+        latency: float = 0.0,
+        latency_per_text: float = 0.0,
+    ):
+        """
+        Create fake embeddings
+
+        Args:
+            dimensions: Vector size
+            latency: Seconds slept per call
+            latency_per_text: Additional seconds slept per embedded text
+        """
+        self.dimensions = dimensions
+        self.latency = latency
+        self.latency_per_text = latency_per_text
+        self.model_name = f"fake/{dimensions}"
+        self.calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in WORD_PATTERN.findall(text.lower()):
+            vector[_bucket(word, self.dimensions)] += 1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        delay = self.latency + self.latency_per_text * len(texts)
+        if delay > 0:
+            time.sleep(delay)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # Queries are embedded like documents, as with OpenAI, so they share one call
+        return self.embed_documents(texts)
+
+
+class FakeLLM(LLM):
+    """
+    LLM that answers with words picked from the prompt, with simulated latency
+    """
+
+    latency: float = 0.0
+    """Seconds slept before the first token"""
+    token_latency: float = 0.0
+    """Seconds slept per generated token"""
+    answer_tokens: int = 40
+    """Number of words in the answer"""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-meeting-llm"
+
+    def _tokens(self, prompt: str) -> List[str]:
+        # The same prompt always gives the same answer
+        rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+        words = WORD_PATTERN.findall(prompt) or ["unknown"]
+        return [rng.choice(words) for _ in range(self.answer_tokens)]
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        for i, word in enumerate(self._tokens(prompt)):
+            if self.token_latency > 0:
+                time.sleep(self.token_latency)
+            chunk = GenerationChunk(text=word if i == 0 else f" {word}")
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
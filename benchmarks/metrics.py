@@ -0,0 +1,146 @@
+"""
+Latency and memory measurement helpers for benchmarks.
+"""
+
+import os
+import resource
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Get a percentile of a list of values (nearest rank)
+
+    Args:
+        values: Values
+        fraction: Percentile as a fraction (0.95 for p95)
+
+    Returns:
+        Percentile value
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize_latencies(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """
+    Summarize per-operation latencies
+
+    Args:
+        latencies: Latency of each operation in seconds
+        elapsed: Wall time of all operations in seconds
+
+    Returns:
+        Dict with count, throughput and p50/p95/p99/max latency in milliseconds
+    """
+    return {
+        "count": len(latencies),
+        "throughput_per_s": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+def current_rss_mb() -> Optional[float]:
+    """
+    Get the resident set size of this process
+
+    Returns:
+        RSS in MiB, or None if /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * resource.getpagesize() / (1024 * 1024)
+
+
+def max_rss_mb() -> float:
+    """
+    Get the peak resident set size of this process since it started
+
+    Returns:
+        Peak RSS in MiB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def directory_size_mb(path: Union[str, Path]) -> float:
+    """
+    Get the size of the files in a directory tree
+
+    Args:
+        path: Directory
+
+    Returns:
+        Total size in MiB (allocated blocks, so sparse files count what they use)
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                continue
+    return total / (1024 * 1024)
+
+
+class PeakRssSampler:
+    """
+    Context manager recording the peak RSS while a block runs
+
+    The process-wide peak only ever grows, so the RSS is sampled in a
+    background thread to get the peak of each benchmark separately. Falls
+    back to the process-wide peak where /proc is not available.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peak_mb = max(self.peak_mb, rss)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "PeakRssSampler":
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        if current_rss_mb() is None:
+            self.peak_mb = max_rss_mb()
+
+
+class Timer:
+    """
+    Context manager measuring wall time
+    """
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Local stub HTTP server that mimics the OpenAI and Ollama embedding and
+completion endpoints.
+
+Vectors are derived deterministically from the input text, every request
+can be delayed by a fixed latency (plus a separate generation latency for
+completions), and a fraction of requests can be failed with a configurable
+status code to exercise retry logic. Completions answer with a fixed text,
+streamed word by word when the client asks for a stream.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional
+
+
+def stub_embedding(text: Any, dimensions: int) -> List[float]:
+    """
+    Build a deterministic unit vector for a text (or token list)
+
+    Args:
+        text: Input text, or a list of token IDs as sent by OpenAIEmbeddings
+        dimensions: Number of dimensions
+
+    Returns:
+        Embedding vector
+    """
+    key = text if isinstance(text, str) else json.dumps(text)
+    seed = int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = sum(x * x for x in vector) ** 0.5 or 1.0
+    return [x / norm for x in vector]
+
+
+GENERATION_PATHS = ("/v1/chat/completions", "/api/generate")
+STUB_ANSWER = "This is a stub answer generated for load testing the meeting summaries RAG system."
+
+
+class StubBackendServer:
+    """
+    Threaded stub server for the OpenAI (/v1/embeddings, /v1/chat/completions)
+    and Ollama (/api/embeddings, /api/embed, /api/generate) endpoints
+    """
+
+    def __init__(
+        self,
+        dimensions: int = 64,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        failure_status: int = 429,
+        seed: int = 0,
+        port: int = 0,
+        generation_latency: float = 0.0,
+    ):
+        """
+        Create a stub server
+
+        Args:
+            dimensions: Dimensions of the returned vectors
+            latency: Seconds to sleep before answering each request
+            failure_rate: Fraction of requests answered with failure_status
+            failure_status: HTTP status used for injected failures
+            seed: Seed for failure injection
+            port: Port to listen on (0 picks a free port)
+            generation_latency: Extra seconds each completion takes, spread
+                over the words of a streamed answer
+        """
+        self.dimensions = dimensions
+        self.latency = latency
+        self.generation_latency = generation_latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.request_count = 0
+        self.failure_count = 0
+        self.max_concurrency = 0
+        self.max_generation_concurrency = 0
+        self._active = 0
+        self._active_generations = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    @property
+    def ollama_base_url(self) -> str:
+        return self.url
+
+    def start(self) -> "StubBackendServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubBackendServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.request_count += 1
+            fail = self._rng.random() < self.failure_rate
+            if fail:
+                self.failure_count += 1
+            return fail
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections alive so pooled clients can reuse them
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Any) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, content_type: str, chunks) -> None:
+                # Streams end by closing the connection instead of declaring a length
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for chunk in chunks:
+                    self.wfile.write(chunk.encode("utf-8"))
+                    self.wfile.flush()
+
+            def _generate(self, stream: bool):
+                # Yields the answer word by word, spreading the generation latency
+                words = STUB_ANSWER.split(" ")
+                delay = stub.generation_latency / len(words) if stream else 0.0
+                if not stream and stub.generation_latency:
+                    time.sleep(stub.generation_latency)
+                for i, word in enumerate(words):
+                    if delay:
+                        time.sleep(delay)
+                    yield word if i == 0 else " " + word
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+
+                generation = self.path in GENERATION_PATHS
+                with stub._lock:
+                    stub._active += 1
+                    stub.max_concurrency = max(stub.max_concurrency, stub._active)
+                    if generation:
+                        stub._active_generations += 1
+                        stub.max_generation_concurrency = max(
+                            stub.max_generation_concurrency, stub._active_generations
+                        )
+                try:
+                    if stub.latency:
+                        time.sleep(stub.latency)
+
+                    if stub._should_fail():
+                        self._send_json(stub.failure_status, {"error": {"message": "stub failure"}})
+                        return
+
+                    self._handle(request)
+                finally:
+                    with stub._lock:
+                        stub._active -= 1
+                        if generation:
+                            stub._active_generations -= 1
+
+            def _handle(self, request: dict) -> None:
+                if self.path == "/v1/embeddings":
+                    inputs = request.get("input", [])
+                    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+                        inputs = [inputs]
+                    self._send_json(200, {
+                        "object": "list",
+                        "model": request.get("model", "stub"),
+                        "data": [
+                            {"object": "embedding", "index": i, "embedding": stub_embedding(text, stub.dimensions)}
+                            for i, text in enumerate(inputs)
+                        ],
+                        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                    })
+                elif self.path == "/api/embeddings":
+                    self._send_json(200, {"embedding": stub_embedding(request.get("prompt", ""), stub.dimensions)})
+                elif self.path == "/api/embed":
+                    inputs = request.get("input", [])
+                    if isinstance(inputs, str):
+                        inputs = [inputs]
+                    self._send_json(200, {
+                        "model": request.get("model", "stub"),
+                        "embeddings": [stub_embedding(text, stub.dimensions) for text in inputs],
+                    })
+                elif self.path == "/v1/chat/completions":
+                    self._handle_chat_completion(request)
+                elif self.path == "/api/generate":
+                    self._handle_generate(request)
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def _handle_chat_completion(self, request: dict) -> None:
+                model = request.get("model", "stub")
+                created = int(time.time())
+                if not request.get("stream"):
+                    self._send_json(200, {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion",
+                        "created": created,
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(self._generate(False))},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                    })
+                    return
+
+                def events():
+                    for word in self._generate(True):
+                        chunk = {
+                            "id": "chatcmpl-stub",
+                            "object": "chat.completion.chunk",
+                            "created": created,
+                            "model": model,
+                            "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+                        }
+                        yield f"data: {json.dumps(chunk)}\n\n"
+                    yield "data: [DONE]\n\n"
+
+                self._send_stream("text/event-stream", events())
+
+            def _handle_generate(self, request: dict) -> None:
+                model = request.get("model", "stub")
+                created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+                if request.get("stream") is False:
+                    self._send_json(200, {
+                        "model": model,
+                        "created_at": created_at,
+                        "response": "".join(self._generate(False)),
+                        "done": True,
+                    })
+                    return
+
+                def lines():
+                    for word in self._generate(True):
+                        yield json.dumps({"model": model, "created_at": created_at, "response": word, "done": False}) + "\n"
+                    yield json.dumps({"model": model, "created_at": created_at, "response": "", "done": True}) + "\n"
+
+                self._send_stream("application/x-ndjson", lines())
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a stub OpenAI/Ollama server")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Per-request latency in seconds")
+    parser.add_argument("--generation-latency", type=float, default=0.0, help="Extra latency per completion")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests to fail")
+    parser.add_argument("--failure-status", type=int, default=429, help="Status code for injected failures")
+    args = parser.parse_args()
+
+    server = StubBackendServer(
+        latency=args.latency,
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+        port=args.port,
+        generation_latency=args.generation_latency,
+    )
+    print(f"Stub server listening on {server.url}")
+    print(f"  OpenAI base URL: {server.openai_base_url}")
+    print(f"  Ollama base URL: {server.ollama_base_url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
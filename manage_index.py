@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Script to export, import, rebuild and migrate the index without a window in which it is missing.
+"""
+
+import argparse
+import datetime
+import sys
+import time
+from pathlib import Path
+
+from src.config import (
+    BACKEND_OLLAMA,
+    BACKEND_OPENAI,
+    CHROMA_PERSIST_DIRECTORY,
+    DEFAULT_BACKEND,
+    DOCUMENT_STORE_DIRECTORY,
+    get_embedding_model_name,
+    validate_config,
+)
+from src.index_manifest import get_index_directory
+
+
+def print_info(path: str) -> None:
+    """
+    Print the header of a snapshot file
+
+    Args:
+        path: Path of the snapshot file
+    """
+    from src.index_snapshot import IndexSnapshot
+
+    with IndexSnapshot(path) as snapshot:
+        created_at = datetime.datetime.fromtimestamp(snapshot.header["created_at"])
+        print(f"Embedding model: {snapshot.embedding_model}")
+        print(f"Chunks: {snapshot.count} ({snapshot.dimensions} dimensions)")
+        print(f"Documents: {len(snapshot.document_metadata)}")
+        print(f"Created: {created_at:%Y-%m-%d %H:%M:%S}")
+
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Export, import, rebuild or migrate the index")
+    parser.add_argument(
+        "--backend",
+        "-b",
+        type=str,
+        choices=(BACKEND_OPENAI, BACKEND_OLLAMA),
+        default=DEFAULT_BACKEND,
+        help=f"Backend whose embedding model the index uses (default: {DEFAULT_BACKEND})",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write the index to a snapshot file")
+    export_parser.add_argument("path", type=str, help="Snapshot file to write")
+    import_parser = commands.add_parser("import", help="Replace the index with a snapshot file")
+    import_parser.add_argument("path", type=str, help="Snapshot file to read")
+    import_parser.add_argument(
+        "--no-verify",
+        action="store_true",
+        help="Skip checking the checksums of the snapshot",
+    )
+    rebuild_parser = commands.add_parser("rebuild", help="Re-index every document and swap the new index in")
+    rebuild_parser.add_argument(
+        "--directory",
+        "-d",
+        type=str,
+        default=str(DOCUMENT_STORE_DIRECTORY),
+        help=f"Directory containing the documents (default: {DOCUMENT_STORE_DIRECTORY})",
+    )
+    commands.add_parser(
+        "migrate",
+        help="Move an index kept directly in CHROMA_PERSIST_DIRECTORY into the backend's model directory",
+    )
+    info_parser = commands.add_parser("info", help="Describe a snapshot file")
+    info_parser.add_argument("path", type=str, help="Snapshot file to describe")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        try:
+            print_info(args.path)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        sys.exit(0)
+
+    # Validate configuration
+    is_valid, error = validate_config(args.backend)
+    if not is_valid:
+        print(f"Error: {error}")
+        sys.exit(1)
+
+    # Each embedding model has its own index (see src.index_manifest)
+    index_directory = get_index_directory(CHROMA_PERSIST_DIRECTORY, get_embedding_model_name(args.backend))
+    start = time.perf_counter()
+    try:
+        if args.command == "export":
+            from src.index_snapshot import export_index
+
+            header = export_index(args.path, index_directory, backend=args.backend)
+            print(f"Exported {header['count']} chunks to {args.path}")
+        elif args.command == "import":
+            from src.index_snapshot import import_index
+
+            count = import_index(args.path, index_directory, backend=args.backend, verify=not args.no_verify)
+            print(f"Imported {count} chunks into {index_directory}")
+        elif args.command == "migrate":
+            from src.index_swap import migrate_legacy_index
+
+            if migrate_legacy_index(CHROMA_PERSIST_DIRECTORY, get_embedding_model_name(args.backend), force=True) is None:
+                print(f"No index kept directly in {CHROMA_PERSIST_DIRECTORY}")
+            else:
+                print(f"Moved the index in {CHROMA_PERSIST_DIRECTORY} to {index_directory}")
+        else:
+            from src.index_swap import build_index
+            from src.vector_store import get_embedding_model
+
+            stats = build_index(
+                Path(args.directory).absolute(),
+                index_directory,
+                embedding_model=get_embedding_model(args.backend),
+            )
+            print(f"Indexed {stats['added']} files ({stats['chunks']} chunks) into a new index")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Done in {time.perf_counter() - start:.2f}s")
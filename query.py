@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Script to answer one query from the command line, e.g. from shell scripts and cron.
+
+Only the modules needed to answer are imported: questions about decisions,
+action items and next meetings are answered from the structured index
+without loading a backend, and nothing on the indexing side is loaded.
+"""
+
+import argparse
+import json
+import sys
+
+from src.config import (
+    BACKEND_OLLAMA,
+    BACKEND_OPENAI,
+    CHROMA_PERSIST_DIRECTORY,
+    DEFAULT_BACKEND,
+    STRUCTURED_INDEX_ENABLED,
+    get_embedding_model_name,
+    validate_config,
+)
+from src.index_manifest import get_index_directory, get_manifest_path
+
+
+def print_sources(source_docs: list, index_directory) -> None:
+    """
+    Print the sources of an answer
+
+    Args:
+        source_docs: Source documents
+        index_directory: Directory of the index that answered
+    """
+    from src.llm import format_source_documents
+
+    print()
+    print(format_source_documents(source_docs, index_directory), end="")
+
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Answer a query about the meeting summaries")
+    parser.add_argument(
+        "query",
+        type=str,
+        nargs="+",
+        help="Query to answer",
+    )
+    parser.add_argument(
+        "--backend",
+        "-b",
+        type=str,
+        choices=(BACKEND_OPENAI, BACKEND_OLLAMA),
+        default=DEFAULT_BACKEND,
+        help=f"Backend to answer with (default: {DEFAULT_BACKEND})",
+    )
+    parser.add_argument(
+        "--where",
+        type=str,
+        help="Metadata filter as JSON, e.g. '{\"year\": 2024}'",
+    )
+    parser.add_argument(
+        "--sources",
+        "-s",
+        action="store_true",
+        help="Print the sources of the answer",
+    )
+    args = parser.parse_args()
+
+    query = " ".join(args.query)
+    where = json.loads(args.where) if args.where else None
+
+    # Each embedding model has its own index (see src.index_manifest)
+    index_directory = get_index_directory(CHROMA_PERSIST_DIRECTORY, get_embedding_model_name(args.backend))
+    if not index_directory.exists():
+        if get_manifest_path(CHROMA_PERSIST_DIRECTORY).exists():
+            print(
+                f"Error: The index in {CHROMA_PERSIST_DIRECTORY} predates per-model indexes. "
+                f"Move it with: python manage_index.py migrate --backend {args.backend}",
+                file=sys.stderr,
+            )
+        else:
+            print("Error: Vector store not found. Please run test_rag.py first.", file=sys.stderr)
+        sys.exit(1)
+
+    # Structured questions need neither a backend nor its configuration
+    result = None
+    if STRUCTURED_INDEX_ENABLED and where is None:
+        from src.query_router import route_query
+
+        result = route_query(query, index_directory)
+
+    if result is None:
+        # Validate configuration
+        is_valid, error = validate_config(args.backend)
+        if not is_valid:
+            print(f"Error: {error}", file=sys.stderr)
+            sys.exit(1)
+
+        from src.rag_service import RagService
+
+        service = RagService(auto_index=False, route_queries=False)
+        try:
+            result = service.query(query, backend=args.backend, where=where)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    response, source_docs = result
+    print(response)
+    if args.sources:
+        print_sources(source_docs, index_directory)
@@ -0,0 +1,330 @@
+# Answer cache module for the RAG system
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL,
+)
+
+
+def _serialize_documents(documents: List[Document]) -> str:
+    return json.dumps(
+        [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+    )
+
+
+def _deserialize_documents(data: str) -> List[Document]:
+    return [
+        Document(page_content=item["page_content"], metadata=item["metadata"])
+        for item in json.loads(data)
+    ]
+
+
+def _normalize(vector: List[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _ScopeIndex:
+    """
+    In-memory matrix of the normalized query embeddings cached for one scope
+    """
+
+    def __init__(self, ids: List[int], vectors: List[np.ndarray]):
+        self.ids = list(ids)
+        self.matrix = np.vstack(vectors) if vectors else None
+
+    def add(self, entry_id: int, vector: np.ndarray) -> None:
+        self.ids.append(entry_id)
+        row = vector[np.newaxis, :]
+        self.matrix = row if self.matrix is None else np.vstack([self.matrix, row])
+
+    def remove(self, entry_ids: set) -> None:
+        keep = [i for i, entry_id in enumerate(self.ids) if entry_id not in entry_ids]
+        if len(keep) == len(self.ids):
+            return
+        self.ids = [self.ids[i] for i in keep]
+        self.matrix = self.matrix[keep] if keep else None
+
+    def best_match(self, vector: np.ndarray) -> Tuple[Optional[int], float]:
+        if self.matrix is None or self.matrix.shape[1] != vector.shape[0]:
+            return None, 0.0
+        similarities = self.matrix @ vector
+        best = int(np.argmax(similarities))
+        return self.ids[best], float(similarities[best])
+
+
+class AnswerCache:
+    """
+    Disk-backed semantic cache of answers with TTL and LRU eviction
+
+    Entries are grouped by scope (backend, models, retrieval settings) and by
+    the corpus version of the index they were answered from. A lookup returns
+    the cached answer of the most similar earlier query in the same scope if
+    its cosine similarity reaches the threshold. Entries of other corpus
+    versions are dropped from a scope as soon as a new version is seen in it.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        threshold: Optional[float] = None,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        """
+        Open (or create) an answer cache
+
+        Args:
+            path: Path to the SQLite database file
+            threshold: Minimum cosine similarity between queries for a hit
+            ttl: Seconds an entry stays valid (0 disables expiry)
+            max_entries: Maximum number of answers to keep before evicting
+        """
+        self.path = Path(path) if path is not None else ANSWER_CACHE_PATH
+        self.threshold = threshold if threshold is not None else ANSWER_CACHE_THRESHOLD
+        self.ttl = ttl if ttl is not None else ANSWER_CACHE_TTL
+        self.max_entries = max_entries if max_entries is not None else ANSWER_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self._scopes: Dict[Tuple[str, str], _ScopeIndex] = {}
+        self._corpus_versions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " scope TEXT NOT NULL,"
+            " corpus_version TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " sources TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_answers_scope ON answers (scope, corpus_version)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_answers_last_access ON answers (last_access)"
+        )
+        self._conn.commit()
+
+    def _invalidate_other_versions(self, scope: str, corpus_version: str) -> None:
+        # Called with the lock held; a new corpus version makes older answers of the scope stale
+        if self._corpus_versions.get(scope) == corpus_version:
+            return
+
+        self._conn.execute(
+            "DELETE FROM answers WHERE scope = ? AND corpus_version != ?", (scope, corpus_version)
+        )
+        self._conn.commit()
+        self._scopes = {
+            key: index
+            for key, index in self._scopes.items()
+            if key[0] != scope or key[1] == corpus_version
+        }
+        self._corpus_versions[scope] = corpus_version
+
+    def _get_scope_index(self, scope: str, corpus_version: str) -> _ScopeIndex:
+        # Called with the lock held
+        key = (scope, corpus_version)
+        if key not in self._scopes:
+            rows = self._conn.execute(
+                "SELECT id, embedding FROM answers WHERE scope = ? AND corpus_version = ?",
+                (scope, corpus_version),
+            ).fetchall()
+            self._scopes[key] = _ScopeIndex(
+                [row[0] for row in rows],
+                [np.frombuffer(row[1], dtype=np.float32) for row in rows],
+            )
+        return self._scopes[key]
+
+    def _forget(self, entry_ids: set) -> None:
+        # Called with the lock held
+        for index in self._scopes.values():
+            index.remove(entry_ids)
+
+    def get(
+        self,
+        scope: str,
+        corpus_version: str,
+        embedding: List[float],
+    ) -> Optional[Tuple[str, List[Document]]]:
+        """
+        Look up the answer to a semantically equivalent earlier query
+
+        Args:
+            scope: Cache scope (backend, models, retrieval settings)
+            corpus_version: Version stamp of the indexed corpus
+            embedding: Query embedding
+
+        Returns:
+            Tuple of (answer, source_documents), or None on a miss
+        """
+        vector = _normalize(embedding)
+
+        with self._lock:
+            self._invalidate_other_versions(scope, corpus_version)
+            index = self._get_scope_index(scope, corpus_version)
+            entry_id, similarity = index.best_match(vector)
+
+            row = None
+            if entry_id is not None and similarity >= self.threshold:
+                row = self._conn.execute(
+                    "SELECT answer, sources, created FROM answers WHERE id = ?", (entry_id,)
+                ).fetchone()
+
+            now = time.time()
+            if row is not None and self.ttl and now - row[2] > self.ttl:
+                self._conn.execute("DELETE FROM answers WHERE id = ?", (entry_id,))
+                self._conn.commit()
+                self._forget({entry_id})
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE answers SET last_access = ? WHERE id = ?", (now, entry_id))
+            self._conn.commit()
+            self.hits += 1
+
+        return row[0], _deserialize_documents(row[1])
+
+    def put(
+        self,
+        scope: str,
+        corpus_version: str,
+        query: str,
+        embedding: List[float],
+        answer: str,
+        source_documents: List[Document],
+    ) -> None:
+        """
+        Store an answer and evict expired and least recently used entries
+
+        Args:
+            scope: Cache scope (backend, models, retrieval settings)
+            corpus_version: Version stamp of the indexed corpus
+            query: Query string
+            embedding: Query embedding
+            answer: Generated answer
+            source_documents: Source documents of the answer
+        """
+        vector = _normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            self._invalidate_other_versions(scope, corpus_version)
+            index = self._get_scope_index(scope, corpus_version)
+            cursor = self._conn.execute(
+                "INSERT INTO answers"
+                " (scope, corpus_version, query, embedding, answer, sources, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    scope,
+                    corpus_version,
+                    query,
+                    vector.tobytes(),
+                    answer,
+                    _serialize_documents(source_documents),
+                    now,
+                    now,
+                ),
+            )
+            index.add(cursor.lastrowid, vector)
+
+            evicted = set()
+            if self.ttl:
+                evicted.update(
+                    row[0]
+                    for row in self._conn.execute(
+                        "SELECT id FROM answers WHERE created < ?", (now - self.ttl,)
+                    )
+                )
+
+            count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            overflow = count - len(evicted) - self.max_entries
+            if overflow > 0:
+                evicted.update(
+                    row[0]
+                    for row in self._conn.execute(
+                        "SELECT id FROM answers ORDER BY last_access ASC LIMIT ?",
+                        (overflow + len(evicted),),
+                    )
+                )
+
+            if evicted:
+                self._conn.executemany("DELETE FROM answers WHERE id = ?", [(i,) for i in evicted])
+                self._forget(evicted)
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """
+        Remove all cached answers and reset the statistics
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._scopes = {}
+            self._corpus_versions = {}
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dict with hits, misses, hit_rate and entries
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            total = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": entries,
+            }
+
+
+_answer_caches: Dict[str, AnswerCache] = {}
+_answer_caches_lock = threading.Lock()
+
+
+def get_answer_cache(path: Optional[Union[str, Path]] = None) -> AnswerCache:
+    """
+    Get the shared answer cache for a path, opening it on first use
+
+    Args:
+        path: Path to the SQLite database file
+
+    Returns:
+        AnswerCache
+    """
+    cache_path = str(path if path is not None else ANSWER_CACHE_PATH)
+    with _answer_caches_lock:
+        if cache_path not in _answer_caches:
+            _answer_caches[cache_path] = AnswerCache(cache_path)
+
+        return _answer_caches[cache_path]
@@ -0,0 +1,52 @@
+# Async utilities module for the RAG system
+
+import asyncio
+import threading
+import weakref
+
+
+class LoopSemaphore:
+    """
+    Concurrency limit usable from any event loop
+
+    asyncio.Semaphore is bound to the loop it is first used on, while the
+    objects holding a limit (embedding schedulers, the RAG service) are
+    long-lived and may be shared by several loops, e.g. a web server and a
+    script calling asyncio.run(). This keeps one semaphore per running loop,
+    each with the same limit.
+    """
+
+    def __init__(self, limit: int):
+        """
+        Create a concurrency limit
+
+        Args:
+            limit: Maximum number of concurrent holders per event loop
+        """
+        self.limit = max(1, int(limit))
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def get(self) -> asyncio.Semaphore:
+        """
+        Get the semaphore of the running event loop
+
+        Returns:
+            asyncio.Semaphore
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.limit)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+    async def __aenter__(self) -> "LoopSemaphore":
+        await self.get().acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.get().release()
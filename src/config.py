@@ -3,13 +3,34 @@
 import os
 from pathlib import Path
 from typing import Optional
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+
+def _find_dotenv() -> Optional[Path]:
+    """
+    Find the .env file the way python-dotenv does for this module
+
+    Returns:
+        Path of the nearest .env file in this directory or its parents, or None
+    """
+    directory = Path(__file__).resolve().parent
+    for candidate in (directory, *directory.parents):
+        if (candidate / ".env").is_file():
+            return candidate / ".env"
+    return None
+
+
+# Load environment variables from .env file; python-dotenv is only imported
+# when there is one, which keeps it out of the startup of deployed processes
+# configured through the environment
+_DOTENV_PATH = _find_dotenv()
+if _DOTENV_PATH is not None:
+    from dotenv import load_dotenv
+
+    load_dotenv(_DOTENV_PATH)
 
 # API Keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 
 # Paths
 BASE_DIR = Path(__file__).parent.parent
@@ -20,30 +41,171 @@ DOCUMENT_STORE_DIRECTORY = os.getenv("DOCUMENT_STORE_DIRECTORY", "./meetings")
 CHROMA_PERSIST_DIRECTORY = BASE_DIR / CHROMA_PERSIST_DIRECTORY if not os.path.isabs(CHROMA_PERSIST_DIRECTORY) else Path(CHROMA_PERSIST_DIRECTORY)
 DOCUMENT_STORE_DIRECTORY = BASE_DIR / DOCUMENT_STORE_DIRECTORY if not os.path.isabs(DOCUMENT_STORE_DIRECTORY) else Path(DOCUMENT_STORE_DIRECTORY)
 
+# Index versions: rebuilt and imported indexes are swapped in behind CHROMA_PERSIST_DIRECTORY (a link to
+# the current version), keeping INDEX_KEEP_VERSIONS previous versions for readers that still have them open
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "1"))
+
+# Vector Store Backend (chroma, or numpy for memory-mapped float32, float16 or int8 vectors)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma").lower()
+NUMPY_STORE_DTYPE = os.getenv("NUMPY_STORE_DTYPE", "float32").lower()
+
+# Sharding: SHARD_BY=year or month splits the vector store into one store per period of meeting dates,
+# searched by SHARD_SEARCH_WORKERS threads; searches filtered by date skip the periods outside the filter
+SHARD_BY = os.getenv("SHARD_BY", "none").lower()
+SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", "4"))
+
+# Approximate search for the NumPy store: an IVF index is trained once it holds ANN_MIN_ROWS chunks
+# (0 disables it) and ANN_NPROBE of its ANN_NLIST lists (0 for the square root of the chunk count) are searched
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "50000"))
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+
 # Chunking Configuration
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "512"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
+# CHUNK_SPLITTER=markdown splits on headings and list items into chunks of up to CHUNK_MAX_TOKENS
+# tokens; recursive splits plain text into CHUNK_SIZE characters with CHUNK_OVERLAP
+CHUNK_SPLITTER = os.getenv("CHUNK_SPLITTER", "markdown").lower()
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+
+# Ingestion Configuration
+INGEST_LOAD_WORKERS = int(os.getenv("INGEST_LOAD_WORKERS", "8"))
+INGEST_CHUNK_WORKERS = int(os.getenv("INGEST_CHUNK_WORKERS", str(os.cpu_count() or 1)))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "64"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+
+# Watcher Configuration: changes are indexed once no file has changed for WATCH_DEBOUNCE_SECONDS
+# (at most WATCH_MAX_DELAY_SECONDS after the first change); WATCH_POLLING=true scans every
+# WATCH_POLL_INTERVAL seconds instead of using inotify
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "1.0"))
+WATCH_MAX_DELAY_SECONDS = float(os.getenv("WATCH_MAX_DELAY_SECONDS", "10.0"))
+WATCH_POLLING = os.getenv("WATCH_POLLING", "false").lower() == "true"
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "2.0"))
+
+# Retrieval Configuration
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() == "true"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+FILTER_EXACT_MAX_CANDIDATES = int(os.getenv("FILTER_EXACT_MAX_CANDIDATES", "2000"))
+
+# Re-ranking: RERANK_CANDIDATES chunks are retrieved, then k are picked by MMR over a relevance score
+# combining vector similarity, query term overlap and recency (halving every RERANK_RECENCY_HALF_LIFE_DAYS)
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() == "true"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_MMR_LAMBDA = float(os.getenv("RERANK_MMR_LAMBDA", "0.7"))
+RERANK_LEXICAL_WEIGHT = float(os.getenv("RERANK_LEXICAL_WEIGHT", "0.3"))
+RERANK_RECENCY_WEIGHT = float(os.getenv("RERANK_RECENCY_WEIGHT", "0.1"))
+RERANK_RECENCY_HALF_LIFE_DAYS = float(os.getenv("RERANK_RECENCY_HALF_LIFE_DAYS", "180"))
+
+# Structured answers: decisions, action items and next meetings are extracted at index time, and
+# questions about them (e.g. "What are Jane's action items?") are answered from them without the LLM
+STRUCTURED_INDEX_ENABLED = os.getenv("STRUCTURED_INDEX_ENABLED", "true").lower() == "true"
+STRUCTURED_MAX_ITEMS = int(os.getenv("STRUCTURED_MAX_ITEMS", "50"))
 
 # Model Configuration
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 COMPLETION_MODEL = os.getenv("COMPLETION_MODEL", "gpt-3.5-turbo")
 
+# Prompt context budget: at most CONTEXT_MAX_TOKENS context tokens (0 for the model's context window)
+# while keeping CONTEXT_ANSWER_TOKENS of the window free for the answer
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2000"))
+CONTEXT_ANSWER_TOKENS = int(os.getenv("CONTEXT_ANSWER_TOKENS", "512"))
+
+# Embedding Request Scheduling
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4"))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "1000000"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+EMBEDDING_RETRY_BACKOFF = float(os.getenv("EMBEDDING_RETRY_BACKOFF", "1.0"))
+
+# Concurrent queries per backend for the async API (keep Ollama low to avoid overloading it)
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+
 # Local Model Configuration
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "nomic-embed-text")
 LOCAL_COMPLETION_MODEL = os.getenv("LOCAL_COMPLETION_MODEL", "llama3")
 
+# In-process embeddings: EMBEDDING_PROVIDER=hashing embeds on CPU from hashed words (HASHING_EMBEDDING_DIMENSIONS
+# wide, HASHING_EMBEDDING_WORKERS threads per call) for every backend; "backend" uses the backend's embedding model
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "backend").lower()
+HASHING_EMBEDDING_DIMENSIONS = int(os.getenv("HASHING_EMBEDDING_DIMENSIONS", "1024"))
+HASHING_EMBEDDING_WORKERS = int(os.getenv("HASHING_EMBEDDING_WORKERS", "1"))
+
+# Embedding Cache Configuration
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./data/embedding_cache.sqlite")
+EMBEDDING_CACHE_PATH = BASE_DIR / EMBEDDING_CACHE_PATH if not os.path.isabs(EMBEDDING_CACHE_PATH) else Path(EMBEDDING_CACHE_PATH)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Answer Cache Configuration
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "./data/answer_cache.sqlite")
+ANSWER_CACHE_PATH = BASE_DIR / ANSWER_CACHE_PATH if not os.path.isabs(ANSWER_CACHE_PATH) else Path(ANSWER_CACHE_PATH)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+
+# Tracing Configuration (TRACE_FILE is a JSONL file of spans, METRICS_PORT=0 disables the metrics endpoint)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_FILE = str(BASE_DIR / TRACE_FILE) if TRACE_FILE and not os.path.isabs(TRACE_FILE) else TRACE_FILE
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
 # Use local models flag
 USE_LOCAL_MODELS = os.getenv("USE_LOCAL_MODELS", "false").lower() == "true"
 
-def validate_config() -> tuple[bool, Optional[str]]:
+# Backends (selectable at runtime, the default follows USE_LOCAL_MODELS)
+BACKEND_OPENAI = "openai"
+BACKEND_OLLAMA = "ollama"
+DEFAULT_BACKEND = BACKEND_OLLAMA if USE_LOCAL_MODELS else BACKEND_OPENAI
+
+# Embedding providers
+EMBEDDING_PROVIDER_BACKEND = "backend"
+EMBEDDING_PROVIDER_HASHING = "hashing"
+
+def get_embedding_model_name(backend: Optional[str] = None) -> str:
+    """
+    Get the name of the embedding model a backend embeds with
+    
+    Args:
+        backend: Backend to use (defaults to DEFAULT_BACKEND)
+        
+    Returns:
+        Model name qualified by its provider, e.g. "openai/text-embedding-3-small"
+    """
+    if backend is None:
+        backend = DEFAULT_BACKEND
+    
+    if EMBEDDING_PROVIDER == EMBEDDING_PROVIDER_HASHING:
+        return f"hashing/{HASHING_EMBEDDING_DIMENSIONS}"
+    if backend == BACKEND_OLLAMA:
+        return f"ollama/{LOCAL_EMBEDDING_MODEL}"
+    return f"openai/{EMBEDDING_MODEL}"
+
+def validate_config(backend: Optional[str] = None) -> tuple[bool, Optional[str]]:
     """
     Validate the configuration settings.
     
+    Args:
+        backend: Backend to validate for (defaults to DEFAULT_BACKEND)
+    
     Returns:
         tuple: (is_valid, error_message)
     """
-    if not USE_LOCAL_MODELS and not OPENAI_API_KEY:
+    if backend is None:
+        backend = DEFAULT_BACKEND
+    
+    if backend not in (BACKEND_OPENAI, BACKEND_OLLAMA):
+        return False, f"Unknown backend: {backend}"
+    
+    if EMBEDDING_PROVIDER not in (EMBEDDING_PROVIDER_BACKEND, EMBEDDING_PROVIDER_HASHING):
+        return False, f"Unknown embedding provider: {EMBEDDING_PROVIDER}"
+    
+    if backend == BACKEND_OPENAI and not OPENAI_API_KEY:
         return False, "OPENAI_API_KEY is required when not using local models"
     
     # Create directories if they don't exist
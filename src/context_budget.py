@@ -0,0 +1,217 @@
+# Context budget module for the RAG system
+
+import re
+import sys
+from typing import Any, List, Optional
+
+from langchain_core.documents import Document
+
+from src.config import CHUNK_OVERLAP, CONTEXT_ANSWER_TOKENS, CONTEXT_MAX_TOKENS
+from src.tokens import count_tokens, truncate_to_tokens
+
+
+# Context windows by model name prefix, most specific first
+MODEL_CONTEXT_WINDOWS = (
+    ("gpt-4o", 128000),
+    ("gpt-4-turbo", 128000),
+    ("gpt-4-32k", 32768),
+    ("gpt-4", 8192),
+    ("gpt-3.5-turbo", 16385),
+)
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# Ollama's default num_ctx; longer prompts are silently truncated by the server
+OLLAMA_CONTEXT_WINDOW = 2048
+
+# Shortest suffix/prefix match taken as the overlap between two chunks of a document
+MIN_OVERLAP_CHARS = 16
+
+# Longest separator stripped between two consecutive chunks
+MAX_GAP_CHARS = 4
+
+# Unfilled list items of the meeting template ("- ") and runs of blank lines
+EMPTY_LIST_ITEM_PATTERN = re.compile(r"^[ \t]*[-*][ \t]*\n", re.MULTILINE)
+BLANK_LINES_PATTERN = re.compile(r"\n[ \t]*\n(?:[ \t]*\n)+")
+
+
+def get_context_window(llm: Any) -> int:
+    """
+    Get the context window of an LLM in tokens
+
+    Args:
+        llm: LLM or chat model
+
+    Returns:
+        Context window size
+    """
+    num_ctx = getattr(llm, "num_ctx", None)
+    if num_ctx:
+        return num_ctx
+    # langchain_ollama is only loaded once an Ollama model has been created
+    ollama = sys.modules.get("langchain_ollama")
+    if ollama is not None and isinstance(llm, ollama.OllamaLLM):
+        return OLLAMA_CONTEXT_WINDOW
+
+    model_name = getattr(llm, "model_name", None) or getattr(llm, "model", None) or ""
+    for prefix, window in MODEL_CONTEXT_WINDOWS:
+        if model_name.startswith(prefix):
+            return window
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def get_context_budget(llm: Any, prompt_tokens: int) -> int:
+    """
+    Get the number of context tokens a prompt may hold
+
+    Args:
+        llm: LLM the prompt is sent to
+        prompt_tokens: Tokens of the prompt without context (template and question)
+
+    Returns:
+        Token budget of the context
+    """
+    budget = get_context_window(llm) - CONTEXT_ANSWER_TOKENS - prompt_tokens
+    if CONTEXT_MAX_TOKENS > 0:
+        budget = min(budget, CONTEXT_MAX_TOKENS)
+    return max(budget, 0)
+
+
+def _overlap_length(left: str, right: str, max_overlap: int) -> int:
+    # Length of the longest suffix of left that starts right, 0 if shorter than MIN_OVERLAP_CHARS
+    for length in range(min(len(left), len(right) - 1, max_overlap), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+def _join(first: Document, second: Document, max_overlap: int) -> Optional[Document]:
+    """
+    Join two chunks if one repeats or continues the other
+
+    Chunks indexed with their start_index are joined by position; older
+    chunks without one are joined if the end of one starts the other.
+
+    Args:
+        first: Higher-ranked chunk
+        second: Lower-ranked chunk
+        max_overlap: Longest overlap between consecutive chunks, in characters
+
+    Returns:
+        Joined chunk with the metadata of first, or None if the chunks are unrelated
+    """
+    if second.page_content in first.page_content:
+        return first
+    if first.page_content in second.page_content:
+        return Document(page_content=second.page_content, metadata=first.metadata)
+
+    # Only consecutive chunks of the same document overlap
+    source = first.metadata.get("source")
+    if source is None or source != second.metadata.get("source"):
+        return None
+
+    first_start = first.metadata.get("start_index")
+    second_start = second.metadata.get("start_index")
+    if isinstance(first_start, int) and isinstance(second_start, int):
+        (left, left_start), (right, right_start) = sorted(
+            ((first.page_content, first_start), (second.page_content, second_start)), key=lambda item: item[1]
+        )
+        gap = right_start - (left_start + len(left))
+        if gap > MAX_GAP_CHARS:
+            return None
+        # Keep the joined text as long as the span it covers, so later joins line up
+        text = left + right[min(-gap, len(right)):] if gap < 0 else left + "\n" * gap + right
+        return Document(page_content=text, metadata={**first.metadata, "start_index": left_start})
+
+    for left, right in ((first.page_content, second.page_content), (second.page_content, first.page_content)):
+        length = _overlap_length(left, right, max_overlap)
+        if length:
+            return Document(page_content=left + right[length:], metadata=first.metadata)
+    return None
+
+
+def merge_adjacent_chunks(documents: List[Document], max_overlap: int = CHUNK_OVERLAP) -> List[Document]:
+    """
+    Merge consecutive chunks of the same document and drop repeated text
+
+    Consecutive chunks share up to CHUNK_OVERLAP characters, which are kept
+    once. Chunks whose text is contained in another retrieved chunk are
+    dropped. A merged chunk takes the rank of its best part.
+
+    Args:
+        documents: Retrieved chunks, best first
+        max_overlap: Longest overlap between consecutive chunks, in characters
+
+    Returns:
+        Merged chunks, best first
+    """
+    merged: List[Document] = []
+    for document in documents:
+        current = Document(page_content=document.page_content.strip(), metadata=document.metadata)
+
+        # A new chunk may bridge two earlier ones, so keep joining until nothing changes
+        position = len(merged)
+        i = 0
+        while i < len(merged):
+            joined = _join(merged[i], current, max_overlap)
+            if joined is None:
+                i += 1
+                continue
+            current = joined
+            del merged[i]
+            position = min(position, i)
+            i = 0
+        merged.insert(min(position, len(merged)), current)
+
+    return merged
+
+
+def compact_text(text: str) -> str:
+    """
+    Drop unfilled list items and repeated blank lines from a chunk
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        Compacted text
+    """
+    text = EMPTY_LIST_ITEM_PATTERN.sub("", text + "\n")
+    return BLANK_LINES_PATTERN.sub("\n\n", text).strip()
+
+
+def assemble_context(documents: List[Document], budget: int, separator: str = "\n\n") -> List[Document]:
+    """
+    Select the chunks that go into a prompt
+
+    Chunks are merged (see merge_adjacent_chunks) and compacted (see
+    compact_text), then added best first while
+    they fit the token budget; a chunk that does not fit is skipped in favour
+    of smaller, lower-ranked ones. If even the best chunk does not fit, it is
+    truncated.
+
+    Args:
+        documents: Retrieved chunks, best first
+        budget: Token budget of the context
+        separator: Separator between chunks in the prompt
+
+    Returns:
+        Chunks to put in the prompt, best first
+    """
+    separator_tokens = count_tokens([separator])
+    remaining = budget
+    selected = []
+    for document in merge_adjacent_chunks(documents):
+        document = Document(page_content=compact_text(document.page_content), metadata=document.metadata)
+        if not document.page_content:
+            continue
+        tokens = count_tokens([document.page_content]) + (separator_tokens if selected else 0)
+        if tokens <= remaining:
+            selected.append(document)
+            remaining -= tokens
+        elif not selected and remaining > 0:
+            selected.append(
+                Document(page_content=truncate_to_tokens(document.page_content, remaining), metadata=document.metadata)
+            )
+            remaining = 0
+
+    return selected
@@ -1,19 +1,99 @@
 # Document processor module for the RAG system
 
+import multiprocessing
 import os
 import re
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import TextLoader
 from langchain_core.documents import Document
 
-from src.config import CHUNK_SIZE, CHUNK_OVERLAP, DOCUMENT_STORE_DIRECTORY
+from src.config import (
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    CHUNK_SPLITTER,
+    DOCUMENT_STORE_DIRECTORY,
+    INGEST_CHUNK_WORKERS,
+    INGEST_LOAD_WORKERS,
+    INGEST_MAX_PENDING,
+)
+from src.index_manifest import compute_content_hash
+from src.markdown_splitter import split_markdown
+from src.tracing import is_active, record, span
 
+# The loader and splitter are imported when documents are indexed, so that
+# query-only processes (which use the metadata helpers) do not load them
+if TYPE_CHECKING:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-def extract_metadata_from_filename(filename: str) -> Dict[str, str]:
+
+SUPPORTED_EXTENSIONS = (".md", ".txt")
+
+
+def extract_date_metadata(date_str: str) -> Dict[str, Union[str, int]]:
+    """
+    Build date metadata from a YYYY-MM-DD string
+    
+    Args:
+        date_str: Date string
+        
+    Returns:
+        Dict with date, year, month and day, or an empty dict if the date is invalid
+    """
+    try:
+        # Validate date format
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError:
+        return {}
+    
+    return {
+        "date": date_str,
+        "year": date_obj.year,
+        "month": date_obj.month,
+        "day": date_obj.day,
+    }
+
+
+def normalize_participants(participants: Union[str, List[str], None]) -> List[str]:
+    """
+    Normalize participants into a list of distinct, whitespace-cleaned names
+    
+    Args:
+        participants: Comma/semicolon separated string (e.g. "John Doe, Jane Smith
+            and Bob") or a list of names
+        
+    Returns:
+        List of participant names in their original order
+    """
+    if not participants:
+        return []
+    
+    if isinstance(participants, str):
+        participants = re.split(r"\s*(?:[,;]|\band\b|&)\s*", participants)
+    
+    names = []
+    seen = set()
+    for name in participants:
+        name = " ".join(name.strip(" .*_").split())
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    
+    return names
+
+
+def extract_metadata_from_filename(filename: str) -> Dict[str, Union[str, int]]:
     """
     Extract metadata from filename using pattern YYYY-MM-DD_MeetingTopic.ext
     
@@ -26,27 +106,21 @@ def extract_metadata_from_filename(filename: str) -> Dict[str, str]:
     metadata = {}
     
     # Extract date and topic from filename
-    date_match = re.match(r"(\d{4}-\d{2}-\d{2})_(.*)\\.(.*)$", filename)
+    date_match = re.match(r"(\d{4}-\d{2}-\d{2})_(.*)\.([^.]*)$", filename)
     if date_match:
         date_str, topic, _ = date_match.groups()
-        try:
-            # Validate date format
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-            metadata["date"] = date_str
-            metadata["year"] = date_obj.year
-            metadata["month"] = date_obj.month
-            metadata["day"] = date_obj.day
-        except ValueError:
-            pass
-        
-        # Clean up topic (replace underscores with spaces, etc.)
-        topic = topic.replace("_", " ").strip()
+        metadata.update(extract_date_metadata(date_str))
+        
+        # Clean up topic (replace underscores with spaces, split CamelCase, etc.)
+        topic = topic.replace("_", " ")
+        topic = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", topic)
+        topic = " ".join(topic.split())
         metadata["topic"] = topic
     
     return metadata
 
 
-def extract_metadata_from_content(content: str) -> Dict[str, str]:
+def extract_metadata_from_content(content: str) -> Dict[str, Union[str, int, List[str]]]:
     """
     Extract metadata from document content
     
@@ -58,11 +132,21 @@ def extract_metadata_from_content(content: str) -> Dict[str, str]:
     """
     metadata = {}
     
-    # Extract participants if they exist in the format "Participants: Person1, Person2"
-    participants_match = re.search(r"participants:?\s*(.+?)(?:\n|$)", content, re.IGNORECASE)
+    # Extract participants from a line like "Participants: Person1, Person2"
+    participants_match = re.search(
+        r"^[\s*_-]*participants[\s*_]*:[\s*_]*(.+?)\s*$", content, re.IGNORECASE | re.MULTILINE
+    )
     if participants_match:
-        participants = participants_match.group(1).strip()
-        metadata["participants"] = participants
+        participants = normalize_participants(participants_match.group(1))
+        if participants:
+            metadata["participants"] = participants
+    
+    # Extract the meeting date from a line like "Date: 2024-03-13"
+    date_match = re.search(
+        r"^[\s*_-]*date[\s*_]*:[\s*_]*(\d{4}-\d{2}-\d{2})", content, re.IGNORECASE | re.MULTILINE
+    )
+    if date_match:
+        metadata.update(extract_date_metadata(date_match.group(1)))
     
     return metadata
 
@@ -86,16 +170,20 @@ def load_document(file_path: Path) -> Tuple[Optional[Document], Dict[str, str]]:
     metadata["filename"] = file_path.name
     
     # Load document using TextLoader for both .md and .txt files
+    from langchain_community.document_loaders import TextLoader
+    
     try:
-        loader = TextLoader(str(file_path))
-        docs = loader.load()
+        with span("load_document", documents=1):
+            loader = TextLoader(str(file_path))
+            docs = loader.load()
         
         if not docs:
             return None, metadata
         
-        # Extract additional metadata from content
+        # Extract additional metadata from content (the filename wins for date fields)
         content_metadata = extract_metadata_from_content(docs[0].page_content)
-        metadata.update(content_metadata)
+        metadata = {**content_metadata, **metadata}
+        metadata["content_hash"] = compute_content_hash(docs[0].page_content)
         
         # Update document with metadata
         doc = docs[0]
@@ -107,23 +195,48 @@ def load_document(file_path: Path) -> Tuple[Optional[Document], Dict[str, str]]:
         return None, metadata
 
 
+@lru_cache(maxsize=1)
+def get_text_splitter() -> "RecursiveCharacterTextSplitter":
+    """
+    Get the text splitter, created once per process
+    
+    Returns:
+        Text splitter
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""],
+        add_start_index=True,
+    )
+
+
 def chunk_document(document: Document) -> List[Document]:
     """
     Split a document into chunks
     
+    With CHUNK_SPLITTER=markdown, chunks follow the sections of the meeting
+    template (see split_markdown) and list the headings they contain in a
+    "sections" metadata field.
+    
     Args:
         document: The document to split
         
     Returns:
         List of document chunks
     """
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        separators=["\n\n", "\n", ". ", " ", ""],
-    )
+    if CHUNK_SPLITTER == "markdown":
+        chunks = []
+        for start, text, headings in split_markdown(document.page_content, CHUNK_MAX_TOKENS):
+            metadata = {**document.metadata, "start_index": start}
+            if headings:
+                metadata["sections"] = headings
+            chunks.append(Document(page_content=text, metadata=metadata))
+        return chunks
     
-    chunks = text_splitter.split_documents([document])
+    chunks = get_text_splitter().split_documents([document])
     
     # Ensure all chunks have the same metadata
     for chunk in chunks:
@@ -132,30 +245,171 @@ def chunk_document(document: Document) -> List[Document]:
     return chunks
 
 
-def process_documents(directory: Optional[Path] = None) -> List[Document]:
+def _chunk_document_timed(document: Document) -> Tuple[List[Document], float]:
     """
-    Process all documents in the specified directory
+    Split a document into chunks, also returning the time it took
+    
+    Chunking runs in worker processes whose spans would be lost, so the
+    duration is sent back and recorded by the parent.
     
     Args:
-        directory: Directory containing documents to process
-        
+        document: The document to split
+    
     Returns:
-        List of processed document chunks
+        Tuple of (chunks, duration in seconds)
+    """
+    start = time.perf_counter()
+    chunks = chunk_document(document)
+    return chunks, time.perf_counter() - start
+
+
+def iter_document_paths(directory: Optional[Path] = None) -> Iterator[Path]:
+    """
+    Lazily yield all supported document files in the specified directory
+    
+    Args:
+        directory: Directory containing documents
+        
+    Yields:
+        Document file paths
     """
     if directory is None:
         directory = DOCUMENT_STORE_DIRECTORY
     
-    all_chunks = []
-    
-    # Walk through directory and process all files
+    # Walk through directory and yield all supported files
     for root, _, files in os.walk(directory):
         for file in files:
-            if file.endswith((".md", ".txt")):
-                file_path = Path(root) / file
-                doc, _ = load_document(file_path)
+            if file.endswith(SUPPORTED_EXTENSIONS):
+                yield Path(root) / file
+
+
+def discover_documents(directory: Optional[Path] = None) -> List[Path]:
+    """
+    Find all supported document files in the specified directory
+    
+    Args:
+        directory: Directory containing documents
+        
+    Returns:
+        Sorted list of document file paths
+    """
+    return sorted(iter_document_paths(directory))
+
+
+def _create_chunk_executor(chunk_workers: int) -> Executor:
+    """
+    Create the executor used for chunking
+    
+    Args:
+        chunk_workers: Number of chunking processes
+        
+    Returns:
+        A process pool, or a single thread when only one worker is requested
+    """
+    if chunk_workers <= 1:
+        return ThreadPoolExecutor(max_workers=1)
+    
+    # Workers are started on the first submit, while the loader threads (and
+    # any threads of the caller) are running; a child forked then can
+    # deadlock on a lock one of them held. They are forked from a fork
+    # server that has already imported the chunker instead, or spawned
+    # where there is none.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__, "langchain.text_splitter"])
+    else:
+        context = multiprocessing.get_context("spawn")
+    
+    return ProcessPoolExecutor(max_workers=chunk_workers, mp_context=context)
+
+
+def stream_documents(
+    file_paths: Iterable[Path],
+    filter_fn: Optional[Callable[[Path, Dict], bool]] = None,
+    load_workers: Optional[int] = None,
+    chunk_workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+) -> Iterator[Tuple[Path, Dict, Optional[List[Document]]]]:
+    """
+    Load and chunk documents in parallel, yielding results as they complete
+    
+    Files are loaded in a thread pool and chunked in a process pool. At most
+    max_pending files are in flight at once, so memory stays flat no matter
+    how many paths are supplied, and the consumer can embed earlier results
+    while later files are still being read.
+    
+    Args:
+        file_paths: Paths of the files to process (may be a lazy iterator)
+        filter_fn: Called with (file_path, metadata) after loading; files for
+            which it returns False are not chunked
+        load_workers: Number of loader threads
+        chunk_workers: Number of chunking processes
+        max_pending: Maximum number of files in flight
+        
+    Yields:
+        Tuples of (file_path, metadata, chunks), where chunks is None if the
+        file could not be loaded or was filtered out
+    """
+    load_workers = load_workers or INGEST_LOAD_WORKERS
+    chunk_workers = chunk_workers or INGEST_CHUNK_WORKERS
+    max_pending = max_pending or INGEST_MAX_PENDING
+    
+    path_iter = iter(file_paths)
+    
+    with ThreadPoolExecutor(max_workers=load_workers) as loader, \
+            _create_chunk_executor(chunk_workers) as chunker:
+        pending = {}
+        
+        def fill():
+            while len(pending) < max_pending:
+                file_path = next(path_iter, None)
+                if file_path is None:
+                    return
+                pending[loader.submit(load_document, file_path)] = ("load", file_path, None)
+        
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, file_path, metadata = pending.pop(future)
                 
-                if doc:
-                    chunks = chunk_document(doc)
-                    all_chunks.extend(chunks)
+                if stage == "load":
+                    doc, metadata = future.result()
+                    if doc is None or (filter_fn and not filter_fn(file_path, metadata)):
+                        yield file_path, metadata, None
+                    elif is_active():
+                        pending[chunker.submit(_chunk_document_timed, doc)] = ("timed_chunk", file_path, metadata)
+                    else:
+                        pending[chunker.submit(chunk_document, doc)] = ("chunk", file_path, metadata)
+                elif stage == "timed_chunk":
+                    chunks, duration = future.result()
+                    record("chunk_document", duration, chunks=len(chunks))
+                    yield file_path, metadata, chunks
+                else:
+                    yield file_path, metadata, future.result()
+            
+            fill()
+
+
+def process_documents(directory: Optional[Path] = None) -> List[Document]:
+    """
+    Process all documents in the specified directory
+    
+    Args:
+        directory: Directory containing documents to process
+        
+    Returns:
+        List of processed document chunks, ordered by source
+    """
+    chunks_by_path = []
+    
+    for file_path, _, chunks in stream_documents(iter_document_paths(directory)):
+        if chunks:
+            chunks_by_path.append((file_path, chunks))
+    
+    # Files complete in any order; sort so the result does not depend on timing
+    all_chunks = []
+    for _, chunks in sorted(chunks_by_path, key=lambda item: item[0]):
+        all_chunks.extend(chunks)
     
     return all_chunks
\ No newline at end of file
@@ -0,0 +1,402 @@
+# Embedding cache module for the RAG system
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from langchain_core.embeddings import Embeddings
+
+from src.config import EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_PATH
+
+
+# Cache hits are marked as recently used in batches of this many keys
+LAST_ACCESS_BATCH_SIZE = 256
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text before hashing so insignificant whitespace does not miss the cache
+
+    Args:
+        text: Text to normalize
+
+    Returns:
+        Normalized text
+    """
+    return " ".join(text.split())
+
+
+def make_cache_key(model_name: str, text: str) -> str:
+    """
+    Build the cache key for a text embedded with a given model
+
+    Args:
+        model_name: Name of the embedding model
+        text: Text to embed
+
+    Returns:
+        Cache key
+    """
+    text_hash = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model_name}:{text_hash}"
+
+
+def _to_float32(vector: List[float]) -> List[float]:
+    """
+    Round a vector to float32 so fresh and cached results are identical
+
+    Args:
+        vector: Embedding vector
+
+    Returns:
+        Rounded vector
+    """
+    return array("f", vector).tolist()
+
+
+class EmbeddingCache:
+    """
+    Disk-backed, size-bounded LRU store of embedding vectors in SQLite
+
+    The entry count is tracked in memory and re-read from the database every
+    tenth of max_entries inserts, so rows added by other processes sharing
+    the file are bounded too. Hits update last_access in batches, written
+    before any eviction.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        max_entries: Optional[int] = None,
+    ):
+        """
+        Open (or create) an embedding cache
+
+        Args:
+            path: Path to the SQLite database file
+            max_entries: Maximum number of vectors to keep before evicting
+        """
+        self.path = Path(path) if path is not None else EMBEDDING_CACHE_PATH
+        self.max_entries = max_entries if max_entries is not None else EMBEDDING_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._inserted_since_count = 0
+
+    def _flush_touched(self) -> None:
+        """
+        Write the pending last_access updates of cache hits (caller holds the lock)
+        """
+        if not self._touched:
+            return
+
+        self._conn.executemany(
+            "UPDATE embeddings SET last_access = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self._touched.items()],
+        )
+        self._conn.commit()
+        self._touched = {}
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached vectors and mark them as recently used
+
+        Args:
+            keys: Cache keys to look up
+
+        Returns:
+            Dict mapping found keys to their vectors
+        """
+        found = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            if found:
+                now = time.time()
+                for key in found:
+                    self._touched[key] = now
+                if len(self._touched) >= LAST_ACCESS_BATCH_SIZE:
+                    self._flush_touched()
+
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        """
+        Store vectors and evict the least recently used entries over the size bound
+
+        Args:
+            items: Dict mapping cache keys to vectors
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+
+        with self._lock:
+            # A key already present holds the same vector, so it is left as is
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                rows,
+            ).rowcount
+            self._count += inserted
+            self._inserted_since_count += inserted
+            if self._inserted_since_count >= max(self.max_entries // 10, 1):
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                self._inserted_since_count = 0
+
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                self._flush_touched()
+                self._count -= self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                ).rowcount
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """
+        Remove all cached vectors and reset the statistics
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._touched = {}
+            self._count = 0
+            self._inserted_since_count = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dict with hits, misses, hit_rate and entries
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._count = entries
+            self._inserted_since_count = 0
+            total = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": entries,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves document and query vectors from an EmbeddingCache
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache):
+        """
+        Wrap an embeddings implementation with a cache
+
+        Args:
+            embeddings: Underlying embeddings implementation
+            model_name: Name of the embedding model, part of every cache key
+            cache: Cache to read from and write to
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def _lookup(self, texts: List[str]) -> Tuple[List[str], Dict[str, List[float]], Dict[str, str]]:
+        """
+        Look up texts in the cache
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Tuple of (keys, cached vectors by key, missing texts by key)
+        """
+        keys = [make_cache_key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Embed each missing text only once, even if it repeats in the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        return keys, vectors, missing
+
+    def _store(self, missing: Dict[str, str], new_vectors: List[List[float]]) -> Dict[str, List[float]]:
+        """
+        Store freshly computed vectors
+
+        Args:
+            missing: Missing texts by key, in the order they were embedded
+            new_vectors: Embeddings of the missing texts
+
+        Returns:
+            Dict mapping keys to the stored (float32-rounded) vectors
+        """
+        computed = {key: _to_float32(vector) for key, vector in zip(missing.keys(), new_vectors)}
+        self.cache.put_many(computed)
+        return computed
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, calling the underlying model only for cache misses
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            List of embeddings
+        """
+        keys, vectors, missing = self._lookup(texts)
+        if missing:
+            vectors.update(self._store(missing, self.embeddings.embed_documents(list(missing.values()))))
+
+        return [vectors[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents asynchronously, calling the underlying model only for cache misses
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            List of embeddings
+        """
+        # SQLite calls block, so they run in a thread to keep the event loop free
+        keys, vectors, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            new_vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            vectors.update(await asyncio.to_thread(self._store, missing, new_vectors))
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, reusing the cached vector for repeated questions
+
+        Args:
+            text: Query text
+
+        Returns:
+            Embedding
+        """
+        key = make_cache_key(f"{self.model_name}:query", text)
+        vectors = self.cache.get_many([key])
+        if key in vectors:
+            return vectors[key]
+
+        vector = _to_float32(self.embeddings.embed_query(text))
+        self.cache.put_many({key: vector})
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several queries, calling the underlying model once for all cache misses
+
+        Args:
+            texts: Query texts
+
+        Returns:
+            List of embeddings
+        """
+        keys = [make_cache_key(f"{self.model_name}:query", text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        if missing:
+            missing_texts = list(missing.values())
+            if hasattr(self.embeddings, "embed_queries"):
+                new_vectors = self.embeddings.embed_queries(missing_texts)
+            else:
+                new_vectors = [self.embeddings.embed_query(text) for text in missing_texts]
+            vectors.update(self._store(missing, new_vectors))
+
+        return [vectors[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Embed a query asynchronously, reusing the cached vector for repeated questions
+
+        Args:
+            text: Query text
+
+        Returns:
+            Embedding
+        """
+        key = make_cache_key(f"{self.model_name}:query", text)
+        vectors = await asyncio.to_thread(self.cache.get_many, [key])
+        if key in vectors:
+            return vectors[key]
+
+        vector = _to_float32(await self.embeddings.aembed_query(text))
+        await asyncio.to_thread(self.cache.put_many, {key: vector})
+        return vector
+
+
+_embedding_caches: Dict[str, EmbeddingCache] = {}
+
+
+def get_embedding_cache(path: Optional[Union[str, Path]] = None) -> EmbeddingCache:
+    """
+    Get the shared embedding cache for a path, opening it on first use
+
+    Args:
+        path: Path to the SQLite database file
+
+    Returns:
+        EmbeddingCache
+    """
+    cache_path = str(path if path is not None else EMBEDDING_CACHE_PATH)
+    if cache_path not in _embedding_caches:
+        _embedding_caches[cache_path] = EmbeddingCache(cache_path)
+
+    return _embedding_caches[cache_path]
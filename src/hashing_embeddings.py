@@ -0,0 +1,151 @@
+# Hashing embeddings module for the RAG system
+
+import re
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+from langchain_core.embeddings import Embeddings
+
+from src.ivf_index import normalize_rows
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['_-][a-z0-9]+)*")
+
+# Words too common in meeting notes to tell chunks apart; dropped before hashing
+STOPWORDS = frozenset(
+    """
+    a an and are as at be been but by can could did do does for from had has have he her his i if in
+    into is it its me my no not of on or our she so than that the their them then there these they
+    this to us was we were what when where which who will with would you your
+    """.split()
+)
+
+# Weight of a pair of adjacent words relative to a single word
+BIGRAM_WEIGHT = 0.5
+
+# Hashed features remembered before the cache is cleared
+MAX_CACHED_FEATURES = 1_000_000
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeddings computed in-process on CPU from hashed word features
+
+    Each text is split into lowercase words (without stopwords) and pairs
+    of adjacent words. Every feature is hashed with CRC32 into one of
+    `dimensions` columns, with the sign taken from the hash so collisions
+    tend to cancel. Counts are damped with log(1 + count) and each row is
+    normalized to unit length. The embedding of a text depends only on the
+    text, so nothing is fitted on the corpus and chunks never need to be
+    re-embedded when notes are added.
+
+    A batch is turned into one feature array and summed into the embedding
+    matrix with a single np.bincount. Large calls are split into batches that
+    run in a thread pool. The feature hashes of recent words are cached.
+    """
+
+    def __init__(
+        self,
+        dimensions: int = 1024,
+        batch_size: int = 256,
+        max_workers: int = 1,
+    ):
+        """
+        Create a hashing embedding model
+
+        Args:
+            dimensions: Embedding size
+            batch_size: Texts embedded per batch
+            max_workers: Threads embedding batches of one call in parallel
+        """
+        self.dimensions = dimensions
+        self.model_name = f"hashing/{dimensions}"
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self._hashes = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _hash(self, feature: str) -> int:
+        code = self._hashes.get(feature)
+        if code is None:
+            if len(self._hashes) >= MAX_CACHED_FEATURES:
+                self._hashes = {}
+            code = self._hashes[feature] = zlib.crc32(feature.encode("utf-8"))
+        return code
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Float32 matrix with one unit-length row per text (zero for texts without words)
+        """
+        codes = []
+        weights = []
+        counts = []
+        for text in texts:
+            words = [word for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+            pairs = [f"{first} {second}" for first, second in zip(words, words[1:])]
+            codes.extend(map(self._hash, words))
+            codes.extend(map(self._hash, pairs))
+            weights.extend([1.0] * len(words) + [BIGRAM_WEIGHT] * len(pairs))
+            counts.append(len(words) + len(pairs))
+
+        hashes = np.fromiter(codes, dtype=np.uint32, count=len(codes))
+        signed = np.where(hashes >> 31, -1.0, 1.0) * np.asarray(weights)
+        rows = np.repeat(np.arange(len(texts)), counts)
+        columns = (hashes % self.dimensions).astype(np.int64)
+        matrix = np.bincount(
+            rows * self.dimensions + columns, weights=signed, minlength=len(texts) * self.dimensions
+        ).reshape(len(texts), self.dimensions)
+
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        return normalize_rows(matrix).astype(np.float32)
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts into a matrix, in parallel batches for large calls
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Float32 matrix with one row per text
+        """
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.max_workers <= 1:
+            return np.vstack([self._embed_batch(batch) for batch in batches])
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="hashing-embeddings")
+        return np.vstack(list(self._executor.map(self._embed_batch, batches)))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_matrix(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several queries; queries are embedded like documents
+
+        Args:
+            texts: Query texts
+
+        Returns:
+            List of embeddings, in the order of texts
+        """
+        return self.embed_documents(texts)
@@ -0,0 +1,376 @@
+# Index manifest module for the RAG system
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from src.config import (
+    CHROMA_PERSIST_DIRECTORY,
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    CHUNK_SPLITTER,
+    get_embedding_model_name,
+)
+
+
+MANIFEST_FILENAME = "index_manifest.json"
+MANIFEST_FORMAT_VERSION = 3
+
+# Name of the embedding model that built an index, checked before it is queried or updated
+EMBEDDING_MODEL_FILENAME = "embedding_model.json"
+
+# Chunking settings recorded with each file, so files are re-chunked when they change
+CHUNKER_SIGNATURE = (
+    f"markdown:{CHUNK_MAX_TOKENS}"
+    if CHUNK_SPLITTER == "markdown"
+    else f"recursive:{CHUNK_SIZE}:{CHUNK_OVERLAP}"
+)
+
+
+def get_index_directory(
+    persist_directory: Optional[Union[str, Path]] = None,
+    model_name: Optional[str] = None,
+) -> Path:
+    """
+    Get the directory of the index built with one embedding model
+
+    Vectors of different models cannot be searched together, so each model
+    has its own vector store, manifest and side indexes under persist_directory.
+
+    Args:
+        persist_directory: Directory holding the indexes (defaults to CHROMA_PERSIST_DIRECTORY)
+        model_name: Embedding model name (defaults to get_embedding_model_name())
+
+    Returns:
+        Path of the model's index, e.g. data/chroma/openai-text-embedding-3-small
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+    if model_name is None:
+        model_name = get_embedding_model_name()
+
+    return Path(persist_directory) / re.sub(r"[^A-Za-z0-9._-]+", "-", model_name)
+
+
+def load_embedding_model_name(persist_directory: Optional[Union[str, Path]] = None) -> Optional[str]:
+    """
+    Load the name of the embedding model that built an index
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        Model name, or None if none is recorded
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+
+    try:
+        with open(Path(persist_directory) / EMBEDDING_MODEL_FILENAME, "r") as f:
+            return json.load(f).get("embedding_model")
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Error loading embedding model of {persist_directory}: {e}")
+        return None
+
+
+def check_embedding_model(
+    persist_directory: Optional[Union[str, Path]],
+    model_name: Optional[str],
+) -> None:
+    """
+    Check that an index was built with an embedding model
+
+    Indexes without a recorded model, and models without a name, pass.
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+        model_name: Name of the model embedding queries or documents
+
+    Raises:
+        ValueError: If the index was built with another model
+    """
+    recorded = load_embedding_model_name(persist_directory)
+    if recorded is not None and model_name is not None and recorded != model_name:
+        raise ValueError(
+            f"Index at {persist_directory or CHROMA_PERSIST_DIRECTORY} was built with {recorded}, "
+            f"not {model_name}; use the index directory of {model_name} (see get_index_directory)"
+        )
+
+
+def record_embedding_model(
+    persist_directory: Optional[Union[str, Path]],
+    model_name: Optional[str],
+) -> None:
+    """
+    Record the embedding model of an index, after checking it matches the recorded one
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+        model_name: Name of the model embedding the documents
+
+    Raises:
+        ValueError: If the index was built with another model
+    """
+    check_embedding_model(persist_directory, model_name)
+    if model_name is None or load_embedding_model_name(persist_directory) is not None:
+        return
+
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+    path = Path(persist_directory) / EMBEDDING_MODEL_FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"embedding_model": model_name}, f)
+    os.replace(tmp_path, path)
+
+
+def get_manifest_path(persist_directory: Optional[Union[str, Path]] = None) -> Path:
+    """
+    Get the path of the manifest file for a vector store
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        Path to the manifest file
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+
+    return Path(persist_directory) / MANIFEST_FILENAME
+
+
+def load_manifest(persist_directory: Optional[Union[str, Path]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the index manifest
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        Dict mapping source paths to their manifest entries
+    """
+    manifest_path = get_manifest_path(persist_directory)
+    if not manifest_path.exists():
+        return {}
+
+    try:
+        with open(manifest_path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error loading index manifest {manifest_path}: {e}")
+        return {}
+
+    if data.get("format_version") != MANIFEST_FORMAT_VERSION:
+        return {}
+
+    return data.get("files", {})
+
+
+def save_manifest(
+    manifest: Dict[str, Dict[str, Any]],
+    persist_directory: Optional[Union[str, Path]] = None,
+) -> None:
+    """
+    Save the index manifest atomically
+
+    Args:
+        manifest: Dict mapping source paths to their manifest entries
+        persist_directory: Directory where the vector store is persisted
+    """
+    manifest_path = get_manifest_path(persist_directory)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+
+    data = {
+        "format_version": MANIFEST_FORMAT_VERSION,
+        "corpus_version": compute_corpus_version(manifest),
+        "files": manifest,
+    }
+
+    # Write to a temporary file first so a crash never leaves a truncated manifest
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def compute_corpus_version(manifest: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Compute a stamp that changes whenever the indexed content changes
+
+    Only sources, content hashes and chunker settings are included, so
+    re-chunking changes the version but refreshing file fingerprints
+    (mtime, size) keeps it.
+
+    Args:
+        manifest: Dict mapping source paths to their manifest entries
+
+    Returns:
+        Hex digest identifying the indexed corpus
+    """
+    digest = hashlib.sha256()
+    for source in sorted(manifest):
+        entry = manifest[source]
+        digest.update(
+            f"{source}\0{entry.get('content_hash', '')}\0{entry.get('chunker', '')}\n".encode("utf-8")
+        )
+    return digest.hexdigest()[:16]
+
+
+_corpus_versions: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+
+def get_corpus_version(persist_directory: Optional[Union[str, Path]] = None) -> str:
+    """
+    Get the corpus version stamp of a vector store
+
+    The manifest is only re-read when its file changes, so this is cheap
+    enough to call on every query.
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        Corpus version, or an empty string if nothing has been indexed
+    """
+    manifest_path = get_manifest_path(persist_directory)
+    try:
+        stat = manifest_path.stat()
+    except OSError:
+        return ""
+
+    fingerprint = (stat.st_mtime_ns, stat.st_size)
+    cached = _corpus_versions.get(str(manifest_path))
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    try:
+        with open(manifest_path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return ""
+
+    version = data.get("corpus_version") or compute_corpus_version(data.get("files", {}))
+    _corpus_versions[str(manifest_path)] = (fingerprint, version)
+    return version
+
+
+def delete_manifest(persist_directory: Optional[Union[str, Path]] = None) -> None:
+    """
+    Delete the index manifest and the recorded embedding model if they exist
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+    """
+    manifest_path = get_manifest_path(persist_directory)
+    for path in (manifest_path, manifest_path.with_name(EMBEDDING_MODEL_FILENAME)):
+        if path.exists():
+            path.unlink()
+
+
+def compute_content_hash(content: str) -> str:
+    """
+    Compute a stable hash of document content
+
+    Args:
+        content: The document content
+
+    Returns:
+        Hex digest of the content
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def generate_document_id(source: str, content_hash: str) -> str:
+    """
+    Generate a deterministic, compact ID for a document version
+
+    Args:
+        source: Source path of the document
+        content_hash: Hash of the document content
+
+    Returns:
+        Document ID (16 hex digits)
+    """
+    return hashlib.sha1(f"{source}\0{content_hash}".encode("utf-8")).hexdigest()[:16]
+
+
+def generate_chunk_ids(source: str, content_hash: str, count: int) -> List[str]:
+    """
+    Generate deterministic chunk IDs for a document version
+
+    Args:
+        source: Source path of the document
+        content_hash: Hash of the document content
+        count: Number of chunks
+
+    Returns:
+        List of chunk IDs, prefixed with the document ID
+    """
+    doc_id = generate_document_id(source, content_hash)
+    return [f"{doc_id}-{i}" for i in range(count)]
+
+
+def is_file_unchanged(entry: Optional[Dict[str, Any]], file_path: Path) -> bool:
+    """
+    Check whether a file still matches its manifest entry by mtime and size
+
+    Args:
+        entry: Manifest entry for the file
+        file_path: Path to the file
+
+    Returns:
+        True if the file's mtime and size match the entry and it was chunked
+        with the current settings
+    """
+    if not entry or entry.get("chunker") != CHUNKER_SIGNATURE:
+        return False
+
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return False
+
+    return entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size
+
+
+def make_manifest_entry(
+    file_path: Path,
+    content_hash: str,
+    chunk_ids: List[str],
+) -> Dict[str, Any]:
+    """
+    Build a manifest entry for an indexed file
+
+    Args:
+        file_path: Path to the file
+        content_hash: Hash of the file content
+        chunk_ids: IDs of the chunks stored for the file
+
+    Returns:
+        Manifest entry
+    """
+    entry = {
+        "mtime": None,
+        "size": None,
+        "content_hash": content_hash,
+        "chunk_ids": chunk_ids,
+        "chunker": CHUNKER_SIGNATURE,
+    }
+
+    try:
+        stat = file_path.stat()
+        entry["mtime"] = stat.st_mtime
+        entry["size"] = stat.st_size
+    except OSError:
+        pass
+
+    return entry
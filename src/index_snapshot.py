@@ -0,0 +1,448 @@
+# Index snapshot module for the RAG system
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+
+import numpy as np
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.config import CHROMA_PERSIST_DIRECTORY
+from src.index_manifest import check_embedding_model, load_manifest, record_embedding_model, save_manifest
+from src.index_swap import activate_index_version, create_index_version
+from src.metadata_index import get_metadata_index
+from src.sharded_store import ShardedVectorStore
+from src.vector_store import (
+    add_embeddings,
+    close_side_indexes,
+    get_embedding_model,
+    get_side_indexes,
+    open_vector_store,
+    resolve_embedding_model_name,
+)
+
+
+SNAPSHOT_MAGIC = b"RAGSNAP\0"
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Fixed prefix of a snapshot file: magic, format version, flags, header
+# offset and length, and the SHA-256 of the header
+PREFIX = struct.Struct("<8sIIQQ32s")
+
+# Sections start at multiples of this, so arrays are mapped aligned
+SECTION_ALIGNMENT = 64
+
+# Chunks read from or written to a vector store at a time
+PAGE_SIZE = 500
+
+
+class _SnapshotWriter:
+    """
+    Writes checksummed, aligned sections to a snapshot file
+    """
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.sections: Dict[str, Dict[str, Any]] = {}
+        self._current: Optional[Dict[str, Any]] = None
+        self._hash = None
+        # The prefix is written last, once the header offset is known
+        f.write(b"\0" * PREFIX.size)
+
+    def begin(self, name: str, **info: Any) -> None:
+        self.f.write(b"\0" * (-self.f.tell() % SECTION_ALIGNMENT))
+        self._current = {"offset": self.f.tell(), "length": 0, **info}
+        self.sections[name] = self._current
+        self._hash = hashlib.sha256()
+
+    def write(self, data: bytes) -> None:
+        self.f.write(data)
+        self._hash.update(data)
+        self._current["length"] += len(data)
+
+    def end(self) -> None:
+        self._current["sha256"] = self._hash.hexdigest()
+        self._current = None
+
+    def add(self, name: str, data: bytes, **info: Any) -> None:
+        self.begin(name, **info)
+        self.write(data)
+        self.end()
+
+    def copy(self, name: str, source: BinaryIO) -> None:
+        source.seek(0)
+        self.begin(name)
+        while True:
+            data = source.read(1 << 20)
+            if not data:
+                break
+            self.write(data)
+        self.end()
+
+    def finish(self, header: Dict[str, Any]) -> None:
+        data = json.dumps({**header, "sections": self.sections}).encode("utf-8")
+        offset = self.f.tell()
+        self.f.write(data)
+        self.f.seek(0)
+        self.f.write(PREFIX.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, 0, offset, len(data), hashlib.sha256(data).digest(),
+        ))
+
+
+class IndexSnapshot:
+    """
+    Read-only, memory-mapped view of an index snapshot file
+
+    A snapshot holds the chunk embeddings as one float32 matrix, the chunk
+    IDs, texts and metadata, the documents' metadata, the index manifest and
+    the name of the embedding model. Opening it reads and checks only the
+    header; embeddings are a NumPy view of the mapped file and texts and
+    metadata are decoded when they are read.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open a snapshot file
+
+        Args:
+            path: Path to the snapshot file
+
+        Raises:
+            ValueError: If the file is not a snapshot, has an unsupported
+                format version or a corrupt header
+        """
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Not an index snapshot: {self.path}")
+
+        if len(self._mmap) < PREFIX.size or self._mmap[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError(f"Not an index snapshot: {self.path}")
+        _, version, _, header_offset, header_length, header_digest = PREFIX.unpack_from(self._mmap)
+        if version != SNAPSHOT_FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Unsupported index snapshot format {version}: {self.path}")
+        header = self._mmap[header_offset:header_offset + header_length]
+        if hashlib.sha256(header).digest() != header_digest:
+            self.close()
+            raise ValueError(f"Corrupt index snapshot header: {self.path}")
+
+        self.header = json.loads(header)
+        self.embedding_model = self.header["embedding_model"]
+        self.count = self.header["count"]
+        self.dimensions = self.header["dimensions"]
+        self._ids: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "IndexSnapshot":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the file; arrays still referencing it keep the mapping alive
+        """
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def _bytes(self, name: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        section = self.header["sections"][name]
+        end = section["length"] if end is None else end
+        return self._mmap[section["offset"] + start:section["offset"] + end]
+
+    def _array(self, name: str, dtype: str) -> np.ndarray:
+        section = self.header["sections"][name]
+        dtype = np.dtype(dtype)
+        return np.frombuffer(
+            self._mmap, dtype=dtype, count=section["length"] // dtype.itemsize, offset=section["offset"],
+        )
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """
+        Embedding matrix with one row per chunk, mapped from the file
+        """
+        section = self.header["sections"]["embeddings"]
+        return self._array("embeddings", section["dtype"]).reshape(section["shape"])
+
+    @property
+    def ids(self) -> List[str]:
+        """
+        Chunk IDs, in the order of the embedding rows
+        """
+        if self._ids is None:
+            data = self._bytes("ids").decode("utf-8")
+            self._ids = data.split("\n") if data else []
+        return self._ids
+
+    def texts(self, start: int = 0, end: Optional[int] = None) -> List[str]:
+        """
+        Get the texts of a range of chunks
+
+        Args:
+            start: First chunk
+            end: End of the range (defaults to the last chunk)
+
+        Returns:
+            Chunk texts
+        """
+        offsets = self._array("text_offsets", "int64")[start:(self.count if end is None else end) + 1]
+        data = self._bytes("texts", int(offsets[0]), int(offsets[-1])) if len(offsets) else b""
+        return [
+            data[begin - offsets[0]:finish - offsets[0]].decode("utf-8")
+            for begin, finish in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+        ]
+
+    def metadatas(self, start: int = 0, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get the stored metadata of a range of chunks
+
+        Args:
+            start: First chunk
+            end: End of the range (defaults to the last chunk)
+
+        Returns:
+            Chunk metadata as stored in the vector store
+        """
+        offsets = self._array("metadata_offsets", "int64")[start:(self.count if end is None else end) + 1]
+        data = self._bytes("metadatas", int(offsets[0]), int(offsets[-1])) if len(offsets) else b""
+        return [
+            json.loads(data[begin - offsets[0]:finish - offsets[0]])
+            for begin, finish in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+        ]
+
+    @property
+    def document_metadata(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Metadata of each document, by document ID
+        """
+        return json.loads(self._bytes("documents"))
+
+    @property
+    def manifest(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Index manifest of the exported store
+        """
+        return json.loads(self._bytes("manifest"))
+
+    def verify(self) -> None:
+        """
+        Check every section against its checksum
+
+        Raises:
+            ValueError: If a section is corrupt
+        """
+        for name, section in self.header["sections"].items():
+            digest = hashlib.sha256()
+            with memoryview(self._mmap) as view:
+                digest.update(view[section["offset"]:section["offset"] + section["length"]])
+            if digest.hexdigest() != section["sha256"]:
+                raise ValueError(f"Corrupt index snapshot section {name}: {self.path}")
+
+
+def export_index(
+    path: Union[str, Path],
+    persist_directory: Optional[Union[str, Path]] = None,
+    embedding_model: Optional[Embeddings] = None,
+    backend: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Export an index to a single snapshot file
+
+    The file is written next to path and renamed into place, so an existing
+    snapshot is only replaced by a complete one.
+
+    Args:
+        path: Path of the snapshot file
+        persist_directory: Directory where the vector store is persisted
+        embedding_model: Embedding model to open the store with (defaults to get_embedding_model())
+        backend: Backend whose embedding model built the index (defaults to DEFAULT_BACKEND)
+
+    Returns:
+        Snapshot header (embedding_model, count, dimensions, ...)
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+    model_name = resolve_embedding_model_name(embedding_model, backend)
+    check_embedding_model(persist_directory, model_name)
+    if embedding_model is None:
+        embedding_model = get_embedding_model(backend)
+
+    vector_store = open_vector_store(persist_directory, embedding_model)
+    metadata_index = get_metadata_index(persist_directory)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+
+    ids: List[str] = []
+    text_offsets = [0]
+    metadata_offsets = [0]
+    documents: Dict[str, Dict[str, Any]] = {}
+    dimensions = 0
+    with open(tmp_path, "wb") as f, tempfile.TemporaryFile() as texts, tempfile.TemporaryFile() as metadatas:
+        writer = _SnapshotWriter(f)
+
+        # Embeddings go straight to the file; the other columns are spooled
+        # and appended after them
+        writer.begin("embeddings", dtype="float32")
+        while True:
+            results = vector_store.get(
+                include=["embeddings", "documents", "metadatas"], limit=PAGE_SIZE, offset=len(ids)
+            )
+            if not results["ids"]:
+                break
+
+            embeddings = np.ascontiguousarray(results["embeddings"], dtype=np.float32)
+            dimensions = embeddings.shape[1]
+            writer.write(embeddings.tobytes())
+            page_metadatas = [metadata or {} for metadata in results["metadatas"]]
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], page_metadatas):
+                ids.append(chunk_id)
+                encoded = text.encode("utf-8")
+                texts.write(encoded)
+                text_offsets.append(text_offsets[-1] + len(encoded))
+                encoded = json.dumps(metadata, separators=(",", ":")).encode("utf-8")
+                metadatas.write(encoded)
+                metadata_offsets.append(metadata_offsets[-1] + len(encoded))
+            documents.update(metadata_index.get_document_metadata(
+                [metadata["doc_id"] for metadata in page_metadatas if "doc_id" in metadata]
+            ))
+        writer.end()
+        writer.sections["embeddings"]["shape"] = [len(ids), dimensions]
+
+        writer.add("ids", "\n".join(ids).encode("utf-8"))
+        writer.add("text_offsets", np.array(text_offsets, dtype=np.int64).tobytes())
+        writer.copy("texts", texts)
+        writer.add("metadata_offsets", np.array(metadata_offsets, dtype=np.int64).tobytes())
+        writer.copy("metadatas", metadatas)
+        writer.add("documents", json.dumps(documents).encode("utf-8"))
+        writer.add("manifest", json.dumps(load_manifest(persist_directory)).encode("utf-8"))
+
+        header = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "created_at": time.time(),
+            "embedding_model": model_name,
+            "count": len(ids),
+            "dimensions": dimensions,
+        }
+        writer.finish(header)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    return header
+
+
+def import_index(
+    path: Union[str, Path],
+    persist_directory: Optional[Union[str, Path]] = None,
+    embedding_model: Optional[Embeddings] = None,
+    backend: Optional[str] = None,
+    verify: bool = True,
+) -> int:
+    """
+    Replace an index with the contents of a snapshot file, without re-embedding
+
+    The snapshot is loaded into a new index version, which is swapped in
+    once complete (see src.index_swap), so readers keep using the current
+    index until then.
+
+    Args:
+        path: Path of the snapshot file
+        persist_directory: Directory where the vector store is persisted
+        embedding_model: Embedding model to open the store with (defaults to get_embedding_model())
+        backend: Backend that will embed queries against the index (defaults to DEFAULT_BACKEND)
+        verify: Check the checksum of every section before loading
+
+    Returns:
+        Number of chunks imported
+
+    Raises:
+        ValueError: If the snapshot is corrupt, or its embeddings come from
+            a different model than the backend embeds queries with
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+
+    with IndexSnapshot(path) as snapshot:
+        expected_model = resolve_embedding_model_name(embedding_model, backend)
+        if snapshot.embedding_model != expected_model:
+            raise ValueError(
+                f"Snapshot embeddings come from {snapshot.embedding_model}, "
+                f"but queries are embedded with {expected_model}"
+            )
+        if verify:
+            snapshot.verify()
+        if embedding_model is None:
+            embedding_model = get_embedding_model(backend)
+
+        version = create_index_version(persist_directory)
+        try:
+            _load_snapshot(snapshot, version, embedding_model)
+        except Exception:
+            close_side_indexes(version)
+            shutil.rmtree(version, ignore_errors=True)
+            raise
+
+    activate_index_version(version, persist_directory)
+    return snapshot.count
+
+
+def _load_snapshot(snapshot: IndexSnapshot, persist_directory: Path, embedding_model: Embeddings) -> None:
+    """
+    Load a snapshot into an empty vector store and its side indexes
+
+    Args:
+        snapshot: Open snapshot
+        persist_directory: Directory of the new vector store
+        embedding_model: Embedding model to open the store with
+    """
+    record_embedding_model(persist_directory, snapshot.embedding_model)
+    vector_store = open_vector_store(persist_directory, embedding_model)
+    side_indexes = get_side_indexes(persist_directory)
+    ids = snapshot.ids
+    embeddings = snapshot.embeddings
+    documents = snapshot.document_metadata
+
+    for start in range(0, snapshot.count, PAGE_SIZE):
+        end = min(start + PAGE_SIZE, snapshot.count)
+        texts = snapshot.texts(start, end)
+        metadatas = snapshot.metadatas(start, end)
+
+        # Side indexes and shards need the documents' full metadata
+        chunks = [
+            Document(page_content=text, metadata={**documents.get(metadata.get("doc_id"), {}), **metadata})
+            for text, metadata in zip(texts, metadatas)
+        ]
+        shard_names = None
+        if isinstance(vector_store, ShardedVectorStore):
+            shard_names = [vector_store.shard_name(chunk.metadata) for chunk in chunks]
+        add_embeddings(vector_store, ids[start:end], embeddings[start:end], texts, metadatas, shard_names)
+
+        for index in side_indexes:
+            index.add_documents(ids[start:end], chunks)
+
+    vector_store.persist()
+    save_manifest(snapshot.manifest, persist_directory)
+    for index in side_indexes:
+        index.save()
@@ -0,0 +1,355 @@
+# Index swap module for the RAG system
+
+import ctypes
+import ctypes.util
+import datetime
+import errno
+import os
+import re
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+from langchain_core.embeddings import Embeddings
+
+from src.config import CHROMA_PERSIST_DIRECTORY, DOCUMENT_STORE_DIRECTORY, INDEX_KEEP_VERSIONS, get_embedding_model_name
+from src.index_manifest import (
+    EMBEDDING_MODEL_FILENAME,
+    MANIFEST_FILENAME,
+    check_embedding_model,
+    get_index_directory,
+    get_manifest_path,
+    load_embedding_model_name,
+    record_embedding_model,
+)
+from src.lexical_index import LEXICAL_INDEX_DIRNAME
+from src.metadata_index import METADATA_INDEX_FILENAME
+from src.numpy_store import NUMPY_STORE_DIRNAME
+from src.sharded_store import SHARD_MAP_FILENAME, SHARDS_DIRNAME
+from src.structured_index import STRUCTURED_INDEX_FILENAME
+from src.vector_store import close_side_indexes, sync_vector_store
+
+
+VERSIONS_SUFFIX = ".versions"
+
+# Prefix of the name given to a plain index directory when it is first
+# replaced; sorts before the timestamped versions
+INITIAL_VERSION_PREFIX = "0-initial"
+
+# Files and directories of an index kept directly in CHROMA_PERSIST_DIRECTORY,
+# before each embedding model had its own index; SQLite files may have
+# -wal and -shm companions, and Chroma keeps one UUID-named directory per segment
+LEGACY_INDEX_NAMES = (
+    "chroma.sqlite3",
+    MANIFEST_FILENAME,
+    EMBEDDING_MODEL_FILENAME,
+    LEXICAL_INDEX_DIRNAME,
+    METADATA_INDEX_FILENAME,
+    STRUCTURED_INDEX_FILENAME,
+    NUMPY_STORE_DIRNAME,
+    SHARDS_DIRNAME,
+    SHARD_MAP_FILENAME,
+)
+CHROMA_SEGMENT_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+# renameat2() arguments to exchange two paths atomically (Linux 3.15+)
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+def get_versions_directory(persist_directory: Optional[Union[str, Path]] = None) -> Path:
+    """
+    Get the directory holding the versions of an index
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        Sibling directory of persist_directory, e.g. data/chroma.versions
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+
+    persist_path = Path(persist_directory)
+    return persist_path.parent / f"{persist_path.name}{VERSIONS_SUFFIX}"
+
+
+def create_index_version(persist_directory: Optional[Union[str, Path]] = None) -> Path:
+    """
+    Create an empty directory to build a new version of an index in
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        Path of the new version directory
+    """
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    version = get_versions_directory(persist_directory) / f"{timestamp}-{os.getpid()}"
+    version.mkdir(parents=True)
+    return version
+
+
+def _exchange_paths(first: Path, second: Path) -> bool:
+    """
+    Atomically exchange two paths with renameat2(RENAME_EXCHANGE)
+
+    Args:
+        first: First path
+        second: Second path
+
+    Returns:
+        True if the paths were exchanged, False if the platform or file
+        system does not support it
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+
+    if renameat2(AT_FDCWD, os.fsencode(first), AT_FDCWD, os.fsencode(second), RENAME_EXCHANGE) == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+        return False
+    raise OSError(error, f"renameat2 failed: {os.strerror(error)}")
+
+
+def activate_index_version(
+    version: Union[str, Path],
+    persist_directory: Optional[Union[str, Path]] = None,
+    keep: Optional[int] = None,
+) -> Optional[Path]:
+    """
+    Atomically make a fully built index version the current index
+
+    persist_directory becomes a relative symbolic link to the version, and
+    is replaced by renaming a new link over it, so a reader opening the
+    index sees either the old or the new version, never a partial one. A
+    plain index directory is moved into the versions directory the first
+    time, exchanged with the link in one step where renameat2 is available.
+    Readers that already opened the old version keep using it; see
+    prune_index_versions for when it is deleted.
+
+    Args:
+        version: Version directory (see create_index_version)
+        persist_directory: Directory where the vector store is persisted
+        keep: Previous versions to keep (defaults to INDEX_KEEP_VERSIONS)
+
+    Returns:
+        Path of the version that was current before, or None if there was no index
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+
+    persist_path = Path(persist_directory)
+    version = Path(version).resolve()
+    previous = persist_path.resolve() if persist_path.exists() else None
+
+    # The link is relative, so the index and its versions can be moved together
+    link_path = persist_path.parent / f".{persist_path.name}.{uuid.uuid4().hex}.link"
+    os.symlink(os.path.relpath(version, persist_path.parent.resolve()), link_path)
+    try:
+        if persist_path.is_symlink() or not persist_path.exists():
+            # Renaming over a link replaces it atomically
+            os.replace(link_path, persist_path)
+        else:
+            initial = get_versions_directory(persist_path) / f"{INITIAL_VERSION_PREFIX}-{uuid.uuid4().hex[:8]}"
+            if _exchange_paths(link_path, persist_path):
+                # The temporary name now holds the old directory
+                os.rename(link_path, initial)
+            else:
+                # Without renameat2 the index is missing between these two renames
+                os.rename(persist_path, initial)
+                os.replace(link_path, persist_path)
+            previous = initial
+    finally:
+        if os.path.islink(link_path):
+            os.unlink(link_path)
+
+    prune_index_versions(persist_path, keep)
+    return previous
+
+
+def prune_index_versions(
+    persist_directory: Optional[Union[str, Path]] = None,
+    keep: Optional[int] = None,
+) -> List[Path]:
+    """
+    Delete index versions older than the current one beyond the newest few
+
+    Versions newer than the current one are builds in progress and are left
+    alone. Processes that still have a deleted version open keep reading it
+    until they reopen the index, since its files are only unlinked.
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+        keep: Previous versions to keep (defaults to INDEX_KEEP_VERSIONS)
+
+    Returns:
+        Paths of the deleted versions
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+    if keep is None:
+        keep = INDEX_KEEP_VERSIONS
+
+    versions_directory = get_versions_directory(persist_directory)
+    current = Path(persist_directory).resolve()
+    if current.parent != versions_directory.resolve():
+        return []
+
+    older = sorted(
+        path for path in versions_directory.resolve().iterdir()
+        if path.is_dir() and path.name < current.name
+    )
+    removed = older[:max(len(older) - keep, 0)]
+    for path in removed:
+        close_side_indexes(path)
+        shutil.rmtree(path, ignore_errors=True)
+
+    return removed
+
+
+def build_index(
+    directory: Optional[Path] = None,
+    persist_directory: Optional[Union[str, Path]] = None,
+    embedding_model: Optional[Embeddings] = None,
+) -> Dict[str, int]:
+    """
+    Index every document into a new version of the index and swap it in
+
+    Queries keep using the current index until the new one is complete.
+    Files changed while the new version was built are caught up with an
+    incremental sync after the swap.
+
+    Args:
+        directory: Directory containing documents to index
+        persist_directory: Directory where the vector store is persisted
+        embedding_model: Embedding model to use (defaults to get_embedding_model())
+
+    Returns:
+        Dict of file counts per outcome of the build
+    """
+    if directory is None:
+        directory = DOCUMENT_STORE_DIRECTORY
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+
+    version = create_index_version(persist_directory)
+    try:
+        _, stats = sync_vector_store(directory, version, embedding_model)
+    except Exception:
+        close_side_indexes(version)
+        shutil.rmtree(version, ignore_errors=True)
+        raise
+
+    activate_index_version(version, persist_directory)
+    _, catch_up = sync_vector_store(directory, persist_directory, embedding_model)
+    for outcome in ("added", "updated", "deleted", "chunks"):
+        stats[outcome] += catch_up[outcome]
+
+    return stats
+
+
+def build_index_in_background(
+    directory: Optional[Path] = None,
+    persist_directory: Optional[Union[str, Path]] = None,
+    embedding_model: Optional[Embeddings] = None,
+    on_done: Optional[Callable[[Dict[str, int]], None]] = None,
+) -> threading.Thread:
+    """
+    Run build_index in a background thread
+
+    Args:
+        directory: Directory containing documents to index
+        persist_directory: Directory where the vector store is persisted
+        embedding_model: Embedding model to use (defaults to get_embedding_model())
+        on_done: Called with the build's stats once the new index is current
+
+    Returns:
+        The started thread; join() it to wait for the build
+    """
+    def run():
+        try:
+            stats = build_index(directory, persist_directory, embedding_model)
+        except Exception as e:
+            print(f"Error building index: {e}")
+            return
+        if on_done is not None:
+            on_done(stats)
+
+    thread = threading.Thread(target=run, name="index-build", daemon=True)
+    thread.start()
+    return thread
+
+
+def _is_legacy_index_entry(path: Path) -> bool:
+    if path.is_symlink():
+        return False
+    if path.is_dir() and CHROMA_SEGMENT_PATTERN.fullmatch(path.name):
+        return True
+    return any(path.name in (name, f"{name}-wal", f"{name}-shm", f"{name}-journal") for name in LEGACY_INDEX_NAMES)
+
+
+def migrate_legacy_index(
+    persist_directory: Optional[Union[str, Path]] = None,
+    model_name: Optional[str] = None,
+    force: bool = False,
+) -> Optional[Path]:
+    """
+    Move an index kept directly in persist_directory into the index directory of its model
+
+    Indexes used to be kept directly in CHROMA_PERSIST_DIRECTORY whatever
+    model built them; each model now has its own directory (see
+    src.index_manifest.get_index_directory). The old vector store, manifest
+    and side indexes are moved into a new version of the model's index,
+    which is swapped in like a rebuild, so nothing is re-embedded.
+
+    Args:
+        persist_directory: Directory holding the index of each embedding model
+        model_name: Model the old index was built with (defaults to get_embedding_model_name())
+        force: Move an old index that records no model, trusting model_name
+
+    Returns:
+        The model's index directory, or None if there is no old index or it
+        records another model
+
+    Raises:
+        ValueError: If the old index records no model and force is False, or
+            force is True and it records another model
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+    if model_name is None:
+        model_name = get_embedding_model_name()
+
+    legacy = Path(persist_directory)
+    if not get_manifest_path(legacy).exists():
+        return None
+
+    recorded = load_embedding_model_name(legacy)
+    if force:
+        check_embedding_model(legacy, model_name)
+    elif recorded is None:
+        raise ValueError(
+            f"{legacy} holds an index from before each embedding model had its own index, "
+            f"and does not record its model. If it was built with {model_name}, move it into "
+            f"place with `python manage_index.py migrate --backend <backend>`; otherwise delete "
+            f"its files (see README_SIMPLE.md)"
+        )
+    elif recorded != model_name:
+        return None
+
+    index_directory = get_index_directory(legacy, model_name)
+    version = create_index_version(index_directory)
+    for path in list(legacy.iterdir()):
+        if _is_legacy_index_entry(path):
+            os.rename(path, version / path.name)
+    record_embedding_model(version, model_name)
+
+    activate_index_version(version, index_directory)
+    return index_directory
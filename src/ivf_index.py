@@ -0,0 +1,234 @@
+# IVF index module for the RAG system
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+
+
+# Rows scored against the centroids per matrix product
+ASSIGN_BLOCK_ROWS = 8192
+
+# Training rows sampled per list
+TRAINING_ROWS_PER_LIST = 64
+KMEANS_ITERATIONS = 10
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Assign normalized vectors to their most similar centroid
+
+    Args:
+        vectors: Normalized float32 matrix
+        centroids: Normalized centroid matrix
+
+    Returns:
+        int32 array of centroid numbers
+    """
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = vectors[start:start + ASSIGN_BLOCK_ROWS]
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_kmeans(
+    vectors: np.ndarray,
+    num_lists: int,
+    iterations: int = KMEANS_ITERATIONS,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Cluster normalized vectors with spherical k-means
+
+    Args:
+        vectors: Normalized float32 training matrix
+        num_lists: Number of centroids
+        iterations: Number of k-means iterations
+        seed: Random seed of the initial centroids
+
+    Returns:
+        Normalized centroid matrix
+    """
+    rng = np.random.default_rng(seed)
+    num_lists = min(num_lists, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), num_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = nearest_centroids(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=num_lists)
+        centroids = normalize_rows(sums)
+
+        # Restart empty clusters from random training vectors
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Inverted file index over the rows of a vector store
+
+    Rows are assigned to the most similar of num_lists k-means centroids.
+    A search scores only the rows of the nprobe lists whose centroids are
+    most similar to the query, trading recall for latency. The owner keeps
+    each row's list number next to its vector, so inserts, deletes and
+    compaction follow the store's rows; the index holds the centroids and
+    the rows grouped by list.
+
+    Files (next to the store's): ivf_centroids.npy, ivf_order.npy (row
+    numbers sorted by list), ivf_bounds.npy (start of each list in the
+    order) and ivf.json.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Initialize the index
+
+        Args:
+            path: Directory of the index files
+        """
+        self.path = Path(path)
+        self._centroids: Optional[np.ndarray] = None
+        self._order: Optional[np.ndarray] = None
+        self._bounds: Optional[np.ndarray] = None
+        self._info: Optional[Dict[str, Any]] = None
+        self._unsaved = set()
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        if self._info is None:
+            path = self.path / "ivf.json"
+            self._info = {}
+            if path.exists():
+                with open(path) as f:
+                    self._info = json.load(f)
+        return self._info
+
+    @property
+    def trained(self) -> bool:
+        return bool(self.info.get("num_lists"))
+
+    @property
+    def trained_rows(self) -> int:
+        """
+        Number of live rows when the centroids were trained
+        """
+        return self.info.get("trained_rows", 0)
+
+    @property
+    def built_rows(self) -> int:
+        """
+        Number of store rows covered by the lists; later rows are searched exhaustively
+        """
+        return self.info.get("built_rows", 0)
+
+    @property
+    def centroids(self) -> np.ndarray:
+        if self._centroids is None:
+            self._centroids = np.load(self.path / "ivf_centroids.npy")
+        return self._centroids
+
+    def train(self, vectors: np.ndarray, num_lists: int, trained_rows: int) -> None:
+        """
+        Train the centroids
+
+        Args:
+            vectors: Normalized float32 training sample
+            num_lists: Number of lists
+            trained_rows: Number of live rows the sample was drawn from
+        """
+        self._centroids = train_kmeans(vectors, num_lists)
+        self._unsaved.add("ivf_centroids")
+        self._info = {
+            "num_lists": len(self._centroids),
+            "trained_rows": trained_rows,
+            "built_rows": 0,
+        }
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Get the lists of normalized vectors
+
+        Args:
+            vectors: Normalized float32 matrix
+
+        Returns:
+            int32 array of list numbers
+        """
+        return nearest_centroids(vectors, self.centroids)
+
+    def build_lists(self, lists: np.ndarray) -> None:
+        """
+        Group the store's rows by list
+
+        Args:
+            lists: List number of every store row (-1 for unassigned rows)
+        """
+        self._order = np.argsort(lists, kind="stable")
+        self._bounds = np.searchsorted(lists[self._order], np.arange(self.info["num_lists"] + 1))
+        self._info["built_rows"] = len(lists)
+        self._unsaved.update(("ivf_order", "ivf_bounds"))
+
+    def probe(self, queries: np.ndarray, nprobe: int) -> np.ndarray:
+        """
+        Find the lists most similar to each query
+
+        Args:
+            queries: Normalized query matrix
+            nprobe: Number of lists per query
+
+        Returns:
+            Matrix of list numbers, one row per query
+        """
+        scores = queries @ self.centroids.T
+        nprobe = min(nprobe, scores.shape[1])
+        if nprobe == scores.shape[1]:
+            return np.tile(np.arange(nprobe), (len(queries), 1))
+        return np.argpartition(-scores, nprobe - 1, axis=1)[:, :nprobe]
+
+    def candidate_rows(self, lists: np.ndarray) -> np.ndarray:
+        """
+        Get the rows of some lists
+
+        Args:
+            lists: List numbers
+
+        Returns:
+            Array of store row numbers
+        """
+        if self._order is None:
+            self._order = np.load(self.path / "ivf_order.npy", mmap_mode="r")
+            self._bounds = np.load(self.path / "ivf_bounds.npy")
+        return np.concatenate([self._order[self._bounds[i]:self._bounds[i + 1]] for i in lists])
+
+    def save(self) -> None:
+        """
+        Write the centroids and lists to disk
+        """
+        for name, array in (
+            ("ivf_centroids", self._centroids),
+            ("ivf_order", self._order),
+            ("ivf_bounds", self._bounds),
+        ):
+            if name in self._unsaved:
+                tmp_path = self.path / f"{name}.tmp.npy"
+                np.save(tmp_path, array)
+                os.replace(tmp_path, self.path / f"{name}.npy")
+
+        tmp_path = self.path / "ivf.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.info, f)
+        os.replace(tmp_path, self.path / "ivf.json")
+        self._unsaved.clear()
@@ -0,0 +1,568 @@
+# Lexical index module for the RAG system
+
+import heapq
+import json
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import CHROMA_PERSIST_DIRECTORY
+
+
+LEXICAL_INDEX_DIRNAME = "lexical"
+MAX_SEGMENTS = 8
+
+# Keep identifiers such as ticket IDs ("PROJ-123") and snake_case names together
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase lexical tokens
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _build_postings(
+    terms: np.ndarray,
+    docs: np.ndarray,
+    tfs: np.ndarray,
+    n_terms: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Build CSR postings (offsets, doc IDs, term frequencies) sorted by term then doc
+
+    Args:
+        terms: Term ID of each posting
+        docs: Segment-local document number of each posting
+        tfs: Term frequency of each posting
+        n_terms: Vocabulary size
+
+    Returns:
+        Tuple of (offsets, doc_ids, tfs)
+    """
+    order = np.lexsort((docs, terms))
+    counts = np.bincount(terms, minlength=n_terms)
+    offsets = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, docs[order].astype(np.int32), tfs[order].astype(np.float32)
+
+
+class _Segment:
+    """
+    Immutable block of postings for a batch of chunks, plus a mutable deletion mask
+    """
+
+    def __init__(
+        self,
+        name: str,
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        tfs: np.ndarray,
+        lengths: np.ndarray,
+        chunk_ids: np.ndarray,
+        deleted: np.ndarray,
+    ):
+        self.name = name
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.lengths = lengths
+        self.chunk_ids = chunk_ids
+        self.id_order = np.argsort(chunk_ids)
+        self.deleted = deleted
+        self.dirty = False
+
+    @property
+    def live_count(self) -> int:
+        return int(len(self.lengths) - self.deleted.sum())
+
+    @property
+    def live_length(self) -> int:
+        return int(self.lengths[~self.deleted].sum())
+
+    def find(self, chunk_id: bytes) -> Optional[int]:
+        """
+        Find the local document number of a chunk ID by binary search
+
+        Args:
+            chunk_id: Encoded chunk ID
+
+        Returns:
+            Local document number, or None if not in this segment
+        """
+        position = np.searchsorted(self.chunk_ids, chunk_id, sorter=self.id_order)
+        if position < len(self.id_order):
+            doc = int(self.id_order[position])
+            if self.chunk_ids[doc] == chunk_id:
+                return doc
+        return None
+
+    def contains(self, encoded_ids: np.ndarray, docs: np.ndarray) -> np.ndarray:
+        """
+        Check which local documents have one of the given chunk IDs
+
+        Args:
+            encoded_ids: Sorted array of encoded chunk IDs
+            docs: Local document numbers to check
+
+        Returns:
+            Boolean mask over docs
+        """
+        if len(encoded_ids) == 0:
+            return np.zeros(len(docs), dtype=bool)
+        ids = self.chunk_ids[docs]
+        positions = np.minimum(np.searchsorted(encoded_ids, ids), len(encoded_ids) - 1)
+        return encoded_ids[positions] == ids
+
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        if term_id + 1 >= len(self.offsets):
+            return self.doc_ids[:0], self.tfs[:0]
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def save(self, directory: Path) -> None:
+        np.save(directory / f"{self.name}.offsets.npy", self.offsets)
+        np.save(directory / f"{self.name}.doc_ids.npy", self.doc_ids)
+        np.save(directory / f"{self.name}.tfs.npy", self.tfs)
+        np.save(directory / f"{self.name}.lengths.npy", self.lengths)
+        np.save(directory / f"{self.name}.chunk_ids.npy", self.chunk_ids)
+        self.save_deleted(directory)
+
+    def save_deleted(self, directory: Path) -> None:
+        # Replaced atomically, since other processes reload it while the index is in use
+        tmp_path = directory / f"{self.name}.deleted.npy.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, self.deleted)
+        os.replace(tmp_path, directory / f"{self.name}.deleted.npy")
+        self.dirty = False
+
+    @classmethod
+    def load(cls, directory: Path, name: str) -> "_Segment":
+        # Postings are memory-mapped, only the deletion mask is held in memory
+        return cls(
+            name,
+            np.load(directory / f"{name}.offsets.npy", mmap_mode="r"),
+            np.load(directory / f"{name}.doc_ids.npy", mmap_mode="r"),
+            np.load(directory / f"{name}.tfs.npy", mmap_mode="r"),
+            np.load(directory / f"{name}.lengths.npy", mmap_mode="r"),
+            np.load(directory / f"{name}.chunk_ids.npy", mmap_mode="r"),
+            np.array(np.load(directory / f"{name}.deleted.npy")),
+        )
+
+    def delete_files(self, directory: Path) -> None:
+        for suffix in ("offsets", "doc_ids", "tfs", "lengths", "chunk_ids", "deleted"):
+            path = directory / f"{self.name}.{suffix}.npy"
+            if path.exists():
+                path.unlink()
+
+
+class LexicalIndex:
+    """
+    On-disk BM25 inverted index with postings stored in NumPy arrays
+
+    The index is a list of immutable segments (CSR postings, memory-mapped)
+    plus a deletion mask per segment. Added chunks are buffered and written
+    as a new segment on save(); segments are merged once there are more than
+    MAX_SEGMENTS of them. Segments saved by other processes are picked up
+    when meta.json changes.
+    """
+
+    def __init__(self, directory: Union[str, Path], k1: float = 1.5, b: float = 0.75):
+        """
+        Open (or create) a lexical index
+
+        Args:
+            directory: Directory holding the index files
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.directory = Path(directory)
+        self.k1 = k1
+        self.b = b
+        self.terms: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self.segments: List[_Segment] = []
+        self.next_segment = 0
+        self._pending_ids: List[str] = []
+        self._pending_terms: List[np.ndarray] = []
+        self._meta_stamp: Optional[Tuple[int, int]] = None
+        self._lock = threading.RLock()
+        self._load()
+
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = (self.directory / "meta.json").stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> None:
+        stamp = self._stamp()
+        if stamp is None:
+            return
+
+        # vocab.json is written before meta.json, so it covers every segment listed
+        with open(self.directory / "meta.json", "r") as f:
+            meta = json.load(f)
+        with open(self.directory / "vocab.json", "r") as f:
+            terms = json.load(f)
+        segments = [_Segment.load(self.directory, name) for name in meta["segments"]]
+
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.next_segment = meta["next_segment"]
+        self.segments = segments
+        self._meta_stamp = stamp
+
+    def _refresh(self) -> None:
+        """
+        Reload the segments if another process saved the index since they were loaded
+
+        Skipped while this instance has unsaved changes.
+        """
+        if self._pending_ids or any(segment.dirty for segment in self.segments):
+            return
+
+        for _ in range(3):
+            stamp = self._stamp()
+            if stamp == self._meta_stamp:
+                return
+            if stamp is None:
+                self.terms = []
+                self.vocab = {}
+                self.segments = []
+                self.next_segment = 0
+                self._meta_stamp = None
+                return
+            try:
+                self._load()
+                return
+            except FileNotFoundError:
+                # A merge removed segments listed in the metadata just read; read it again
+                continue
+            except ValueError as e:
+                print(f"Error reloading lexical index {self.directory}: {e}")
+                return
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return sum(segment.live_count for segment in self.segments) + len(self._pending_ids)
+
+    def add(self, chunk_ids: List[str], texts: List[str]) -> None:
+        """
+        Add chunks to the index (searchable after save())
+
+        Args:
+            chunk_ids: IDs of the chunks
+            texts: Texts of the chunks
+        """
+        with self._lock:
+            self._refresh()
+            for chunk_id, text in zip(chunk_ids, texts):
+                term_ids = []
+                for token in tokenize(text):
+                    term_id = self.vocab.get(token)
+                    if term_id is None:
+                        term_id = len(self.terms)
+                        self.vocab[token] = term_id
+                        self.terms.append(token)
+                    term_ids.append(term_id)
+
+                self._pending_ids.append(chunk_id)
+                self._pending_terms.append(np.array(term_ids, dtype=np.int64))
+
+    def add_documents(self, chunk_ids: List[str], documents: List[Document]) -> None:
+        """
+        Add document chunks to the index (searchable after save())
+
+        Args:
+            chunk_ids: IDs of the chunks
+            documents: Chunks to index
+        """
+        self.add(chunk_ids, [document.page_content for document in documents])
+
+    def delete(self, chunk_ids: List[str]) -> None:
+        """
+        Delete chunks from the index
+
+        Args:
+            chunk_ids: IDs of the chunks to delete
+        """
+        with self._lock:
+            self._refresh()
+            remove = set(chunk_ids)
+            if self._pending_ids and remove.intersection(self._pending_ids):
+                kept = [(c, t) for c, t in zip(self._pending_ids, self._pending_terms) if c not in remove]
+                self._pending_ids = [c for c, _ in kept]
+                self._pending_terms = [t for _, t in kept]
+
+            for chunk_id in remove:
+                encoded = chunk_id.encode("utf-8")
+                for segment in self.segments:
+                    doc = segment.find(encoded)
+                    if doc is not None and not segment.deleted[doc]:
+                        segment.deleted[doc] = True
+                        segment.dirty = True
+
+    def clear(self) -> None:
+        """
+        Remove all chunks and segment files from the index
+        """
+        with self._lock:
+            obsolete = self.segments
+            self.segments = []
+            self._pending_ids = []
+            self._pending_terms = []
+            self.save()
+            for segment in obsolete:
+                segment.delete_files(self.directory)
+
+    def _flush_pending(self) -> Optional[_Segment]:
+        if not self._pending_ids:
+            return None
+
+        lengths = np.array([len(t) for t in self._pending_terms], dtype=np.int32)
+        all_terms = np.concatenate(self._pending_terms) if lengths.sum() else np.zeros(0, dtype=np.int64)
+        all_docs = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+
+        # Collapse repeated (term, doc) pairs into term frequencies
+        keys = all_terms * len(lengths) + all_docs
+        unique_keys, tfs = np.unique(keys, return_counts=True)
+        offsets, doc_ids, tfs = _build_postings(
+            unique_keys // len(lengths), unique_keys % len(lengths), tfs, len(self.terms)
+        )
+
+        segment = _Segment(
+            f"seg_{self.next_segment:06d}",
+            offsets,
+            doc_ids,
+            tfs,
+            lengths,
+            np.array([c.encode("utf-8") for c in self._pending_ids]),
+            np.zeros(len(lengths), dtype=bool),
+        )
+        self.next_segment += 1
+        self._pending_ids = []
+        self._pending_terms = []
+        return segment
+
+    def _merge_segments(self) -> _Segment:
+        terms_parts, docs_parts, tfs_parts, lengths_parts, ids_parts = [], [], [], [], []
+        base = 0
+        for segment in self.segments:
+            live = ~segment.deleted
+            # New document numbers after dropping deleted documents
+            remap = np.cumsum(live) - 1 + base
+            posting_terms = np.repeat(np.arange(len(segment.offsets) - 1), np.diff(segment.offsets))
+            keep = live[segment.doc_ids]
+
+            terms_parts.append(posting_terms[keep])
+            docs_parts.append(remap[segment.doc_ids[keep]])
+            tfs_parts.append(np.asarray(segment.tfs)[keep])
+            lengths_parts.append(np.asarray(segment.lengths)[live])
+            ids_parts.append(np.asarray(segment.chunk_ids)[live])
+            base += int(live.sum())
+
+        offsets, doc_ids, tfs = _build_postings(
+            np.concatenate(terms_parts), np.concatenate(docs_parts), np.concatenate(tfs_parts), len(self.terms)
+        )
+        chunk_ids = np.concatenate(ids_parts) if ids_parts else np.zeros(0, dtype="S1")
+
+        segment = _Segment(
+            f"seg_{self.next_segment:06d}",
+            offsets,
+            doc_ids,
+            tfs,
+            np.concatenate(lengths_parts).astype(np.int32),
+            chunk_ids,
+            np.zeros(len(chunk_ids), dtype=bool),
+        )
+        self.next_segment += 1
+        return segment
+
+    def save(self) -> None:
+        """
+        Write buffered chunks as a new segment, persist deletions and compact if needed
+        """
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            obsolete = []
+
+            segment = self._flush_pending()
+            if segment is not None:
+                segment.save(self.directory)
+                self.segments.append(segment)
+
+            if len(self.segments) > MAX_SEGMENTS:
+                merged = self._merge_segments()
+                merged.save(self.directory)
+                obsolete = self.segments
+                self.segments = [merged]
+
+            for segment in self.segments:
+                if segment.dirty:
+                    segment.save_deleted(self.directory)
+
+            with open(self.directory / "vocab.json.tmp", "w") as f:
+                json.dump(self.terms, f)
+            os.replace(self.directory / "vocab.json.tmp", self.directory / "vocab.json")
+
+            meta = {
+                "next_segment": self.next_segment,
+                "segments": [segment.name for segment in self.segments],
+            }
+            with open(self.directory / "meta.json.tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(self.directory / "meta.json.tmp", self.directory / "meta.json")
+            self._meta_stamp = self._stamp()
+
+            # Only remove merged segments once the new metadata is in place
+            for segment in obsolete:
+                segment.delete_files(self.directory)
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        chunk_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Score chunks against a query with BM25
+
+        Args:
+            query: Query string
+            k: Number of results to return
+            chunk_ids: Optional IDs of the only chunks that may be returned
+
+        Returns:
+            List of (chunk_id, score) tuples, best first
+        """
+        allowed = None
+        if chunk_ids is not None:
+            allowed = np.unique(np.array([c.encode("utf-8") for c in chunk_ids], dtype="S"))
+
+        with self._lock:
+            self._refresh()
+            term_ids = sorted({self.vocab[t] for t in tokenize(query) if t in self.vocab})
+            if not term_ids or not self.segments:
+                return []
+
+            live_count = sum(segment.live_count for segment in self.segments)
+            if live_count == 0:
+                return []
+            avg_length = sum(segment.live_length for segment in self.segments) / live_count
+
+            # Document frequencies across segments (deleted postings count until compaction)
+            dfs = np.zeros(len(term_ids))
+            for segment in self.segments:
+                for i, term_id in enumerate(term_ids):
+                    dfs[i] += len(segment.postings(term_id)[0])
+            idfs = np.log(1.0 + (live_count - dfs + 0.5) / (dfs + 0.5))
+
+            candidates = []
+            for segment in self.segments:
+                # Only touch the postings of the query terms, never the whole segment
+                doc_parts, weight_parts = [], []
+                for idf, term_id in zip(idfs, term_ids):
+                    doc_ids, tfs = segment.postings(term_id)
+                    if len(doc_ids):
+                        norms = self.k1 * (1.0 - self.b + self.b * segment.lengths[doc_ids] / avg_length)
+                        doc_parts.append(doc_ids)
+                        weight_parts.append(idf * tfs * (self.k1 + 1.0) / (tfs + norms))
+                if not doc_parts:
+                    continue
+
+                docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate(weight_parts))
+                scores[segment.deleted[docs]] = 0.0
+                if allowed is not None:
+                    scores[~segment.contains(allowed, docs)] = 0.0
+
+                hits = np.flatnonzero(scores)
+                if len(hits) > k:
+                    hits = hits[np.argpartition(scores[hits], -k)[-k:]]
+                for hit in hits:
+                    candidates.append((float(scores[hit]), segment.chunk_ids[docs[hit]].decode("utf-8")))
+
+            return [(chunk_id, score) for score, chunk_id in heapq.nlargest(k, candidates)]
+
+
+_lexical_indexes: Dict[str, LexicalIndex] = {}
+_lexical_indexes_lock = threading.Lock()
+
+
+def get_lexical_index_directory(persist_directory: Optional[Union[str, Path]] = None) -> Path:
+    """
+    Get the directory of the lexical index stored alongside a vector store
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        Path to the lexical index directory
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+
+    # Resolved, so an index swapped in behind a link is opened as a different index
+    return Path(persist_directory).resolve() / LEXICAL_INDEX_DIRNAME
+
+
+def get_lexical_index(persist_directory: Optional[Union[str, Path]] = None) -> LexicalIndex:
+    """
+    Get the shared lexical index of a vector store, opening it on first use
+
+    The index reloads itself when another process saves it, so it can be
+    kept open for the life of the process.
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        LexicalIndex
+    """
+    directory = str(get_lexical_index_directory(persist_directory))
+    with _lexical_indexes_lock:
+        if directory not in _lexical_indexes:
+            _lexical_indexes[directory] = LexicalIndex(directory)
+
+        return _lexical_indexes[directory]
+
+
+def close_lexical_index(persist_directory: Optional[Union[str, Path]] = None) -> None:
+    """
+    Drop the shared lexical index of a vector store, if it is open
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+    """
+    directory = get_lexical_index_directory(persist_directory)
+    with _lexical_indexes_lock:
+        _lexical_indexes.pop(str(directory), None)
+
+
+def delete_lexical_index(persist_directory: Optional[Union[str, Path]] = None) -> None:
+    """
+    Delete the lexical index of a vector store
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+    """
+    close_lexical_index(persist_directory)
+    directory = get_lexical_index_directory(persist_directory)
+    if directory.exists():
+        shutil.rmtree(directory)
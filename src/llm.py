@@ -1,23 +1,39 @@
 # LLM module for the RAG system
 
-from typing import List, Optional
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
-from langchain.chains import RetrievalQA
 from langchain_core.documents import Document
 from langchain_core.language_models import LLM
-from langchain_core.prompts import PromptTemplate
+from langchain_core.prompt_values import PromptValue
+from langchain_core.prompts import PromptTemplate, format_document
 from langchain_core.retrievers import BaseRetriever
-from langchain_openai import ChatOpenAI
-from langchain_community.llms import Ollama
 
 from src.config import (
+    BACKEND_OLLAMA,
     COMPLETION_MODEL,
+    DEFAULT_BACKEND,
     LOCAL_COMPLETION_MODEL,
     OLLAMA_BASE_URL,
     OPENAI_API_KEY,
-    USE_LOCAL_MODELS,
 )
+from src.context_budget import assemble_context, get_context_budget
+from src.metadata_index import join_document_metadata
+from src.retrievers import aretrieve, batch_retrieve, retrieve
+from src.tokens import count_tokens
+from src.tracing import collect_timings, is_active, record, span
 
+# The chain and backend packages are imported where they are used, so that
+# importing this module does not load the backend that is not selected
+if TYPE_CHECKING:
+    from langchain.chains import RetrievalQA
+
+
+# Event types yielded by stream_response
+STREAM_SOURCES = "sources"
+STREAM_TOKEN = "token"
+STREAM_DONE = "done"
 
 # Define prompt templates
 MEETING_QA_TEMPLATE = """
@@ -34,20 +50,31 @@ Answer:
 """
 
 
-def get_llm_model() -> LLM:
+def get_llm_model(backend: Optional[str] = None) -> LLM:
     """
     Get the appropriate LLM model based on configuration
     
+    Args:
+        backend: Backend to use (defaults to DEFAULT_BACKEND)
+    
     Returns:
         LLM model
     """
-    if USE_LOCAL_MODELS:
-        return Ollama(
+    if backend is None:
+        backend = DEFAULT_BACKEND
+    
+    if backend == BACKEND_OLLAMA:
+        from langchain_ollama import OllamaLLM
+        
+        # OllamaLLM keeps one pooled HTTP client (sync and async) per instance
+        return OllamaLLM(
             model=LOCAL_COMPLETION_MODEL,
             base_url=OLLAMA_BASE_URL,
             temperature=0.1,
         )
     else:
+        from langchain_openai import ChatOpenAI
+        
         return ChatOpenAI(
             model=COMPLETION_MODEL,
             openai_api_key=OPENAI_API_KEY,
@@ -55,18 +82,25 @@ def get_llm_model() -> LLM:
         )
 
 
-def create_qa_chain(retriever: BaseRetriever) -> RetrievalQA:
+def create_qa_chain(
+    retriever: BaseRetriever,
+    backend: Optional[str] = None,
+    llm: Optional[LLM] = None,
+) -> "RetrievalQA":
     """
     Create a question-answering chain
     
     Args:
         retriever: Document retriever
+        backend: Backend to use for the LLM (defaults to DEFAULT_BACKEND)
+        llm: LLM to use (defaults to get_llm_model(backend))
         
     Returns:
         RetrievalQA chain
     """
     # Get LLM model
-    llm = get_llm_model()
+    if llm is None:
+        llm = get_llm_model(backend)
     
     # Create prompt
     prompt = PromptTemplate(
@@ -75,6 +109,8 @@ def create_qa_chain(retriever: BaseRetriever) -> RetrievalQA:
     )
     
     # Create chain
+    from langchain.chains import RetrievalQA
+    
     chain = RetrievalQA.from_chain_type(
         llm=llm,
         chain_type="stuff",
@@ -89,32 +125,398 @@ def create_qa_chain(retriever: BaseRetriever) -> RetrievalQA:
 def generate_response(
     query: str,
     retriever: BaseRetriever,
-) -> tuple[str, List[Document]]:
+    chain: Optional["RetrievalQA"] = None,
+    return_timings: bool = False,
+    embedding: Optional[List[float]] = None,
+) -> Union[Tuple[str, List[Document]], Tuple[str, List[Document], Dict[str, float]]]:
     """
     Generate a response to a query
     
     Args:
         query: Query string
         retriever: Document retriever
+        chain: Pre-built chain to reuse (a new one is created if not provided)
+        return_timings: Also return a per-stage timing breakdown
+        embedding: Embedding of the query, if already computed
+        
+    Returns:
+        Tuple of (response, source_documents), or (response, source_documents,
+        timings) if return_timings is set. timings maps stage names (query,
+        retrieve, embed_query, vector_search, generate, ...) to seconds and
+        also holds chunk and token counts.
+    """
+    if not return_timings:
+        return _generate_response(query, retriever, chain, embedding)
+    
+    with collect_timings() as timings:
+        response, source_docs = _generate_response(query, retriever, chain, embedding)
+    return response, source_docs, timings
+
+
+def _generate_response(
+    query: str,
+    retriever: BaseRetriever,
+    chain: Optional["RetrievalQA"],
+    embedding: Optional[List[float]] = None,
+) -> Tuple[str, List[Document]]:
+    # Create chain
+    if chain is None:
+        chain = create_qa_chain(retriever)
+    
+    # Run the chain's retrieval and "stuff" steps separately so each can be timed
+    with span("query"):
+        with span("retrieve") as s:
+            source_docs = retrieve(retriever, query, embedding)
+            s.set(chunks=len(source_docs))
+        
+        llm, prompt = _build_stuff_prompt(chain, query, source_docs)
+        with span("generate") as s:
+            response = _chunk_text(llm.invoke(prompt))
+            if is_active():
+                s.set(**_token_counts(prompt, response))
+    
+    return response, source_docs
+
+
+def batch_generate_responses(
+    queries: List[str],
+    retriever: BaseRetriever,
+    chain: Optional["RetrievalQA"] = None,
+    max_concurrency: Optional[int] = None,
+    on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+    persist_directory: Optional[Union[str, Path]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Generate responses to many queries, e.g. for offline evaluation
+    
+    Repeated queries are answered once. All queries are embedded and searched
+    together (see src.retrievers.batch_retrieve), then up to max_concurrency
+    LLM calls run at a time, so the LLM dominates the runtime.
+    
+    Args:
+        queries: Query strings
+        retriever: Document retriever
+        chain: Pre-built chain whose LLM and prompt to use (a new one is
+            created if not provided)
+        max_concurrency: Maximum number of concurrent LLM calls (unbounded if not provided)
+        on_result: Called with (index, result) for each query as soon as its
+            response is ready, in completion order
+        persist_directory: Directory of the retriever's vector store (see
+            src.retrievers.batch_retrieve)
+        
+    Returns:
+        One result per query, in order. Each result is a dict with query,
+        response (None if generation failed), source_documents and error
+        (None, or the error message).
+    """
+    # Create chain
+    if chain is None:
+        chain = create_qa_chain(retriever)
+    
+    unique_queries = list(dict.fromkeys(queries))
+    positions: Dict[str, List[int]] = {}
+    for index, query in enumerate(queries):
+        positions.setdefault(query, []).append(index)
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    
+    def finish(query: str, result: Dict[str, Any]) -> None:
+        for index in positions[query]:
+            results[index] = result
+            if on_result is not None:
+                on_result(index, result)
+    
+    with span("retrieve", queries=len(unique_queries)) as s:
+        try:
+            retrieved = batch_retrieve(retriever, unique_queries, persist_directory)
+        except Exception as e:
+            print(f"Error retrieving documents: {e}")
+            for query in unique_queries:
+                finish(query, {"query": query, "response": None, "source_documents": [], "error": str(e)})
+            return results
+        s.set(chunks=sum(len(source_docs) for source_docs in retrieved))
+    
+    llm = None
+    prompts = []
+    for query, source_docs in zip(unique_queries, retrieved):
+        llm, prompt = _build_stuff_prompt(chain, query, source_docs)
+        prompts.append(prompt)
+    
+    if not prompts:
+        return results
+    
+    with span("generate", queries=len(prompts)) as s:
+        token_counts = {"prompt_tokens": 0, "completion_tokens": 0}
+        config = {"max_concurrency": max_concurrency} if max_concurrency else None
+        for position, output in llm.batch_as_completed(prompts, config=config, return_exceptions=True):
+            query = unique_queries[position]
+            result = {
+                "query": query,
+                "response": None,
+                "source_documents": retrieved[position],
+                "error": None,
+            }
+            if isinstance(output, Exception):
+                result["error"] = str(output)
+            else:
+                result["response"] = _chunk_text(output)
+                if is_active():
+                    for name, count in _token_counts(prompts[position], result["response"]).items():
+                        token_counts[name] += count
+            finish(query, result)
+        s.set(**token_counts)
+    
+    return results
+
+
+def stream_response(
+    query: str,
+    retriever: BaseRetriever,
+    chain: Optional["RetrievalQA"] = None,
+    embedding: Optional[List[float]] = None,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Generate a response to a query, streaming answer tokens as they arrive
+    
+    Yields (event_type, payload) tuples:
+        (STREAM_SOURCES, source_documents) once retrieval is done
+        (STREAM_TOKEN, text) for each piece of the answer
+        (STREAM_DONE, metrics) at the end, with retrieval_time,
+            time_to_first_token and total_time in seconds and the token count
+    
+    Args:
+        query: Query string
+        retriever: Document retriever
+        chain: Pre-built chain whose LLM and prompt to use (a new one is
+            created if not provided)
+        embedding: Embedding of the query, if already computed
+        
+    Yields:
+        Stream events
+    """
+    start = time.perf_counter()
+    
+    # Create chain
+    if chain is None:
+        chain = create_qa_chain(retriever)
+    
+    with span("retrieve") as s:
+        source_docs = retrieve(retriever, query, embedding)
+        s.set(chunks=len(source_docs))
+    retrieval_time = time.perf_counter() - start
+    yield STREAM_SOURCES, source_docs
+    
+    llm, prompt = _build_stuff_prompt(chain, query, source_docs)
+    
+    # Spans cannot stay open across yields, so generation is recorded afterwards
+    generation_start = time.perf_counter()
+    time_to_first_token = None
+    tokens = 0
+    texts = []
+    for chunk in llm.stream(prompt):
+        text = _chunk_text(chunk)
+        if not text:
+            continue
+        if time_to_first_token is None:
+            time_to_first_token = time.perf_counter() - start
+        tokens += 1
+        texts.append(text)
+        yield STREAM_TOKEN, text
+    
+    if is_active():
+        record("generate", time.perf_counter() - generation_start, **_token_counts(prompt, "".join(texts)))
+        record("query", time.perf_counter() - start)
+    yield STREAM_DONE, _stream_metrics(start, retrieval_time, time_to_first_token, tokens)
+
+
+async def agenerate_response(
+    query: str,
+    retriever: BaseRetriever,
+    chain: Optional["RetrievalQA"] = None,
+    embedding: Optional[List[float]] = None,
+) -> Tuple[str, List[Document]]:
+    """
+    Generate a response to a query without blocking the event loop
+    
+    Args:
+        query: Query string
+        retriever: Document retriever
+        chain: Pre-built chain to reuse (a new one is created if not provided)
+        embedding: Embedding of the query, if already computed
         
     Returns:
         Tuple of (response, source_documents)
     """
     # Create chain
-    chain = create_qa_chain(retriever)
+    if chain is None:
+        chain = create_qa_chain(retriever)
+    
+    with span("query"):
+        with span("retrieve") as s:
+            source_docs = await aretrieve(retriever, query, embedding)
+            s.set(chunks=len(source_docs))
+        
+        llm, prompt = _build_stuff_prompt(chain, query, source_docs)
+        with span("generate") as s:
+            response = _chunk_text(await llm.ainvoke(prompt))
+            if is_active():
+                s.set(**_token_counts(prompt, response))
+    
+    return response, source_docs
+
+
+async def astream_response(
+    query: str,
+    retriever: BaseRetriever,
+    chain: Optional["RetrievalQA"] = None,
+    embedding: Optional[List[float]] = None,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Async version of stream_response, yielding the same events
+    
+    Args:
+        query: Query string
+        retriever: Document retriever
+        chain: Pre-built chain whose LLM and prompt to use (a new one is
+            created if not provided)
+        embedding: Embedding of the query, if already computed
+        
+    Yields:
+        Stream events
+    """
+    start = time.perf_counter()
+    
+    # Create chain
+    if chain is None:
+        chain = create_qa_chain(retriever)
+    
+    with span("retrieve") as s:
+        source_docs = await aretrieve(retriever, query, embedding)
+        s.set(chunks=len(source_docs))
+    retrieval_time = time.perf_counter() - start
+    yield STREAM_SOURCES, source_docs
+    
+    llm, prompt = _build_stuff_prompt(chain, query, source_docs)
     
-    # Generate response
-    result = chain.invoke({"query": query})
+    # Spans cannot stay open across yields, so generation is recorded afterwards
+    generation_start = time.perf_counter()
+    time_to_first_token = None
+    tokens = 0
+    texts = []
+    async for chunk in llm.astream(prompt):
+        text = _chunk_text(chunk)
+        if not text:
+            continue
+        if time_to_first_token is None:
+            time_to_first_token = time.perf_counter() - start
+        tokens += 1
+        texts.append(text)
+        yield STREAM_TOKEN, text
     
-    return result["result"], result["source_documents"]
+    if is_active():
+        record("generate", time.perf_counter() - generation_start, **_token_counts(prompt, "".join(texts)))
+        record("query", time.perf_counter() - start)
+    yield STREAM_DONE, _stream_metrics(start, retrieval_time, time_to_first_token, tokens)
 
 
-def format_source_documents(source_docs: List[Document]) -> str:
+def _build_stuff_prompt(
+    chain: "RetrievalQA",
+    query: str,
+    source_docs: List[Document],
+) -> Tuple[Any, PromptValue]:
+    """
+    Build the prompt the chain's "stuff" step would send for the given documents
+    
+    The documents are merged and fitted to the model's context budget first
+    (see src.context_budget), so overlapping chunks are sent once.
+    
+    Args:
+        chain: "RetrievalQA" chain
+        query: Query string
+        source_docs: Retrieved documents, best first
+        
+    Returns:
+        Tuple of (llm, prompt)
+    """
+    combine_chain = chain.combine_documents_chain
+    llm_chain = combine_chain.llm_chain
+    empty_prompt = llm_chain.prompt.format_prompt(
+        **{combine_chain.document_variable_name: "", "question": query}
+    )
+    budget = get_context_budget(llm_chain.llm, count_tokens([empty_prompt.to_string()]))
+    
+    with span("assemble_context") as s:
+        context_docs = assemble_context(source_docs, budget, combine_chain.document_separator)
+        s.set(context_chunks=len(context_docs), budget=budget)
+    context = combine_chain.document_separator.join(
+        format_document(doc, combine_chain.document_prompt) for doc in context_docs
+    )
+    prompt = llm_chain.prompt.format_prompt(
+        **{combine_chain.document_variable_name: context, "question": query}
+    )
+    return llm_chain.llm, prompt
+
+
+def _chunk_text(chunk: Any) -> str:
+    # Chat models yield message chunks, completion models yield strings
+    return chunk.content if hasattr(chunk, "content") else chunk
+
+
+def _token_counts(prompt: PromptValue, response: str) -> Dict[str, int]:
+    return {
+        "prompt_tokens": count_tokens([prompt.to_string()]),
+        "completion_tokens": count_tokens([response]),
+    }
+
+
+def _stream_metrics(
+    start: float,
+    retrieval_time: float,
+    time_to_first_token: Optional[float],
+    tokens: int,
+) -> Dict[str, Any]:
+    total_time = time.perf_counter() - start
+    return {
+        "retrieval_time": retrieval_time,
+        "time_to_first_token": time_to_first_token if time_to_first_token is not None else total_time,
+        "total_time": total_time,
+        "tokens": tokens,
+    }
+
+
+def format_stream_metrics(metrics: Dict[str, Any]) -> str:
+    """
+    Format streaming latency metrics for display
+    
+    Args:
+        metrics: Metrics from a STREAM_DONE event
+        
+    Returns:
+        Formatted string
+    """
+    formatted = (
+        f"Time to first token: {metrics['time_to_first_token']:.2f}s | "
+        f"Retrieval: {metrics['retrieval_time']:.2f}s | "
+        f"Total: {metrics['total_time']:.2f}s"
+    )
+    if metrics.get("cached"):
+        formatted += " (cached answer)"
+    elif metrics.get("structured"):
+        formatted += " (answered from the structured index)"
+    return formatted
+
+
+def format_source_documents(
+    source_docs: List[Document],
+    persist_directory: Optional[Union[str, Path]] = None,
+) -> str:
     """
     Format source documents for display
     
     Args:
         source_docs: List of source documents
+        persist_directory: Directory of the vector store the documents came
+            from, whose metadata index holds their documents' metadata
         
     Returns:
         Formatted string
@@ -122,6 +524,9 @@ def format_source_documents(source_docs: List[Document]) -> str:
     if not source_docs:
         return "No source documents found."
     
+    # Chunks straight from the vector store only carry their document's ID
+    join_document_metadata(source_docs, persist_directory)
+    
     formatted = "Sources:\n"
     for i, doc in enumerate(source_docs, 1):
         metadata = doc.metadata
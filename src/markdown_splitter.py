@@ -0,0 +1,186 @@
+# Markdown splitter module for the RAG system
+
+import re
+from typing import List, Tuple
+
+from src.tokens import count_tokens_each
+
+
+HEADING_PATTERN = re.compile(r"[ \t]{0,3}#{1,6}[ \t]+(.*?)[ \t#]*$")
+LIST_ITEM_PATTERN = re.compile(r"[ \t]*(?:[-*+]|\d{1,9}[.)])(?:[ \t]|$)")
+
+# First characters of heading and list item lines, checked before the patterns
+BLOCK_MARKERS = frozenset("#-*+0123456789")
+
+# Break points inside a block that is too long for one chunk: line ends, then sentence ends
+LONG_BLOCK_BREAK_PATTERN = re.compile(r"\n+|(?<=[.!?])[ \t]+")
+
+# Characters per token used to cut text that has no break point at all
+CHARS_PER_TOKEN = 4
+
+
+def _parse_sections(text: str) -> List[Tuple[str, List[Tuple[int, int]]]]:
+    """
+    Split Markdown text into sections and the blocks of each section
+
+    A block is a heading together with the block that follows it, a list item
+    with its continuation lines, or a paragraph. Blocks are (start, end)
+    offsets into the text; blank lines between blocks belong to no block.
+
+    Args:
+        text: Markdown text
+
+    Returns:
+        List of (heading text, blocks) tuples in document order; text before
+        the first heading forms a section with an empty heading
+    """
+    sections: List[Tuple[str, List[Tuple[int, int]]]] = [("", [])]
+    block_start = None
+    block_end = 0
+    heading_open = False
+    offset = 0
+
+    for line in text.splitlines(keepends=True):
+        line_start = offset
+        offset += len(line)
+        content = line.rstrip("\r\n")
+        line_end = line_start + len(content)
+
+        stripped = content.lstrip()
+        if not stripped:
+            if block_start is not None and not heading_open:
+                sections[-1][1].append((block_start, block_end))
+                block_start = None
+            continue
+
+        heading = None
+        is_item = False
+        if stripped[0] in BLOCK_MARKERS:
+            heading = HEADING_PATTERN.match(content)
+            is_item = heading is None and LIST_ITEM_PATTERN.match(content) is not None
+        if heading or is_item or block_start is None:
+            if heading_open and not heading:
+                # A heading stays in the same block as what follows it
+                block_end = line_end
+                heading_open = False
+                continue
+            if block_start is not None:
+                sections[-1][1].append((block_start, block_end))
+            if heading:
+                sections.append((heading.group(1), []))
+            block_start = line_start
+            heading_open = heading is not None
+        block_end = line_end
+
+    if block_start is not None:
+        sections[-1][1].append((block_start, block_end))
+
+    return [section for section in sections if section[1]]
+
+
+def _split_long_block(text: str, start: int, end: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """
+    Split a block that exceeds max_tokens at line and sentence ends
+
+    Args:
+        text: Markdown text
+        start: Start offset of the block
+        end: End offset of the block
+        max_tokens: Maximum tokens per piece
+
+    Returns:
+        (start, end) offsets of the pieces
+    """
+    pieces = []
+    piece_start = start
+    for match in LONG_BLOCK_BREAK_PATTERN.finditer(text, start, end):
+        if match.start() > piece_start:
+            pieces.append((piece_start, match.start()))
+        piece_start = match.end()
+    if end > piece_start:
+        pieces.append((piece_start, end))
+
+    # Pieces without any break point are cut by length
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    tokens = count_tokens_each([text[piece_start:piece_end] for piece_start, piece_end in pieces])
+    bounded = []
+    for (piece_start, piece_end), piece_tokens in zip(pieces, tokens):
+        if piece_tokens <= max_tokens:
+            bounded.append((piece_start, piece_end, piece_tokens))
+            continue
+        for cut in range(piece_start, piece_end, max_chars):
+            bounded.append((cut, min(cut + max_chars, piece_end), max_tokens))
+
+    merged: List[Tuple[int, int]] = []
+    merged_tokens = 0
+    for piece_start, piece_end, piece_tokens in bounded:
+        if merged and merged_tokens + piece_tokens <= max_tokens:
+            merged[-1] = (merged[-1][0], piece_end)
+            merged_tokens += piece_tokens
+        else:
+            merged.append((piece_start, piece_end))
+            merged_tokens = piece_tokens
+    return merged
+
+
+def split_markdown(text: str, max_tokens: int) -> List[Tuple[int, str, List[str]]]:
+    """
+    Split Markdown text into chunks of whole sections, list items and paragraphs
+
+    Consecutive sections are packed into one chunk while they fit in
+    max_tokens. A longer section gets chunks of its own, split between its
+    list items and paragraphs; only a single item longer than max_tokens is
+    split inside, at line and sentence ends. Each chunk is an exact span of
+    the text, so its start offset locates it in the document.
+
+    Args:
+        text: Markdown text
+        max_tokens: Maximum tokens per chunk
+
+    Returns:
+        List of (start offset, chunk text, headings of the sections in the chunk)
+    """
+    sections = _parse_sections(text)
+    blocks = [block for _, section_blocks in sections for block in section_blocks]
+    block_tokens = iter(count_tokens_each([text[start:end] for start, end in blocks]))
+
+    chunks: List[Tuple[int, str, List[str]]] = []
+    current: List[Tuple[int, int]] = []
+    current_headings: List[str] = []
+    current_tokens = 0
+
+    def emit():
+        nonlocal current, current_headings, current_tokens
+        if current:
+            start, end = current[0][0], current[-1][1]
+            headings = [heading for heading in dict.fromkeys(current_headings) if heading]
+            chunks.append((start, text[start:end], headings))
+        current, current_headings, current_tokens = [], [], 0
+
+    for heading, section_blocks in sections:
+        tokens = [next(block_tokens) for _ in section_blocks]
+        section_tokens = sum(tokens)
+
+        if current_tokens + section_tokens > max_tokens:
+            emit()
+        if section_tokens <= max_tokens:
+            current.extend(section_blocks)
+            current_headings.append(heading)
+            current_tokens += section_tokens
+            continue
+
+        for block, tokens_in_block in zip(section_blocks, tokens):
+            if current_tokens + tokens_in_block > max_tokens:
+                emit()
+            if tokens_in_block <= max_tokens:
+                current.append(block)
+                current_headings.append(heading)
+                current_tokens += tokens_in_block
+                continue
+            for piece in _split_long_block(text, block[0], block[1], max_tokens):
+                current, current_headings = [piece], [heading]
+                emit()
+        emit()
+
+    emit()
+    return chunks
@@ -0,0 +1,509 @@
+# Metadata index module for the RAG system
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from langchain_core.documents import Document
+
+from src.config import CHROMA_PERSIST_DIRECTORY
+from src.document_processor import normalize_participants
+
+
+METADATA_INDEX_FILENAME = "metadata.sqlite"
+
+# Filterable fields and their columns in the documents table
+FILTER_FIELDS = {
+    "date": "date",
+    "year": "year",
+    "month": "month",
+    "day": "day",
+    "topic": "topic",
+    "source": "source",
+    "filename": "filename",
+}
+
+# Fields that describe individual chunks rather than whole documents
+CHUNK_FILTER_FIELDS = ("sections",)
+
+# Metadata stored with each chunk in the vector store; the document's own
+# metadata (source, topic, date, participants, ...) is stored once in the
+# documents table and joined back in by join_document_metadata
+CHUNK_METADATA_FIELDS = ("doc_id", "start_index", "sections")
+
+COMPARISON_OPERATORS = {
+    "$eq": "=",
+    "$ne": "!=",
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+}
+
+
+def _build_condition(field: str, condition: Any) -> Tuple[str, List[Any]]:
+    """
+    Translate one field condition of a where filter into SQL
+
+    Args:
+        field: Field name
+        condition: Value, or dict of operators ($eq, $ne, $gt, $gte, $lt, $lte,
+            $in, $contains) to values
+
+    Returns:
+        Tuple of (SQL expression, parameters)
+
+    Raises:
+        ValueError: If the field or operator is not supported
+    """
+    if not isinstance(condition, dict):
+        condition = {"$contains" if field in ("participants", "sections") else "$eq": condition}
+
+    clauses = []
+    params: List[Any] = []
+    for operator, value in condition.items():
+        if field == "sections":
+            if operator not in ("$contains", "$in"):
+                raise ValueError(f"Unsupported operator for sections: {operator}")
+            names = value if operator == "$in" else [value]
+            clauses.append(
+                "EXISTS (SELECT 1 FROM chunk_sections s"
+                f" WHERE s.chunk_id = c.chunk_id AND s.section IN ({','.join('?' * len(names))}))"
+            )
+            params.extend(name.lower() for name in names)
+            continue
+
+        if field == "participants":
+            if operator not in ("$contains", "$in"):
+                raise ValueError(f"Unsupported operator for participants: {operator}")
+            names = value if operator == "$in" else [value]
+            # Match a full name or the first name ("Jane" matches "Jane Smith")
+            matches = " OR ".join(["(p.name = ? OR p.name LIKE ? || ' %')"] * len(names))
+            clauses.append(
+                "EXISTS (SELECT 1 FROM document_participants p"
+                f" WHERE p.source = d.source AND ({matches}))"
+            )
+            for name in names:
+                params.extend([name.lower(), name.lower()])
+            continue
+
+        column = FILTER_FIELDS.get(field)
+        if column is None:
+            raise ValueError(f"Unsupported filter field: {field}")
+
+        if operator == "$in":
+            clauses.append(f"d.{column} IN ({','.join('?' * len(value))})")
+            params.extend(value)
+        elif operator in COMPARISON_OPERATORS:
+            clauses.append(f"d.{column} {COMPARISON_OPERATORS[operator]} ?")
+            params.append(value)
+        else:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+
+    return " AND ".join(clauses), params
+
+
+def build_where_clause(where: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """
+    Translate a where filter into a SQL expression over the documents table
+    (d) and, for sections, the chunks table (c)
+
+    Supports field conditions combined implicitly with AND, plus explicit
+    "$and" / "$or" lists, e.g.::
+
+        {"date": {"$gte": "2024-03-01", "$lte": "2024-03-31"},
+         "participants": {"$contains": "Jane"},
+         "sections": "Action Items"}
+
+    Args:
+        where: Filter
+
+    Returns:
+        Tuple of (SQL expression, parameters)
+    """
+    clauses = []
+    params: List[Any] = []
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            parts = [build_where_clause(part) for part in value]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(f"({sql})" for sql, _ in parts) + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+        else:
+            sql, field_params = _build_condition(key, value)
+            clauses.append(sql)
+            params.extend(field_params)
+
+    return " AND ".join(clauses) or "1", params
+
+
+def has_chunk_conditions(where: Dict[str, Any]) -> bool:
+    """
+    Check whether a where filter has conditions on chunk fields (e.g. sections)
+
+    Args:
+        where: Filter
+
+    Returns:
+        True if the filter selects chunks rather than whole documents
+    """
+    for key, value in where.items():
+        if key in CHUNK_FILTER_FIELDS:
+            return True
+        if key in ("$and", "$or") and any(has_chunk_conditions(part) for part in value):
+            return True
+    return False
+
+
+class MetadataIndex:
+    """
+    SQLite side index of document metadata used to pre-filter chunks at query time
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open (or create) a metadata index
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(documents)")]
+        if columns and "doc_id" not in columns:
+            # Written before documents kept their full metadata; the index
+            # manifest format changed along with it, so everything is re-indexed
+            self._conn.executescript(
+                """
+                DROP TABLE documents;
+                DROP TABLE IF EXISTS document_participants;
+                DROP TABLE IF EXISTS chunks;
+                DROP TABLE IF EXISTS chunk_sections;
+                """
+            )
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS documents (
+                source TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                filename TEXT,
+                date TEXT,
+                year INTEGER,
+                month INTEGER,
+                day INTEGER,
+                topic TEXT,
+                metadata TEXT NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_doc_id ON documents (doc_id);
+            CREATE INDEX IF NOT EXISTS idx_documents_date ON documents (date);
+            CREATE INDEX IF NOT EXISTS idx_documents_year_month ON documents (year, month);
+            CREATE INDEX IF NOT EXISTS idx_documents_topic ON documents (topic);
+            CREATE TABLE IF NOT EXISTS document_participants (
+                source TEXT NOT NULL,
+                name TEXT NOT NULL,
+                PRIMARY KEY (name, source)
+            );
+            CREATE INDEX IF NOT EXISTS idx_participants_source ON document_participants (source);
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                source TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source);
+            CREATE TABLE IF NOT EXISTS chunk_sections (
+                chunk_id TEXT NOT NULL,
+                section TEXT NOT NULL,
+                PRIMARY KEY (section, chunk_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunk_sections_chunk ON chunk_sections (chunk_id);
+            """
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def add_documents(self, chunk_ids: List[str], documents: List[Document]) -> None:
+        """
+        Record the metadata of document chunks
+
+        Args:
+            chunk_ids: IDs of the chunks
+            documents: Chunks whose metadata to record, with a "doc_id" and
+                their document's full metadata
+        """
+        document_rows = {}
+        participant_rows = set()
+        section_rows = set()
+        for chunk_id, document in zip(chunk_ids, documents):
+            metadata = document.metadata
+            source = metadata.get("source", "")
+            if source not in document_rows:
+                document_metadata = {
+                    key: value
+                    for key, value in metadata.items()
+                    if key not in CHUNK_METADATA_FIELDS and value is not None
+                }
+                document_rows[source] = (
+                    source,
+                    metadata["doc_id"],
+                    metadata.get("filename"),
+                    metadata.get("date"),
+                    metadata.get("year"),
+                    metadata.get("month"),
+                    metadata.get("day"),
+                    metadata.get("topic"),
+                    json.dumps(document_metadata),
+                )
+            for name in normalize_participants(metadata.get("participants")):
+                participant_rows.add((source, name.lower()))
+            sections = metadata.get("sections") or []
+            if isinstance(sections, str):
+                # Stored in the vector store as a comma-separated string
+                sections = sections.split(", ")
+            for section in sections:
+                section_rows.add((chunk_id, section.lower()))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                list(document_rows.values()),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO document_participants (source, name) VALUES (?, ?)",
+                list(participant_rows),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunk_sections (chunk_id, section) VALUES (?, ?)",
+                list(section_rows),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, source) VALUES (?, ?)",
+                [
+                    (chunk_id, document.metadata.get("source", ""))
+                    for chunk_id, document in zip(chunk_ids, documents)
+                ],
+            )
+
+    def delete(self, chunk_ids: List[str]) -> None:
+        """
+        Forget chunks, and documents that no longer have any chunks
+
+        Args:
+            chunk_ids: IDs of the chunks to delete
+        """
+        with self._lock:
+            # Only the documents of the deleted chunks can have lost their last chunk
+            sources = set()
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT DISTINCT source FROM chunks WHERE chunk_id IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                sources.update(source for source, in rows)
+
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids]
+            )
+            self._conn.executemany(
+                "DELETE FROM chunk_sections WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids]
+            )
+            orphaned = [
+                (source,)
+                for source in sources
+                if self._conn.execute("SELECT 1 FROM chunks WHERE source = ? LIMIT 1", (source,)).fetchone() is None
+            ]
+            self._conn.executemany("DELETE FROM document_participants WHERE source = ?", orphaned)
+            self._conn.executemany("DELETE FROM documents WHERE source = ?", orphaned)
+
+    def clear(self) -> None:
+        """
+        Remove all entries
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM chunk_sections")
+            self._conn.execute("DELETE FROM document_participants")
+            self._conn.execute("DELETE FROM documents")
+            self._conn.commit()
+
+    def save(self) -> None:
+        """
+        Commit pending changes
+        """
+        with self._lock:
+            self._conn.commit()
+
+    def filter_chunk_ids(self, where: Dict[str, Any]) -> List[str]:
+        """
+        Get the IDs of the chunks whose document matches a where filter
+
+        Args:
+            where: Filter (see build_where_clause)
+
+        Returns:
+            List of matching chunk IDs
+        """
+        sql, params = build_where_clause(where)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.chunk_id FROM documents d JOIN chunks c ON c.source = d.source"
+                f" WHERE {sql}",
+                params,
+            ).fetchall()
+
+        return [row[0] for row in rows]
+
+    def filter_doc_ids(self, where: Dict[str, Any]) -> List[str]:
+        """
+        Get the IDs of the documents that match a where filter
+
+        Args:
+            where: Filter (see build_where_clause); with conditions on chunk
+                fields, the documents with at least one matching chunk
+
+        Returns:
+            List of matching document IDs
+        """
+        sql, params = build_where_clause(where)
+        query = f"SELECT d.doc_id FROM documents d WHERE {sql}"
+        if has_chunk_conditions(where):
+            query = f"SELECT DISTINCT d.doc_id FROM documents d JOIN chunks c ON c.source = d.source WHERE {sql}"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        return [row[0] for row in rows]
+
+    def get_document_metadata(self, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the metadata of documents by ID
+
+        Args:
+            doc_ids: Document IDs
+
+        Returns:
+            Dict mapping document IDs to their metadata (unknown IDs are omitted)
+        """
+        doc_ids = list(dict.fromkeys(doc_ids))
+        if not doc_ids:
+            return {}
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT doc_id, metadata FROM documents WHERE doc_id IN ({','.join('?' * len(doc_ids))})",
+                doc_ids,
+            ).fetchall()
+
+        return {doc_id: json.loads(metadata) for doc_id, metadata in rows}
+
+
+_metadata_indexes: Dict[str, MetadataIndex] = {}
+_metadata_indexes_lock = threading.Lock()
+
+
+def get_metadata_index_path(persist_directory: Optional[Union[str, Path]] = None) -> Path:
+    """
+    Get the path of the metadata index stored alongside a vector store
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        Path to the metadata index database
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+
+    # Resolved, so an index swapped in behind a link is opened as a different index
+    return Path(persist_directory).resolve() / METADATA_INDEX_FILENAME
+
+
+def get_metadata_index(persist_directory: Optional[Union[str, Path]] = None) -> MetadataIndex:
+    """
+    Get the shared metadata index of a vector store, opening it on first use
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        MetadataIndex
+    """
+    path = str(get_metadata_index_path(persist_directory))
+    with _metadata_indexes_lock:
+        if path not in _metadata_indexes:
+            _metadata_indexes[path] = MetadataIndex(path)
+
+        return _metadata_indexes[path]
+
+
+def join_document_metadata(
+    documents: List[Document],
+    persist_directory: Optional[Union[str, Path]] = None,
+) -> List[Document]:
+    """
+    Add their document's metadata to chunks read from the vector store
+
+    Chunks are stored with only CHUNK_METADATA_FIELDS; this looks up the
+    documents of the given chunks in one query and fills in the rest of
+    their metadata. Chunks that already have it are left alone, so it can be
+    called wherever chunks are about to be used.
+
+    Args:
+        documents: Chunks, updated in place
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        The same chunks
+    """
+    pending = [
+        document for document in documents
+        if "doc_id" in document.metadata and "source" not in document.metadata
+    ]
+    if not pending:
+        return documents
+
+    found = get_metadata_index(persist_directory).get_document_metadata(
+        [document.metadata["doc_id"] for document in pending]
+    )
+    for document in pending:
+        document_metadata = found.get(document.metadata["doc_id"])
+        if document_metadata is not None:
+            document.metadata = {**document_metadata, **document.metadata}
+
+    return documents
+
+
+def close_metadata_index(persist_directory: Optional[Union[str, Path]] = None) -> None:
+    """
+    Close the shared metadata index of a vector store, if it is open
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+    """
+    path = get_metadata_index_path(persist_directory)
+    with _metadata_indexes_lock:
+        index = _metadata_indexes.pop(str(path), None)
+        if index is not None:
+            index._conn.close()
+
+
+def delete_metadata_index(persist_directory: Optional[Union[str, Path]] = None) -> None:
+    """
+    Delete the metadata index of a vector store
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+    """
+    close_metadata_index(persist_directory)
+    path = get_metadata_index_path(persist_directory)
+    for suffix in ("", "-wal", "-shm"):
+        candidate = Path(f"{path}{suffix}")
+        if candidate.exists():
+            candidate.unlink()
@@ -0,0 +1,1034 @@
+# NumPy vector store module for the RAG system
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from src.ivf_index import TRAINING_ROWS_PER_LIST, IVFIndex, normalize_rows
+
+
+NUMPY_STORE_FORMAT_VERSION = 1
+NUMPY_STORE_DIRNAME = "numpy_store"
+NUMPY_STORE_DTYPES = ("float32", "float16", "int8")
+
+# Fixed width of stored chunk IDs in bytes
+ID_WIDTH = 64
+
+# Rows scored per matrix product, bounding temporary memory for large stores
+BLOCK_ROWS = 65536
+
+# Deleted rows are compacted away on persist() once they make up this fraction
+COMPACT_DELETED_FRACTION = 0.3
+
+# The IVF index is retrained once the live rows grow by this factor since training
+ANN_RETRAIN_GROWTH = 4
+
+COMPARISON_OPERATORS = ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin")
+
+
+def _value_key(value: Any) -> str:
+    # Distinguishes 1, 1.0, True and "1", which compare equal in a Python dict
+    return json.dumps(value, sort_keys=True)
+
+
+def _compare(operator: str, value: Any, operand: Any) -> bool:
+    try:
+        if operator == "$gt":
+            return value > operand
+        if operator == "$gte":
+            return value >= operand
+        if operator == "$lt":
+            return value < operand
+        return value <= operand
+    except TypeError:
+        return False
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Vector store keeping embeddings in memory-mapped .npy files
+
+    Vectors are normalized when added and searched by cosine similarity with
+    a blocked matrix product and argpartition top-k. They are stored as
+    float32, float16 or int8 (with a float32 scale per row). Chunk metadata
+    is stored column by column, each column as small integer codes into a
+    dictionary of its distinct values, so the per-file metadata repeated on
+    every chunk is stored once. Chunk texts live in one append-only file.
+
+    Opening a store only reads a small JSON header; vectors, IDs and texts
+    are paged in by the OS as searches touch them. Deleted rows are masked
+    out and compacted away on persist(). Other instances notice a persisted
+    change and remap the files on their next call. Reads and writes hold the
+    same lock, so searches from other threads never see rows renumbered or
+    the text file swapped by a compaction.
+
+    Large stores can be searched approximately with an IVF index (see
+    src.ivf_index), trained by persist() once the store holds ann_min_rows
+    live rows and kept up to date as rows are added, deleted and compacted.
+    Searches scan the nprobe most similar lists; nprobe=0 searches exactly.
+
+    Besides the LangChain VectorStore interface, the store provides the
+    subset of Chroma's API the indexing code uses: get(), persist() and
+    delete_collection().
+    """
+
+    def __init__(
+        self,
+        persist_directory: Union[str, Path],
+        embedding_function: Optional[Embeddings] = None,
+        dtype: str = "float32",
+        ann_min_rows: Optional[int] = None,
+        nlist: int = 0,
+        nprobe: int = 8,
+    ):
+        """
+        Open or create a store
+
+        Args:
+            persist_directory: Directory of the vector store; the files are
+                kept in its numpy_store subdirectory
+            embedding_function: Embedding model
+            dtype: Storage type of new stores (float32, float16 or int8);
+                existing stores keep the type they were created with
+            ann_min_rows: Live rows from which persist() trains an IVF
+                index (None to never train one)
+            nlist: Lists of the IVF index (0 for the square root of the
+                number of rows)
+            nprobe: Lists searched per query by default (0 for exact search)
+        """
+        if dtype not in NUMPY_STORE_DTYPES:
+            raise ValueError(f"Unknown NumPy store dtype: {dtype}")
+
+        self.path = Path(persist_directory) / NUMPY_STORE_DIRNAME
+        self.embedding_function = embedding_function
+        self._default_dtype = dtype
+        self.ann_min_rows = ann_min_rows
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._reset_state()
+        self._load_header()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding_function
+
+    @property
+    def has_ann_index(self) -> bool:
+        with self._lock:
+            self._refresh()
+            return self._ivf.trained
+
+    # Loading and persistence
+
+    def _reset_state(self) -> None:
+        self.dtype = self._default_dtype
+        self.dimensions = 0
+        self._count = 0
+        self._capacity = 0
+        self._keys: List[str] = []
+        self._header_stamp: Optional[Tuple[int, int]] = None
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._writable = False
+        self._values: Optional[List[List[Any]]] = None
+        self._value_codes: Optional[List[Dict[str, int]]] = None
+        self._rows_by_id: Optional[Dict[str, int]] = None
+        self._text_fd: Optional[int] = None
+        self._ivf = IVFIndex(self.path)
+        self._ivf_stale = False
+        self._dirty = False
+
+    def _file(self, name: str) -> Path:
+        return self.path / name
+
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self._file("meta.json").stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load_header(self) -> None:
+        stamp = self._stamp()
+        if stamp is None:
+            return
+
+        with open(self._file("meta.json")) as f:
+            header = json.load(f)
+        if header.get("format_version") != NUMPY_STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported NumPy store format in {self.path}")
+
+        self.dtype = header["dtype"]
+        self.dimensions = header["dimensions"]
+        self._count = header["count"]
+        self._capacity = header["capacity"]
+        self._keys = header["keys"]
+        self._header_stamp = stamp
+
+    def _refresh(self) -> None:
+        """
+        Remap the files if another instance persisted changes since they were opened
+        """
+        if self._dirty or self._stamp() == self._header_stamp:
+            return
+        with self._lock:
+            if self._dirty or self._stamp() == self._header_stamp:
+                return
+            self._close_files()
+            self._reset_state()
+            self._load_header()
+
+    def _close_files(self) -> None:
+        for array in self._arrays.values():
+            if isinstance(array, np.memmap):
+                array.flush()
+        self._arrays = {}
+        if self._text_fd is not None:
+            os.close(self._text_fd)
+            self._text_fd = None
+
+    def _array(self, name: str) -> np.ndarray:
+        array = self._arrays.get(name)
+        if array is None:
+            array = np.load(self._file(f"{name}.npy"), mmap_mode="r+" if self._writable else "r")
+            self._arrays[name] = array
+        return array
+
+    def _make_writable(self) -> None:
+        if not self._writable:
+            self._writable = True
+            self._arrays = {}
+
+    def _array_specs(self, capacity: int) -> Dict[str, Tuple[Tuple[int, ...], str, Any]]:
+        # name -> (shape, dtype, fill value of unused rows)
+        specs = {
+            "vectors": ((capacity, self.dimensions), self.dtype, 0),
+            "ids": ((capacity,), f"S{ID_WIDTH}", b""),
+            "alive": ((capacity,), "bool", False),
+            "text_offsets": ((capacity, 2), "int64", 0),
+            "codes": ((capacity, len(self._keys)), "int32", -1),
+            "lists": ((capacity,), "int32", -1),
+        }
+        if self.dtype == "int8":
+            specs["scales"] = ((capacity,), "float32", 0)
+        return specs
+
+    def _resize(self, capacity: int, rows: Optional[np.ndarray] = None) -> None:
+        """
+        Rewrite the array files with a new capacity (or number of columns)
+
+        Args:
+            capacity: New number of rows
+            rows: Rows to keep, in order (defaults to the first count rows)
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        kept = np.arange(self._count) if rows is None else rows
+        old_arrays = {name: self._array(name) for name in self._arrays_on_disk()}
+
+        for name, (shape, dtype, fill) in self._array_specs(capacity).items():
+            tmp_path = self._file(f"{name}.npy.tmp")
+            array = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+            array[...] = fill
+            old = old_arrays.get(name)
+            if old is not None and len(kept):
+                if name == "codes":
+                    array[:len(kept), :old.shape[1]] = old[kept]
+                else:
+                    array[:len(kept)] = old[kept]
+            array.flush()
+            del array
+            os.replace(tmp_path, self._file(f"{name}.npy"))
+
+        self._capacity = capacity
+        self._writable = True
+        self._arrays = {}
+
+    def _arrays_on_disk(self) -> List[str]:
+        if not self._capacity:
+            return []
+        return list(self._array_specs(self._capacity))
+
+    def _ensure_capacity(self, extra_rows: int) -> None:
+        needed = self._count + extra_rows
+        if needed > self._capacity:
+            self._resize(max(needed, 2 * self._capacity, 1024))
+
+    def _load_columns(self) -> None:
+        if self._values is not None:
+            return
+        path = self._file("columns.json")
+        values = []
+        if path.exists():
+            with open(path) as f:
+                values = json.load(f)["values"]
+        self._set_columns(values + [[] for _ in range(len(self._keys) - len(values))])
+
+    def _set_columns(self, values: List[List[Any]]) -> None:
+        self._values = values
+        self._value_codes = [
+            {_value_key(value): code for code, value in enumerate(column)}
+            for column in values
+        ]
+
+    def _load_ids(self) -> Dict[str, int]:
+        if self._rows_by_id is None:
+            rows = np.flatnonzero(self._array("alive")[:self._count]) if self._count else []
+            ids = self._array("ids") if self._count else None
+            self._rows_by_id = {ids[row].decode("utf-8"): int(row) for row in rows}
+        return self._rows_by_id
+
+    def _write_json(self, name: str, data: Dict[str, Any]) -> None:
+        tmp_path = self._file(f"{name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._file(name))
+
+    def persist(self) -> None:
+        """
+        Write pending changes to disk, compacting deleted rows if there are many
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+
+            alive = self._array("alive")[:self._count]
+            deleted = self._count - int(alive.sum())
+            if deleted and deleted >= COMPACT_DELETED_FRACTION * self._count:
+                self._compact(np.flatnonzero(alive))
+            self._update_ann_index()
+
+            for array in self._arrays.values():
+                if isinstance(array, np.memmap):
+                    array.flush()
+            if self._values is not None:
+                self._write_json("columns.json", {"values": self._values})
+            # The header is written last, so readers never see rows that are not on disk
+            self._write_json("meta.json", {
+                "format_version": NUMPY_STORE_FORMAT_VERSION,
+                "dtype": self.dtype,
+                "dimensions": self.dimensions,
+                "count": self._count,
+                "capacity": self._capacity,
+                "keys": self._keys,
+            })
+            self._header_stamp = self._stamp()
+            self._dirty = False
+
+    def _update_ann_index(self) -> None:
+        live = int(self._array("alive")[:self._count].sum())
+        if (
+            self.ann_min_rows is not None
+            and live >= self.ann_min_rows
+            and (not self._ivf.trained or live > ANN_RETRAIN_GROWTH * self._ivf.trained_rows)
+        ):
+            self._train_ann_index()
+        elif self._ivf.trained and self._ivf_stale:
+            self._ivf.build_lists(np.array(self._array("lists")[:self._count]))
+            self._ivf.save()
+        self._ivf_stale = False
+
+    def _train_ann_index(self, nlist: Optional[int] = None) -> None:
+        live_rows = np.flatnonzero(self._array("alive")[:self._count])
+        num_lists = nlist or self.nlist or max(1, int(np.sqrt(len(live_rows))))
+        sample_size = min(len(live_rows), num_lists * TRAINING_ROWS_PER_LIST)
+        sample = np.sort(np.random.default_rng(0).choice(live_rows, sample_size, replace=False))
+        self._ivf.train(self._row_vectors(sample), num_lists, len(live_rows))
+
+        lists = self._array("lists")
+        for start in range(0, self._count, BLOCK_ROWS):
+            rows = np.arange(start, min(self._count, start + BLOCK_ROWS))
+            lists[rows] = self._ivf.assign(self._row_vectors(rows))
+        self._ivf.build_lists(np.array(lists[:self._count]))
+        self._ivf.save()
+
+    def build_ann_index(self, nlist: Optional[int] = None) -> None:
+        """
+        Train the IVF index now, whatever the number of rows
+
+        Args:
+            nlist: Number of lists (defaults to the store's nlist)
+        """
+        with self._lock:
+            self._refresh()
+            if not len(self):
+                return
+            self._make_writable()
+            self._train_ann_index(nlist)
+            self._dirty = True
+            self.persist()
+
+    def compact(self) -> None:
+        """
+        Drop deleted rows and spare capacity, e.g. once the store no longer takes writes
+
+        The arrays are rewritten to exactly the live rows; the next add grows
+        them again.
+        """
+        with self._lock:
+            self._refresh()
+            if not self._capacity:
+                return
+            live = int(self._array("alive")[:self._count].sum())
+            if live == self._count == self._capacity:
+                return
+            self._make_writable()
+            self._compact(np.flatnonzero(self._array("alive")[:self._count]), capacity=max(live, 1))
+            self._dirty = True
+            self.persist()
+
+    def _compact(self, rows: np.ndarray, capacity: Optional[int] = None) -> None:
+        """
+        Rewrite the store keeping only the given rows, dropping unused texts and values
+
+        Args:
+            rows: Live rows, in order
+            capacity: Rows to allocate (defaults to twice the live rows)
+        """
+        self._load_columns()
+        offsets = np.array(self._array("text_offsets")[rows])
+
+        # Copy the live texts into a new text file
+        tmp_path = self._file("texts.bin.tmp")
+        new_offsets = np.zeros((len(rows), 2), dtype=np.int64)
+        position = 0
+        with open(tmp_path, "wb") as f:
+            for i, (start, end) in enumerate(offsets):
+                f.write(os.pread(self._text_file(), int(end - start), int(start)))
+                new_offsets[i] = (position, position + end - start)
+                position += end - start
+
+        # Re-encode the columns so values no live row uses are dropped
+        codes = np.array(self._array("codes")[rows])
+        values = []
+        for column in range(len(self._keys)):
+            used, codes[:, column] = np.unique(codes[:, column], return_inverse=True)
+            if len(used) and used[0] == -1:
+                codes[:, column] -= 1
+                used = used[1:]
+            values.append([self._values[column][code] for code in used])
+
+        self._resize(max(1024, 2 * len(rows)) if capacity is None else capacity, rows)
+        self._count = len(rows)
+        self._array("text_offsets")[:self._count] = new_offsets
+        self._array("codes")[:self._count] = codes
+        self._set_columns(values)
+        self._rows_by_id = None
+        self._ivf_stale = True
+
+        # Swap in the new text file before closing the old one
+        os.replace(tmp_path, self._file("texts.bin"))
+        old_fd, self._text_fd = self._text_fd, os.open(self._file("texts.bin"), os.O_RDONLY)
+        if old_fd is not None:
+            os.close(old_fd)
+
+    def _text_file(self) -> int:
+        if self._text_fd is None:
+            self._text_fd = os.open(self._file("texts.bin"), os.O_RDONLY)
+        return self._text_fd
+
+    def delete_collection(self) -> None:
+        """
+        Delete all files of the store
+        """
+        with self._lock:
+            self._close_files()
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._reset_state()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            if not self._count:
+                return 0
+            return int(self._array("alive")[:self._count].sum())
+
+    # Writing
+
+    def _encode_metadata(self, metadatas: List[Dict[str, Any]]) -> np.ndarray:
+        encoded = [self._encode_row(metadata) for metadata in metadatas]
+        codes = np.full((len(metadatas), len(self._keys)), -1, dtype=np.int32)
+        for row, row_codes in enumerate(encoded):
+            for column, code in row_codes.items():
+                codes[row, column] = code
+        return codes
+
+    def _encode_row(self, metadata: Dict[str, Any]) -> Dict[int, int]:
+        codes = {}
+        for key, value in metadata.items():
+            if value is None:
+                continue
+            if isinstance(value, tuple):
+                value = list(value)
+            if key not in self._keys:
+                self._keys.append(key)
+                self._values.append([])
+                self._value_codes.append({})
+            column = self._keys.index(key)
+            value_codes = self._value_codes[column]
+            code = value_codes.get(_value_key(value))
+            if code is None:
+                code = len(self._values[column])
+                self._values[column].append(value)
+                value_codes[_value_key(value)] = code
+            codes[column] = code
+        return codes
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """
+        Embed and add texts, replacing existing chunks with the same IDs
+
+        Args:
+            texts: Texts to add
+            metadatas: Metadata of each text
+            ids: Chunk IDs (random UUIDs by default)
+
+        Returns:
+            List of chunk IDs
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        if self.embedding_function is None:
+            raise ValueError("An embedding function is required to add texts")
+
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = np.asarray(self.embedding_function.embed_documents(texts), dtype=np.float32)
+        self.add_vectors(ids, vectors, texts, metadatas)
+        return ids
+
+    def add_vectors(
+        self,
+        ids: List[str],
+        vectors: np.ndarray,
+        texts: List[str],
+        metadatas: List[Dict],
+    ) -> None:
+        """
+        Add precomputed embeddings, replacing existing chunks with the same IDs
+
+        Args:
+            ids: Chunk IDs
+            vectors: Embedding matrix with one row per chunk
+            texts: Chunk texts
+            metadatas: Chunk metadata
+        """
+        for chunk_id in ids:
+            if len(chunk_id.encode("utf-8")) > ID_WIDTH:
+                raise ValueError(f"Chunk IDs are limited to {ID_WIDTH} bytes: {chunk_id}")
+
+        with self._lock:
+            self._refresh()
+            self.delete(ids)
+
+            if not self.dimensions:
+                self.dimensions = vectors.shape[1]
+            elif vectors.shape[1] != self.dimensions:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match the store ({self.dimensions})"
+                )
+
+            self._load_columns()
+            self._make_writable()
+            codes = self._encode_metadata(metadatas)
+            if not self._capacity or len(self._keys) > self._array("codes").shape[1]:
+                # A new metadata key adds a column, so the arrays are rewritten
+                self._resize(max(self._capacity, 1024))
+            self._ensure_capacity(len(ids))
+
+            encoded = [text.encode("utf-8") for text in texts]
+            text_path = self._file("texts.bin")
+            start = text_path.stat().st_size if text_path.exists() else 0
+            with open(text_path, "ab") as f:
+                f.write(b"".join(encoded))
+            lengths = np.array([len(text) for text in encoded], dtype=np.int64)
+            ends = start + np.cumsum(lengths)
+
+            rows = slice(self._count, self._count + len(ids))
+            normalized = normalize_rows(vectors)
+            if self.dtype == "int8":
+                scales = np.abs(normalized).max(axis=1) / 127
+                scales[scales == 0] = 1.0
+                self._array("vectors")[rows] = np.round(normalized / scales[:, None]).astype(np.int8)
+                self._array("scales")[rows] = scales
+            else:
+                self._array("vectors")[rows] = normalized.astype(self.dtype)
+            if self._ivf.trained:
+                self._array("lists")[rows] = self._ivf.assign(normalized)
+                self._ivf_stale = True
+            self._array("ids")[rows] = [chunk_id.encode("utf-8") for chunk_id in ids]
+            self._array("alive")[rows] = True
+            self._array("text_offsets")[rows] = np.stack([ends - lengths, ends], axis=1)
+            self._array("codes")[rows, :codes.shape[1]] = codes
+
+            rows_by_id = self._load_ids()
+            for i, chunk_id in enumerate(ids):
+                rows_by_id[chunk_id] = self._count + i
+            self._count += len(ids)
+            self._dirty = True
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """
+        Delete chunks by ID
+
+        Args:
+            ids: Chunk IDs (unknown IDs are ignored)
+
+        Returns:
+            True
+        """
+        if not ids:
+            return True
+
+        with self._lock:
+            self._refresh()
+            if not self._count:
+                return True
+            rows_by_id = self._load_ids()
+            rows = [rows_by_id.pop(chunk_id) for chunk_id in ids if chunk_id in rows_by_id]
+            if rows:
+                self._make_writable()
+                self._array("alive")[rows] = False
+                self._dirty = True
+        return True
+
+    # Reading
+
+    def _row_ids(self, rows: Sequence[int]) -> List[str]:
+        if not len(rows):
+            return []
+        ids = self._array("ids")
+        return [ids[row].decode("utf-8") for row in rows]
+
+    def _row_texts(self, rows: Sequence[int]) -> List[str]:
+        if not len(rows):
+            return []
+        offsets = self._array("text_offsets")
+        fd = self._text_file()
+        return [
+            os.pread(fd, int(end - start), int(start)).decode("utf-8")
+            for start, end in (offsets[row] for row in rows)
+        ]
+
+    def _row_metadatas(self, rows: Sequence[int]) -> List[Dict[str, Any]]:
+        if not len(rows):
+            return []
+        self._load_columns()
+        codes = self._array("codes")
+        metadatas = []
+        for row in rows:
+            metadatas.append({
+                key: self._values[column][code]
+                for column, (key, code) in enumerate(zip(self._keys, codes[row]))
+                if code >= 0
+            })
+        return metadatas
+
+    def _row_vectors(self, rows: np.ndarray) -> np.ndarray:
+        if not len(rows):
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        vectors = self._array("vectors")[rows].astype(np.float32)
+        if self.dtype == "int8":
+            vectors *= self._array("scales")[rows][:, None]
+        return vectors
+
+    def _rows_for_ids(self, ids: List[str]) -> List[int]:
+        rows_by_id = self._load_ids()
+        return [rows_by_id[chunk_id] for chunk_id in ids if chunk_id in rows_by_id]
+
+    def get(
+        self,
+        ids: Optional[Union[str, List[str]]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        """
+        Get stored chunks, like Chroma's get()
+
+        Args:
+            ids: Chunk IDs to fetch (all chunks if not given)
+            where: Metadata filter (see _where_mask)
+            limit: Maximum number of chunks
+            offset: Number of chunks to skip
+            include: Fields to return: "documents", "metadatas", "embeddings"
+
+        Returns:
+            Dict with "ids" and the included fields (None for the others)
+        """
+        include = ["documents", "metadatas"] if include is None else include
+        if isinstance(ids, str):
+            ids = [ids]
+
+        # Rows are read under the lock, so a compaction cannot renumber them
+        # or close the text file in between
+        with self._lock:
+            self._refresh()
+            if not self._count:
+                rows = np.zeros(0, dtype=np.int64)
+            elif ids is not None:
+                rows = np.array(self._rows_for_ids(ids), dtype=np.int64)
+                if where is not None and len(rows):
+                    rows = rows[self._where_mask(where)[rows]]
+            else:
+                mask = np.array(self._array("alive")[:self._count])
+                if where is not None:
+                    mask &= self._where_mask(where)
+                rows = np.flatnonzero(mask)
+
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+
+            return {
+                "ids": self._row_ids(rows),
+                "documents": self._row_texts(rows) if "documents" in include else None,
+                "metadatas": self._row_metadatas(rows) if "metadatas" in include else None,
+                "embeddings": self._row_vectors(rows) if "embeddings" in include else None,
+            }
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        """
+        Get stored chunks as documents
+
+        Args:
+            ids: Chunk IDs (missing IDs are omitted)
+
+        Returns:
+            List of documents
+        """
+        results = self.get(ids=list(ids))
+        return [
+            Document(id=chunk_id, page_content=text, metadata=metadata)
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+
+    def _where_mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """
+        Evaluate a Chroma-style metadata filter on all rows
+
+        Supports $and/$or and, per field, a plain value or $eq, $ne, $gt,
+        $gte, $lt, $lte, $in and $nin. Comparisons are evaluated once per
+        distinct value of the column rather than once per row.
+
+        Args:
+            where: Metadata filter
+
+        Returns:
+            Boolean mask over the stored rows
+        """
+        self._load_columns()
+        mask = np.ones(self._count, dtype=bool)
+        for field, condition in where.items():
+            if field in ("$and", "$or"):
+                masks = [self._where_mask(part) for part in condition]
+                combine = np.logical_and if field == "$and" else np.logical_or
+                mask &= combine.reduce(masks) if masks else np.ones(self._count, dtype=bool)
+                continue
+
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            if field in self._keys:
+                column = self._keys.index(field)
+                codes = self._array("codes")[:self._count, column]
+                values = self._values[column]
+            else:
+                codes = np.full(self._count, -1, dtype=np.int32)
+                values = []
+
+            for operator, operand in condition.items():
+                if operator not in COMPARISON_OPERATORS:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+                if operator in ("$eq", "$ne", "$in", "$nin"):
+                    operands = operand if operator in ("$in", "$nin") else [operand]
+                    keys = {_value_key(value) for value in operands}
+                    matching = [code for code, value in enumerate(values) if _value_key(value) in keys]
+                else:
+                    matching = [
+                        code for code, value in enumerate(values) if _compare(operator, value, operand)
+                    ]
+                found = np.isin(codes, matching)
+                mask &= ~found if operator in ("$ne", "$nin") else found
+        return mask
+
+    # Searching
+
+    def _top_k(
+        self,
+        queries: np.ndarray,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k most similar live rows for each query
+
+        Args:
+            queries: Normalized query matrix, one row per query
+            k: Number of results per query
+            mask: Optional boolean mask of the rows to consider
+
+        Returns:
+            Tuple of (rows, similarities), each of shape (queries, at most k),
+            best first; missing results have row -1
+        """
+        count = self._count
+        vectors = self._array("vectors")
+        alive = self._array("alive")
+        scales = self._array("scales") if self.dtype == "int8" else None
+
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, count, BLOCK_ROWS):
+            stop = min(count, start + BLOCK_ROWS)
+            valid = np.array(alive[start:stop])
+            if mask is not None:
+                valid &= mask[start:stop]
+            if not valid.any():
+                continue
+
+            block = vectors[start:stop]
+            scores = queries @ (block if self.dtype == "float32" else block.astype(np.float32)).T
+            if scales is not None:
+                scores *= scales[start:stop]
+            scores[:, ~valid] = -np.inf
+
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            merged_rows = np.concatenate(
+                [best_rows, np.broadcast_to(np.arange(start, stop), scores.shape)], axis=1
+            )
+            if merged_scores.shape[1] > k:
+                top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+                merged_scores = np.take_along_axis(merged_scores, top, axis=1)
+                merged_rows = np.take_along_axis(merged_rows, top, axis=1)
+            best_scores, best_rows = merged_scores, merged_rows
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.where(np.isfinite(best_scores), np.take_along_axis(best_rows, order, axis=1), -1)
+        return best_rows, best_scores
+
+    def _search_rows(
+        self,
+        queries: np.ndarray,
+        k: int,
+        where: Optional[Dict[str, Any]] = None,
+        ids: Optional[List[str]] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        self._refresh()
+        if not self._count or k <= 0:
+            return [[] for _ in queries]
+
+        queries = normalize_rows(np.asarray(queries, dtype=np.float32))
+        mask = None
+        if ids is not None:
+            mask = np.zeros(self._count, dtype=bool)
+            mask[self._rows_for_ids(ids)] = True
+        if where is not None:
+            where_mask = self._where_mask(where)
+            mask = where_mask if mask is None else mask & where_mask
+
+        nprobe = self.nprobe if nprobe is None else nprobe
+        if ids is None and nprobe > 0 and self._ivf.trained:
+            return self._ivf_search(queries, k, mask, nprobe)
+
+        rows, scores = self._top_k(queries, k, mask)
+        return [
+            [(int(row), float(score)) for row, score in zip(query_rows, query_scores) if row >= 0]
+            for query_rows, query_scores in zip(rows, scores)
+        ]
+
+    def _ivf_search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        mask: Optional[np.ndarray],
+        nprobe: int,
+    ) -> List[List[Tuple[int, float]]]:
+        alive = self._array("alive")
+        probes = self._ivf.probe(queries, nprobe)
+        # Rows added since the lists were built are not in any list yet
+        tail = np.arange(self._ivf.built_rows, self._count)
+
+        results = []
+        for query, lists in zip(queries, probes):
+            rows = np.sort(np.concatenate([self._ivf.candidate_rows(lists), tail]))
+            valid = alive[rows]
+            if mask is not None:
+                valid &= mask[rows]
+            rows = rows[valid]
+
+            if mask is not None and len(rows) < k:
+                # A selective filter left too few rows in the probed lists
+                top_rows, top_scores = self._top_k(query[None], k, mask)
+                results.append([
+                    (int(row), float(score)) for row, score in zip(top_rows[0], top_scores[0]) if row >= 0
+                ])
+                continue
+
+            scores = self._row_vectors(rows) @ query
+            if len(rows) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                rows, scores = rows[top], scores[top]
+            order = np.argsort(-scores)
+            results.append([(int(rows[i]), float(scores[i])) for i in order])
+        return results
+
+    def batch_search_with_ids(
+        self,
+        embeddings: Union[np.ndarray, List[List[float]]],
+        k: int = 4,
+        where: Optional[Dict[str, Any]] = None,
+        ids: Optional[List[str]] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[List[Tuple[str, Document, float]]]:
+        """
+        Search for several query embeddings with one matrix product per block of rows
+
+        Args:
+            embeddings: Query embeddings
+            k: Number of results per query
+            where: Optional metadata filter
+            ids: Optional candidate chunk IDs to restrict the search to
+                (always searched exactly)
+            nprobe: IVF lists searched per query (defaults to the store's
+                nprobe, 0 for exact search)
+
+        Returns:
+            One list of (chunk_id, document, cosine distance) tuples per
+            query, nearest first
+        """
+        results = []
+        # The rows found are only valid until the next write, so they are
+        # read under the same lock as the search
+        with self._lock:
+            for matches in self._search_rows(embeddings, k, where, ids, nprobe):
+                rows = [row for row, _ in matches]
+                results.append([
+                    (chunk_id, Document(id=chunk_id, page_content=text, metadata=metadata), 1.0 - score)
+                    for chunk_id, text, metadata, (_, score) in zip(
+                        self._row_ids(rows), self._row_texts(rows), self._row_metadatas(rows), matches
+                    )
+                ])
+        return results
+
+    def search_with_ids(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        where: Optional[Dict[str, Any]] = None,
+        ids: Optional[List[str]] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[str, Document, float]]:
+        """
+        Search by embedding, returning chunk IDs with the documents
+
+        Args:
+            embedding: Query embedding
+            k: Number of results
+            where: Optional metadata filter
+            ids: Optional candidate chunk IDs to restrict the search to
+                (always searched exactly)
+            nprobe: IVF lists searched (defaults to the store's nprobe, 0
+                for exact search)
+
+        Returns:
+            List of (chunk_id, document, cosine distance) tuples, nearest first
+        """
+        return self.batch_search_with_ids([embedding], k, where, ids, nprobe)[0]
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        return [
+            (document, distance)
+            for _, document, distance in self.search_with_ids(embedding, k, filter, nprobe=nprobe)
+        ]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [document for _, document, _ in self.search_with_ids(embedding, k, filter, nprobe=nprobe)]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k, filter, nprobe=nprobe)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k, filter, nprobe=nprobe)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are cosine distances
+        return lambda distance: 1.0 - distance
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        persist_directory: Optional[Union[str, Path]] = None,
+        dtype: str = "float32",
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        """
+        Create a store from texts
+
+        Args:
+            texts: Texts to add
+            embedding: Embedding model
+            metadatas: Metadata of each text
+            ids: Chunk IDs
+            persist_directory: Directory of the vector store
+            dtype: Storage type (float32, float16 or int8)
+
+        Returns:
+            NumpyVectorStore
+        """
+        if persist_directory is None:
+            raise ValueError("persist_directory is required")
+        store = cls(persist_directory, embedding, dtype=dtype)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
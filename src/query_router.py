@@ -0,0 +1,229 @@
+# Query router module for the RAG system
+
+import calendar
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from langchain_core.documents import Document
+
+from src.config import STRUCTURED_MAX_ITEMS
+from src.structured_index import SECTION_KINDS, get_structured_index
+from src.tracing import span
+
+
+KIND_PATTERNS = (
+    ("action_item", re.compile(r"\b(?:action[ -]items?|to-?dos?|tasks?)\b", re.IGNORECASE)),
+    ("decision", re.compile(r"\b(?:decisions?|decided?)\b", re.IGNORECASE)),
+    ("next_meeting", re.compile(r"\bnext meetings?\b", re.IGNORECASE)),
+)
+
+KIND_TITLES = {
+    "action_item": "Action items",
+    "decision": "Decisions",
+    "next_meeting": "Next meeting",
+}
+
+NAME = r"[A-Z][a-z][\w'-]*(?:[ \t]+[A-Z][a-z][\w'-]*)?"
+OWNER_PATTERNS = (
+    re.compile(rf"\b(?:for|of|assigned to|owned by|belonging to)[ \t]+(?P<owner>{NAME})"),
+    re.compile(rf"\b(?P<owner>{NAME})['’]s\b"),
+    re.compile(rf"\b(?:does|did|should|must)[ \t]+(?P<owner>{NAME})[ \t]+(?:have|own|need|do)\b"),
+)
+
+LATEST_MEETING_PATTERN = re.compile(r"\b(?:last|latest|most recent|previous) meeting\b", re.IGNORECASE)
+DATE_SCOPE_PATTERN = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+MONTH_SCOPE_PATTERN = re.compile(r"\b(" + "|".join(calendar.month_name[1:]) + r")[ \t]+(\d{4})\b", re.IGNORECASE)
+YEAR_SCOPE_PATTERN = re.compile(r"\b((?:19|20)\d{2})\b")
+
+# Words a structured query may contain besides its kind, owner and time scope;
+# anything else (e.g. a topic) needs the full RAG path
+ALLOWED_WORDS = frozenset(
+    "what which who when whats list show give tell me us all the a an are were is was any there "
+    "open outstanding pending current in at on from during of for to and made make did do does "
+    "have has had we our been meeting meetings item items scheduled planned date please assigned "
+    "owned by belonging recorded taken reached s".split()
+)
+MONTH_NAMES = frozenset(name.lower() for name in calendar.month_name[1:])
+
+
+def parse_structured_query(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Recognize a question that the structured index can answer on its own
+
+    Recognized questions ask for decisions, action items or next meetings,
+    optionally for one owner ("What are Jane's action items?") and one
+    meeting or period ("Decisions from the last meeting", "in March 2024").
+    Questions with any other content, such as a topic, are left to RAG.
+
+    Args:
+        query: Query string
+
+    Returns:
+        Dict with kinds, owner, date_from, date_to and latest, or None if
+        the question needs the RAG path
+    """
+    remaining = query
+    kinds = []
+    for kind, pattern in KIND_PATTERNS:
+        if pattern.search(remaining):
+            kinds.append(kind)
+            remaining = pattern.sub(" ", remaining)
+    if not kinds:
+        return None
+
+    parsed: Dict[str, Any] = {"kinds": kinds, "owner": None, "date_from": None, "date_to": None, "latest": False}
+
+    if LATEST_MEETING_PATTERN.search(remaining):
+        parsed["latest"] = True
+        remaining = LATEST_MEETING_PATTERN.sub(" ", remaining)
+    elif DATE_SCOPE_PATTERN.search(remaining):
+        meeting_date = DATE_SCOPE_PATTERN.search(remaining).group(1)
+        parsed["date_from"] = parsed["date_to"] = meeting_date
+        remaining = DATE_SCOPE_PATTERN.sub(" ", remaining)
+    elif MONTH_SCOPE_PATTERN.search(remaining):
+        month_match = MONTH_SCOPE_PATTERN.search(remaining)
+        month = [name.lower() for name in calendar.month_name].index(month_match.group(1).lower())
+        year = int(month_match.group(2))
+        parsed["date_from"] = f"{year:04d}-{month:02d}-01"
+        parsed["date_to"] = f"{year:04d}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}"
+        remaining = MONTH_SCOPE_PATTERN.sub(" ", remaining)
+    elif YEAR_SCOPE_PATTERN.search(remaining):
+        year = YEAR_SCOPE_PATTERN.search(remaining).group(1)
+        parsed["date_from"], parsed["date_to"] = f"{year}-01-01", f"{year}-12-31"
+        remaining = YEAR_SCOPE_PATTERN.sub(" ", remaining)
+
+    for pattern in OWNER_PATTERNS:
+        match = pattern.search(remaining)
+        if not match:
+            continue
+        owner = match.group("owner")
+        if owner.split()[0].lower() in ALLOWED_WORDS | MONTH_NAMES:
+            continue
+        parsed["owner"] = owner
+        remaining = remaining[:match.start("owner")] + " " + remaining[match.end():]
+        break
+
+    if any(word not in ALLOWED_WORDS for word in re.findall(r"[a-z0-9]+", remaining.lower())):
+        return None
+    if parsed["owner"] is not None and kinds != ["action_item"]:
+        # Only action items have owners
+        return None
+    if kinds == ["next_meeting"] and parsed["date_from"] is None:
+        # "When is the next meeting?" is planned in the most recent meeting
+        parsed["latest"] = True
+
+    return parsed
+
+
+def _describe_scope(parsed: Dict[str, Any], kind: str) -> str:
+    if parsed["date_from"] is None:
+        return ""
+    if parsed["date_from"] == parsed["date_to"]:
+        if kind == "next_meeting":
+            return f" (planned at the meeting on {parsed['date_from']})"
+        return f" from the meeting on {parsed['date_from']}"
+    return f" from meetings between {parsed['date_from']} and {parsed['date_to']}"
+
+
+def format_structured_answer(parsed: Dict[str, Any], items: List[Dict[str, Any]], truncated: bool) -> str:
+    """
+    Format items as the answer to a structured query
+
+    Args:
+        parsed: Parsed query (see parse_structured_query)
+        items: Items found, most recent meeting first
+        truncated: Whether more items matched than are listed
+
+    Returns:
+        Answer text
+    """
+    sections = []
+    for kind in parsed["kinds"]:
+        kind_items = [item for item in items if item["kind"] == kind]
+        if not kind_items:
+            continue
+
+        title = KIND_TITLES[kind]
+        if parsed["owner"]:
+            title += f" for {parsed['owner']}"
+        lines = [f"{title}{_describe_scope(parsed, kind)}:"]
+        for item in kind_items:
+            text = item["text"]
+            if kind == "action_item" and item["owner"] and not parsed["owner"]:
+                text = f"{item['owner']}: {text}"
+            if item["due_date"] and kind == "action_item":
+                text += f" (due {item['due_date']})"
+            elif item["due_text"]:
+                text += f" (due {item['due_text']})"
+            lines.append(f"- {text} [{item['topic'] or 'Meeting'}, {item['meeting_date'] or 'unknown date'}]")
+        sections.append("\n".join(lines))
+
+    answer = "\n\n".join(sections)
+    if truncated:
+        answer += f"\n\nOnly the {len(items)} most recent items are listed; ask about a single meeting, month or owner for more."
+    return answer
+
+
+def _source_documents(items: List[Dict[str, Any]]) -> List[Document]:
+    # One document per note, holding the lines the answer was built from
+    documents: Dict[str, Document] = {}
+    for item in items:
+        document = documents.get(item["source"])
+        if document is None:
+            document = documents[item["source"]] = Document(
+                page_content="",
+                metadata={
+                    "source": item["source"],
+                    "filename": Path(item["source"]).name,
+                    "date": item["meeting_date"],
+                    "topic": item["topic"],
+                },
+            )
+        document.page_content += f"- {item['text']}\n"
+    return list(documents.values())
+
+
+def route_query(
+    query: str,
+    persist_directory: Optional[Union[str, Path]] = None,
+    max_items: int = STRUCTURED_MAX_ITEMS,
+) -> Optional[Tuple[str, List[Document]]]:
+    """
+    Answer a query from the structured index if it is a structured query
+
+    Args:
+        query: Query string
+        persist_directory: Directory where the vector store is persisted
+        max_items: Maximum number of items to list
+
+    Returns:
+        Tuple of (response, source_documents), or None if the query needs
+        the RAG path (not a structured query, or nothing recorded for it)
+    """
+    parsed = parse_structured_query(query)
+    if parsed is None:
+        return None
+
+    with span("route_query") as s:
+        index = get_structured_index(persist_directory)
+        if parsed["latest"]:
+            latest = index.latest_meeting_date(list(SECTION_KINDS.values()))
+            if latest is None:
+                return None
+            parsed["date_from"] = parsed["date_to"] = latest
+
+        items = index.find_items(
+            parsed["kinds"],
+            owner=parsed["owner"],
+            date_from=parsed["date_from"],
+            date_to=parsed["date_to"],
+            limit=max_items + 1,
+        )
+        s.set(items=len(items))
+        if not items:
+            return None
+
+        truncated = len(items) > max_items
+        items = items[:max_items]
+        return format_structured_answer(parsed, items, truncated), _source_documents(items)
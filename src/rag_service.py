@@ -0,0 +1,861 @@
+# RAG service module for the RAG system
+
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import LLM
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+from src.answer_cache import AnswerCache, get_answer_cache
+from src.async_utils import LoopSemaphore
+from src.config import (
+    ANSWER_CACHE_ENABLED,
+    BACKEND_OLLAMA,
+    BACKEND_OPENAI,
+    CHROMA_PERSIST_DIRECTORY,
+    COMPLETION_MODEL,
+    DEFAULT_BACKEND,
+    DOCUMENT_STORE_DIRECTORY,
+    LOCAL_COMPLETION_MODEL,
+    OLLAMA_MAX_CONCURRENCY,
+    OPENAI_MAX_CONCURRENCY,
+    RERANK_CANDIDATES,
+    RERANK_ENABLED,
+    RERANK_LEXICAL_WEIGHT,
+    RERANK_MMR_LAMBDA,
+    RERANK_RECENCY_HALF_LIFE_DAYS,
+    RERANK_RECENCY_WEIGHT,
+    RETRIEVAL_MODE,
+    STRUCTURED_INDEX_ENABLED,
+    validate_config,
+)
+from src.index_manifest import check_embedding_model, get_corpus_version, get_index_directory
+from src.llm import (
+    STREAM_DONE,
+    STREAM_SOURCES,
+    STREAM_TOKEN,
+    agenerate_response,
+    astream_response,
+    batch_generate_responses,
+    create_qa_chain,
+    generate_response,
+    get_llm_model,
+    stream_response,
+)
+from src.query_router import route_query
+from src.retrievers import get_retriever
+from src.tracing import span, start_metrics_server
+from src.vector_store import (
+    get_embedding_model,
+    get_vector_store,
+    resolve_embedding_model_name,
+    sync_vector_store,
+)
+
+# The chain and the watcher are imported where they are used, so that a
+# process answering one query does not load them before it needs them
+if TYPE_CHECKING:
+    from langchain.chains import RetrievalQA
+
+    from src.watcher import DocumentIndexer
+
+
+DEFAULT_SEARCH_KWARGS = {"k": 4}
+
+
+class BackendResources:
+    """
+    Long-lived objects needed to answer queries with one backend
+    """
+
+    def __init__(
+        self,
+        backend: str,
+        embedding_model: Embeddings,
+        vector_store: VectorStore,
+        retriever: BaseRetriever,
+        chain: "RetrievalQA",
+        index_directory: Path,
+    ):
+        self.backend = backend
+        self.embedding_model = embedding_model
+        self.vector_store = vector_store
+        self.index_directory = index_directory
+        self.retriever = retriever
+        self.chain = chain
+
+
+class RagService:
+    """
+    Process-wide RAG service that builds each backend once and reuses it for every query
+
+    Each embedding model has its own index under persist_directory (see
+    src.index_manifest.get_index_directory), so backends embedding with
+    different models never search or update each other's vectors.
+    """
+
+    def __init__(
+        self,
+        persist_directory: Optional[Union[str, Path]] = None,
+        search_kwargs: Optional[Dict[str, Any]] = None,
+        auto_index: bool = True,
+        answer_cache: Optional[AnswerCache] = None,
+        embedding_factory: Optional[Callable[[str], Embeddings]] = None,
+        llm_factory: Optional[Callable[[str], LLM]] = None,
+        route_queries: Optional[bool] = None,
+    ):
+        """
+        Create a RAG service
+
+        Args:
+            persist_directory: Directory holding the index of each embedding model
+            search_kwargs: Retriever search kwargs (defaults to {"k": 4})
+            auto_index: Index the document directory when a backend's store is empty
+            answer_cache: Semantic answer cache (defaults to the shared cache
+                if ANSWER_CACHE_ENABLED)
+            embedding_factory: Builds the embedding model of a backend
+                (defaults to get_embedding_model)
+            llm_factory: Builds the LLM of a backend (defaults to get_llm_model)
+            route_queries: Answer questions about decisions, action items and
+                next meetings from the structured index (defaults to
+                STRUCTURED_INDEX_ENABLED; see src.query_router)
+        """
+        self.persist_directory = Path(persist_directory or CHROMA_PERSIST_DIRECTORY)
+        self.search_kwargs = dict(search_kwargs or DEFAULT_SEARCH_KWARGS)
+        self.auto_index = auto_index
+        if answer_cache is None and ANSWER_CACHE_ENABLED:
+            answer_cache = get_answer_cache()
+        self.answer_cache = answer_cache
+        self.embedding_factory = embedding_factory or get_embedding_model
+        self.llm_factory = llm_factory or get_llm_model
+        self.route_queries = STRUCTURED_INDEX_ENABLED if route_queries is None else route_queries
+        self._backends: Dict[str, BackendResources] = {}
+        self._indexes: Dict[str, Tuple[Embeddings, Path]] = {}
+        self._limits: Dict[str, LoopSemaphore] = {}
+        self._lock = threading.Lock()
+        self._indexes_lock = threading.Lock()
+        self._limits_lock = threading.Lock()
+        # Serves the per-stage metrics if METRICS_PORT is set
+        start_metrics_server()
+
+    def get_backend(self, backend: Optional[str] = None) -> BackendResources:
+        """
+        Get the resources of a backend, building them on first use
+
+        Args:
+            backend: Backend name (defaults to DEFAULT_BACKEND)
+
+        Returns:
+            BackendResources
+
+        Raises:
+            ValueError: If the configuration is invalid for the backend
+        """
+        if backend is None:
+            backend = DEFAULT_BACKEND
+
+        resources = self._backends.get(backend)
+        if resources is not None:
+            return resources
+
+        with self._lock:
+            # Another thread may have built it while we were waiting
+            if backend not in self._backends:
+                self._backends[backend] = self._build_backend(backend)
+
+            return self._backends[backend]
+
+    def get_index_directory(self, backend: Optional[str] = None) -> Path:
+        """
+        Get the directory of the index a backend queries and updates
+
+        Args:
+            backend: Backend name (defaults to DEFAULT_BACKEND)
+
+        Returns:
+            Index directory of the backend's embedding model
+        """
+        return self._get_index(backend)[1]
+
+    def _get_index(self, backend: Optional[str] = None) -> Tuple[Embeddings, Path]:
+        """
+        Get the embedding model of a backend and the directory of its index
+
+        An index built before each model had its own directory is moved
+        into place if it records this model (see
+        src.index_swap.migrate_legacy_index).
+
+        Args:
+            backend: Backend name (defaults to DEFAULT_BACKEND)
+
+        Returns:
+            Tuple of (embedding model, index directory)
+
+        Raises:
+            ValueError: If the configuration is invalid for the backend, the
+                index was built with another model, or an old index records no model
+        """
+        if backend is None:
+            backend = DEFAULT_BACKEND
+
+        index = self._indexes.get(backend)
+        if index is not None:
+            return index
+
+        with self._indexes_lock:
+            if backend not in self._indexes:
+                is_valid, error = validate_config(backend)
+                if not is_valid:
+                    raise ValueError(error)
+
+                from src.index_swap import migrate_legacy_index
+
+                embedding_model = self.embedding_factory(backend)
+                model_name = resolve_embedding_model_name(embedding_model, backend)
+                if migrate_legacy_index(self.persist_directory, model_name) is not None:
+                    print(f"Moved the index in {self.persist_directory} to the directory of {model_name}")
+                index_directory = get_index_directory(self.persist_directory, model_name)
+                check_embedding_model(index_directory, model_name)
+                self._indexes[backend] = (embedding_model, index_directory)
+
+            return self._indexes[backend]
+
+    def _build_backend(self, backend: str) -> BackendResources:
+        """
+        Build the embedding model, vector store, retriever and chain for a backend
+
+        Args:
+            backend: Backend name
+
+        Returns:
+            BackendResources
+
+        Raises:
+            ValueError: If the index is missing or empty and auto_index is off
+        """
+        embedding_model, index_directory = self._get_index(backend)
+        if self.auto_index:
+            index_directory.mkdir(parents=True, exist_ok=True)
+        vector_store = get_vector_store(index_directory, embedding_model)
+        if vector_store is None:
+            raise ValueError(f"No index at {index_directory}")
+
+        if not vector_store.get(limit=1)["ids"]:
+            if not self.auto_index:
+                raise ValueError(f"The index at {index_directory} is empty")
+
+            # Build the index if this store has never been populated
+            print(f"Vector store at {index_directory} is empty. Indexing documents...")
+            vector_store, stats = sync_vector_store(
+                persist_directory=index_directory,
+                embedding_model=embedding_model,
+            )
+            print(f"Indexed {stats['added']} files ({stats['chunks']} chunks)")
+
+        retriever = get_retriever(vector_store, index_directory, self.search_kwargs)
+        chain = create_qa_chain(retriever, backend, llm=self.llm_factory(backend))
+
+        return BackendResources(backend, embedding_model, vector_store, retriever, chain, index_directory)
+
+    def index_documents(
+        self,
+        directory: Optional[Path] = None,
+        backend: Optional[str] = None,
+        paths: Optional[List[Path]] = None,
+    ) -> Dict[str, int]:
+        """
+        Incrementally index documents with a backend's embedding model
+
+        Args:
+            directory: Directory containing documents to index
+            backend: Backend name (defaults to DEFAULT_BACKEND)
+            paths: Only index these files of the directory (new, changed or deleted)
+
+        Returns:
+            Dict of file counts per outcome
+        """
+        embedding_model, index_directory = self._get_index(backend)
+        _, stats = sync_vector_store(
+            directory=directory,
+            persist_directory=index_directory,
+            embedding_model=embedding_model,
+            paths=paths,
+        )
+        return stats
+
+    def reload_index(self) -> None:
+        """
+        Reopen the index on the next query, e.g. after a new version was swapped in
+
+        Queries already running finish on the index they started with.
+        """
+        with self._lock:
+            self._backends = {}
+
+    def rebuild_index(
+        self,
+        directory: Optional[Path] = None,
+        backend: Optional[str] = None,
+        on_done: Optional[Callable[[Dict[str, int]], None]] = None,
+    ) -> threading.Thread:
+        """
+        Re-index every document into a new index version in a background thread
+
+        Queries keep using the current index while the new one is built, and
+        switch to it once it has been swapped in (see src.index_swap).
+
+        Args:
+            directory: Directory containing documents to index
+            backend: Backend whose embedding model indexes the documents
+            on_done: Called with the build's stats once the new index is in use
+
+        Returns:
+            The started thread; join() it to wait for the rebuild
+        """
+        from src.index_swap import build_index_in_background
+
+        embedding_model, index_directory = self._get_index(backend)
+
+        def swapped(stats: Dict[str, int]) -> None:
+            self.reload_index()
+            if on_done is not None:
+                on_done(stats)
+
+        return build_index_in_background(
+            directory,
+            index_directory,
+            embedding_model,
+            on_done=swapped,
+        )
+
+    def import_index(self, path: Union[str, Path], backend: Optional[str] = None, verify: bool = True) -> int:
+        """
+        Replace the index with a snapshot file and switch queries to it
+
+        Args:
+            path: Snapshot file written by src.index_snapshot.export_index
+            backend: Backend that embeds queries against the index
+            verify: Check the snapshot's checksums before loading it
+
+        Returns:
+            Number of chunks imported
+
+        Raises:
+            ValueError: If the snapshot is corrupt or was embedded with another model
+        """
+        from src.index_snapshot import import_index
+
+        if backend is None:
+            backend = DEFAULT_BACKEND
+        embedding_model, index_directory = self._get_index(backend)
+
+        count = import_index(
+            path,
+            index_directory,
+            embedding_model=embedding_model,
+            backend=backend,
+            verify=verify,
+        )
+        self.reload_index()
+        return count
+
+    def watch_documents(
+        self,
+        directory: Optional[Path] = None,
+        backend: Optional[str] = None,
+        on_sync: Optional[Callable[[Dict[str, int], float], None]] = None,
+        polling: Optional[bool] = None,
+    ) -> "DocumentIndexer":
+        """
+        Keep the index in sync with a document directory from a background thread
+
+        New and changed notes become searchable by this service's queries a
+        few seconds after they are written (see src.watcher).
+
+        Args:
+            directory: Directory to watch (defaults to DOCUMENT_STORE_DIRECTORY)
+            backend: Backend whose embedding model indexes the documents
+            on_sync: Called with (stats, seconds) after each synchronization
+            polling: Force polling instead of inotify (defaults to WATCH_POLLING)
+
+        Returns:
+            The started DocumentIndexer; call stop() to end it
+        """
+        from src.watcher import DocumentIndexer
+
+        if directory is None:
+            directory = DOCUMENT_STORE_DIRECTORY
+        self._get_index(backend)
+
+        return DocumentIndexer(
+            lambda paths: self.index_documents(directory, backend, paths),
+            directory=directory,
+            polling=polling,
+            on_sync=on_sync,
+        ).start()
+
+    def _answer_cache_scope(
+        self,
+        resources: BackendResources,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """
+        Build the answer cache scope of a query: everything besides the
+        question and the corpus that determines the answer
+
+        Args:
+            resources: Backend resources answering the query
+            where: Metadata filter of the query
+
+        Returns:
+            Scope string
+        """
+        completion_model = (
+            LOCAL_COMPLETION_MODEL if resources.backend == BACKEND_OLLAMA else COMPLETION_MODEL
+        )
+        embedding_model = getattr(
+            resources.embedding_model, "model_name", type(resources.embedding_model).__name__
+        )
+        return json.dumps(
+            [
+                resources.backend,
+                completion_model,
+                embedding_model,
+                str(resources.index_directory),
+                RETRIEVAL_MODE,
+                self.search_kwargs,
+                [
+                    RERANK_ENABLED,
+                    RERANK_CANDIDATES,
+                    RERANK_MMR_LAMBDA,
+                    RERANK_LEXICAL_WEIGHT,
+                    RERANK_RECENCY_WEIGHT,
+                    RERANK_RECENCY_HALF_LIFE_DAYS,
+                ],
+                where,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+
+    def query(
+        self,
+        query: str,
+        backend: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[str, List[Document]]:
+        """
+        Answer a query using the long-lived resources of a backend
+
+        Args:
+            query: Query string
+            backend: Backend name (defaults to DEFAULT_BACKEND)
+            where: Optional metadata filter on date, year, month, topic,
+                participants, etc. (see src.metadata_index)
+
+        Returns:
+            Tuple of (response, source_documents)
+        """
+        resources = self.get_backend(backend)
+        routed = self._route(resources, query, where)
+        if routed is not None:
+            return routed
+
+        # The query is embedded once: for the answer cache lookup, then for retrieval
+        embedding = None
+        if self.answer_cache is not None:
+            embedding = resources.embedding_model.embed_query(query)
+            scope, corpus_version, cached = self._lookup_answer(resources, embedding, where)
+            if cached is not None:
+                return cached
+
+        retriever, chain = self._get_retriever_and_chain(resources, where)
+        response, source_docs = generate_response(query, retriever, chain=chain, embedding=embedding)
+
+        if self.answer_cache is not None:
+            self.answer_cache.put(scope, corpus_version, query, embedding, response, source_docs)
+
+        return response, source_docs
+
+    def stream_query(
+        self,
+        query: str,
+        backend: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Answer a query, yielding the sources first and then answer tokens
+
+        Yields the same events as src.llm.stream_response. A cached answer is
+        yielded as a single token and its metrics are marked "cached"; an
+        answer from the structured index likewise, marked "structured".
+
+        Args:
+            query: Query string
+            backend: Backend name (defaults to DEFAULT_BACKEND)
+            where: Optional metadata filter (see query)
+
+        Yields:
+            Stream events
+        """
+        start = time.perf_counter()
+        resources = self.get_backend(backend)
+        routed = self._route(resources, query, where)
+        if routed is not None:
+            yield from self._cached_stream_events(routed, start, "structured")
+            return
+
+        embedding = None
+        if self.answer_cache is not None:
+            embedding = resources.embedding_model.embed_query(query)
+            scope, corpus_version, cached = self._lookup_answer(resources, embedding, where)
+            if cached is not None:
+                yield from self._cached_stream_events(cached, start)
+                return
+
+        retriever, chain = self._get_retriever_and_chain(resources, where)
+        source_docs: List[Document] = []
+        tokens: List[str] = []
+        for event, payload in stream_response(query, retriever, chain=chain, embedding=embedding):
+            if event == STREAM_SOURCES:
+                source_docs = payload
+            elif event == STREAM_TOKEN:
+                tokens.append(payload)
+            yield event, payload
+
+        if self.answer_cache is not None:
+            self.answer_cache.put(
+                scope, corpus_version, query, embedding, "".join(tokens), source_docs
+            )
+
+    def batch_query(
+        self,
+        queries: List[str],
+        backend: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+        max_concurrency: Optional[int] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Answer many queries, e.g. for offline evaluation
+
+        Bypasses the answer cache, so every query gets a fresh response;
+        structured queries are still answered from the structured index.
+
+        Args:
+            queries: Query strings
+            backend: Backend name (defaults to DEFAULT_BACKEND)
+            where: Optional metadata filter (see query)
+            max_concurrency: Maximum number of concurrent LLM calls (defaults
+                to the backend's concurrency limit)
+            on_result: Called with (index, result) as each response is ready
+
+        Returns:
+            One result per query (see src.llm.batch_generate_responses)
+        """
+        resources = self.get_backend(backend)
+        if max_concurrency is None:
+            max_concurrency = self.get_concurrency_limit(backend).limit
+
+        routed = {query: self._route(resources, query, where) for query in dict.fromkeys(queries)}
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        for index, query in enumerate(queries):
+            if routed[query] is not None:
+                response, source_docs = routed[query]
+                results[index] = {"query": query, "response": response, "source_documents": source_docs, "error": None}
+                if on_result is not None:
+                    on_result(index, results[index])
+
+        remaining = [index for index, query in enumerate(queries) if routed[query] is None]
+        if not remaining:
+            return results
+
+        retriever, chain = self._get_retriever_and_chain(resources, where)
+        generated = batch_generate_responses(
+            [queries[index] for index in remaining],
+            retriever,
+            chain=chain,
+            max_concurrency=max_concurrency,
+            on_result=(lambda position, result: on_result(remaining[position], result)) if on_result else None,
+            persist_directory=resources.index_directory,
+        )
+        for index, result in zip(remaining, generated):
+            results[index] = result
+        return results
+
+    async def aget_backend(self, backend: Optional[str] = None) -> BackendResources:
+        """
+        Get the resources of a backend, building them in a worker thread on first use
+
+        Args:
+            backend: Backend name (defaults to DEFAULT_BACKEND)
+
+        Returns:
+            BackendResources
+        """
+        resources = self._backends.get(backend or DEFAULT_BACKEND)
+        if resources is not None:
+            return resources
+
+        return await asyncio.to_thread(self.get_backend, backend)
+
+    def get_concurrency_limit(self, backend: Optional[str] = None) -> LoopSemaphore:
+        """
+        Get the limit on concurrent async queries of a backend
+
+        Args:
+            backend: Backend name (defaults to DEFAULT_BACKEND)
+
+        Returns:
+            LoopSemaphore shared by all async queries of the backend
+        """
+        if backend is None:
+            backend = DEFAULT_BACKEND
+
+        with self._limits_lock:
+            if backend not in self._limits:
+                limit = OLLAMA_MAX_CONCURRENCY if backend == BACKEND_OLLAMA else OPENAI_MAX_CONCURRENCY
+                self._limits[backend] = LoopSemaphore(limit)
+            return self._limits[backend]
+
+    async def aquery(
+        self,
+        query: str,
+        backend: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[str, List[Document]]:
+        """
+        Answer a query without blocking the event loop
+
+        Cache hits are answered immediately; everything else waits for a slot
+        of the backend's concurrency limit.
+
+        Args:
+            query: Query string
+            backend: Backend name (defaults to DEFAULT_BACKEND)
+            where: Optional metadata filter (see query)
+
+        Returns:
+            Tuple of (response, source_documents)
+        """
+        resources = await self.aget_backend(backend)
+        routed = self._route(resources, query, where)
+        if routed is not None:
+            return routed
+
+        embedding = None
+        if self.answer_cache is not None:
+            embedding = await resources.embedding_model.aembed_query(query)
+            scope, corpus_version, cached = self._lookup_answer(resources, embedding, where)
+            if cached is not None:
+                return cached
+
+        retriever, chain = self._get_retriever_and_chain(resources, where)
+        async with self.get_concurrency_limit(resources.backend):
+            response, source_docs = await agenerate_response(query, retriever, chain=chain, embedding=embedding)
+
+        if self.answer_cache is not None:
+            self.answer_cache.put(scope, corpus_version, query, embedding, response, source_docs)
+
+        return response, source_docs
+
+    async def astream_query(
+        self,
+        query: str,
+        backend: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Async version of stream_query, within the backend's concurrency limit
+
+        Args:
+            query: Query string
+            backend: Backend name (defaults to DEFAULT_BACKEND)
+            where: Optional metadata filter (see query)
+
+        Yields:
+            Stream events
+        """
+        start = time.perf_counter()
+        resources = await self.aget_backend(backend)
+        routed = self._route(resources, query, where)
+        if routed is not None:
+            for event in self._cached_stream_events(routed, start, "structured"):
+                yield event
+            return
+
+        embedding = None
+        if self.answer_cache is not None:
+            embedding = await resources.embedding_model.aembed_query(query)
+            scope, corpus_version, cached = self._lookup_answer(resources, embedding, where)
+            if cached is not None:
+                for event in self._cached_stream_events(cached, start):
+                    yield event
+                return
+
+        retriever, chain = self._get_retriever_and_chain(resources, where)
+        source_docs: List[Document] = []
+        tokens: List[str] = []
+        async with self.get_concurrency_limit(resources.backend):
+            async for event, payload in astream_response(query, retriever, chain=chain, embedding=embedding):
+                if event == STREAM_SOURCES:
+                    source_docs = payload
+                elif event == STREAM_TOKEN:
+                    tokens.append(payload)
+                yield event, payload
+
+        if self.answer_cache is not None:
+            self.answer_cache.put(
+                scope, corpus_version, query, embedding, "".join(tokens), source_docs
+            )
+
+    def _route(
+        self,
+        resources: BackendResources,
+        query: str,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Tuple[str, List[Document]]]:
+        """
+        Answer a structured query from the structured index
+
+        Filtered queries always take the RAG path.
+
+        Args:
+            resources: Backend resources whose index holds the structured index
+            query: Query string
+            where: Metadata filter of the query
+
+        Returns:
+            Tuple of (response, source_documents), or None if the query needs RAG
+        """
+        if not self.route_queries or where is not None:
+            return None
+        return route_query(query, resources.index_directory)
+
+    def _get_retriever_and_chain(
+        self,
+        resources: BackendResources,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[BaseRetriever, "RetrievalQA"]:
+        """
+        Get the retriever and chain answering a query, restricted by a filter
+
+        Args:
+            resources: Backend resources
+            where: Optional metadata filter
+
+        Returns:
+            Tuple of (retriever, chain)
+        """
+        if where is None:
+            return resources.retriever, resources.chain
+
+        from langchain.chains import RetrievalQA
+
+        # Reuse the backend's LLM and prompt with a retriever restricted by the filter
+        retriever = get_retriever(
+            resources.vector_store, resources.index_directory, self.search_kwargs, where=where
+        )
+        chain = RetrievalQA(
+            combine_documents_chain=resources.chain.combine_documents_chain,
+            retriever=retriever,
+            return_source_documents=True,
+        )
+        return retriever, chain
+
+    def _lookup_answer(
+        self,
+        resources: BackendResources,
+        embedding: List[float],
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[str, str, Optional[Tuple[str, List[Document]]]]:
+        """
+        Look up a query in the answer cache
+
+        Args:
+            resources: Backend resources
+            embedding: Query embedding
+            where: Optional metadata filter
+
+        Returns:
+            Tuple of (scope, corpus_version, cached answer or None)
+        """
+        with span("answer_cache_lookup") as s:
+            scope = self._answer_cache_scope(resources, where)
+            corpus_version = get_corpus_version(resources.index_directory)
+            cached = self.answer_cache.get(scope, corpus_version, embedding)
+            s.set(hit=cached is not None)
+        return scope, corpus_version, cached
+
+    def _cached_stream_events(
+        self,
+        cached: Tuple[str, List[Document]],
+        start: float,
+        origin: str = "cached",
+    ) -> List[Tuple[str, Any]]:
+        """
+        Build the stream events replaying a ready answer
+
+        Args:
+            cached: Tuple of (response, source_documents)
+            start: perf_counter() value when the query started
+            origin: Metric flag marking where the answer came from ("cached"
+                or "structured")
+
+        Returns:
+            List of stream events
+        """
+        response, source_docs = cached
+        elapsed = time.perf_counter() - start
+        return [
+            (STREAM_SOURCES, source_docs),
+            (STREAM_TOKEN, response),
+            (STREAM_DONE, {
+                "retrieval_time": elapsed,
+                "time_to_first_token": elapsed,
+                "total_time": elapsed,
+                "tokens": 1,
+                origin: True,
+            }),
+        ]
+
+
+_rag_service: Optional[RagService] = None
+_rag_service_lock = threading.Lock()
+
+
+def get_rag_service() -> RagService:
+    """
+    Get the process-wide RAG service, creating it on first use
+
+    Returns:
+        RagService
+    """
+    global _rag_service
+
+    if _rag_service is None:
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service = RagService()
+
+    return _rag_service
+
+
+def backend_from_flag(use_local_models: bool) -> str:
+    """
+    Map a "use local models" flag to a backend name
+
+    Args:
+        use_local_models: Whether to use local models
+
+    Returns:
+        Backend name
+    """
+    return BACKEND_OLLAMA if use_local_models else BACKEND_OPENAI
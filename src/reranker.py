@@ -0,0 +1,150 @@
+# Re-ranker module for the RAG system
+
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import (
+    RERANK_LEXICAL_WEIGHT,
+    RERANK_MMR_LAMBDA,
+    RERANK_RECENCY_HALF_LIFE_DAYS,
+    RERANK_RECENCY_WEIGHT,
+)
+from src.lexical_index import tokenize
+
+
+def lexical_overlap(query: str, documents: List[Document]) -> np.ndarray:
+    """
+    Score the share of the query's terms found in each document
+
+    Terms are weighted by their rarity among the documents, so words found in
+    every candidate ("the", "meeting") do not count.
+
+    Args:
+        query: Query string
+        documents: Candidate documents
+
+    Returns:
+        float32 array of scores between 0 and 1
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms or not documents:
+        return np.zeros(len(documents), dtype=np.float32)
+
+    term_ids = {term: i for i, term in enumerate(terms)}
+    present = np.zeros((len(documents), len(terms)), dtype=np.float32)
+    for row, document in enumerate(documents):
+        columns = [term_ids[token] for token in set(tokenize(document.page_content)) if token in term_ids]
+        present[row, columns] = 1.0
+
+    document_frequency = present.sum(axis=0)
+    weights = np.log1p(len(documents) / np.maximum(document_frequency, 1.0)) * (document_frequency < len(documents))
+    total = weights.sum()
+    if total == 0:
+        return np.zeros(len(documents), dtype=np.float32)
+    return present @ weights / total
+
+
+def recency_scores(documents: List[Document], half_life_days: float = RERANK_RECENCY_HALF_LIFE_DAYS) -> np.ndarray:
+    """
+    Score documents by the age of their meeting relative to the newest candidate
+
+    Args:
+        documents: Candidate documents with YYYY-MM-DD "date" metadata
+        half_life_days: Age in days at which the score halves
+
+    Returns:
+        float32 array of scores between 0 and 1 (0 for documents without a date)
+    """
+    dates = np.array([document.metadata.get("date") or "NaT" for document in documents], dtype="datetime64[D]")
+    known = ~np.isnat(dates)
+    scores = np.zeros(len(documents), dtype=np.float32)
+    if not known.any() or half_life_days <= 0:
+        return scores
+
+    ages = (dates[known].max() - dates[known]).astype(np.float32)
+    scores[known] = 0.5 ** (ages / half_life_days)
+    return scores
+
+
+def mmr_select(relevance: np.ndarray, similarities: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """
+    Pick k candidates by maximal marginal relevance
+
+    Args:
+        relevance: Relevance score of each candidate
+        similarities: Cosine similarity matrix between the candidates
+        k: Number of candidates to pick
+        lambda_mult: Weight of relevance against diversity (1 ignores diversity)
+
+    Returns:
+        Indices of the picked candidates, in order of selection
+    """
+    k = min(k, len(relevance))
+    selected = []
+    redundancy = np.zeros(len(relevance), dtype=np.float32)
+    available = np.ones(len(relevance), dtype=bool)
+
+    for _ in range(k):
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        available[best] = False
+        redundancy = similarities[best] if not selected else np.maximum(redundancy, similarities[best])
+        selected.append(best)
+
+    return selected
+
+
+def rerank(
+    query: str,
+    query_embedding: Optional[List[float]],
+    documents: List[Document],
+    embeddings: np.ndarray,
+    k: int,
+    lambda_mult: float = RERANK_MMR_LAMBDA,
+    lexical_weight: float = RERANK_LEXICAL_WEIGHT,
+    recency_weight: float = RERANK_RECENCY_WEIGHT,
+    recency_half_life_days: float = RERANK_RECENCY_HALF_LIFE_DAYS,
+) -> List[int]:
+    """
+    Pick the best k of an over-fetched candidate list
+
+    Each candidate's relevance is its cosine similarity to the query (or, without
+    a query embedding, its first-stage rank) plus weighted query term overlap and
+    recency. Candidates are then picked by MMR, so near-duplicate chunks do not
+    fill the prompt.
+
+    Args:
+        query: Query string
+        query_embedding: Query embedding, or None in lexical mode
+        documents: Candidate documents, in first-stage order
+        embeddings: Embedding matrix of the candidates, one row per document
+        k: Number of documents to pick
+        lambda_mult: MMR weight of relevance against diversity
+        lexical_weight: Weight of query term overlap
+        recency_weight: Weight of recency
+        recency_half_life_days: Age in days at which recency halves
+
+    Returns:
+        Indices of the picked documents, best first
+    """
+    if not documents:
+        return []
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+    if query_embedding is not None:
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        relevance = vectors @ (query_vector / (np.linalg.norm(query_vector) or 1.0))
+    else:
+        relevance = 1.0 - np.arange(len(documents), dtype=np.float32) / len(documents)
+
+    if lexical_weight:
+        relevance = relevance + lexical_weight * lexical_overlap(query, documents)
+    if recency_weight:
+        relevance = relevance + recency_weight * recency_scores(documents, recency_half_life_days)
+
+    return mmr_select(relevance, vectors @ vectors.T, k, lambda_mult)
@@ -0,0 +1,457 @@
+# Retrievers module for the RAG system
+
+import asyncio
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
+
+from src.config import (
+    HYBRID_FETCH_K,
+    LEXICAL_INDEX_ENABLED,
+    RERANK_CANDIDATES,
+    RERANK_ENABLED,
+    RERANK_LEXICAL_WEIGHT,
+    RERANK_MMR_LAMBDA,
+    RERANK_RECENCY_HALF_LIFE_DAYS,
+    RERANK_RECENCY_WEIGHT,
+    RETRIEVAL_MODE,
+    RRF_K,
+)
+from src.lexical_index import get_lexical_index
+from src.metadata_index import get_metadata_index, join_document_metadata
+from src.reranker import rerank
+from src.tracing import span
+from src.vector_store import (
+    batch_search_by_vector_with_ids,
+    embed_queries,
+    filtered_search_by_vector,
+    get_documents_by_ids,
+    get_embeddings_by_ids,
+    search_by_vector_with_ids,
+)
+
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = RRF_K) -> Dict[str, float]:
+    """
+    Fuse several rankings of chunk IDs with reciprocal rank fusion
+
+    Args:
+        rankings: Lists of chunk IDs, best first
+        rrf_k: RRF damping constant
+
+    Returns:
+        Dict mapping chunk IDs to fused scores
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return scores
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever that fuses BM25 and vector search results with reciprocal rank fusion
+
+    Modes:
+        vector: vector search only
+        lexical: BM25 only, no embedding call
+        hybrid: BM25 and vector search fused with RRF
+
+    With prefilter enabled, hybrid mode only scores the BM25 candidates by
+    vector similarity instead of searching the whole vector index.
+
+    With a where filter, both rankings are restricted to the chunks whose
+    document metadata matches it (see src.metadata_index).
+
+    With rerank enabled, the first stage retrieves candidate_k chunks and
+    src.reranker picks the final k by MMR over vector similarity, query term
+    overlap and recency, so the prompt keeps its size but gets better chunks.
+    """
+
+    vector_store: VectorStore
+    lexical_index: Any
+    k: int = 4
+    fetch_k: int = HYBRID_FETCH_K
+    rrf_k: int = RRF_K
+    mode: str = "hybrid"
+    prefilter: bool = False
+    where: Optional[Dict[str, Any]] = None
+    persist_directory: Optional[str] = None
+    rerank: bool = RERANK_ENABLED
+    candidate_k: int = RERANK_CANDIDATES
+    mmr_lambda: float = RERANK_MMR_LAMBDA
+    lexical_weight: float = RERANK_LEXICAL_WEIGHT
+    recency_weight: float = RERANK_RECENCY_WEIGHT
+    recency_half_life_days: float = RERANK_RECENCY_HALF_LIFE_DAYS
+
+    def _uses_lexical_index(self) -> bool:
+        return self.mode != "vector" and self.lexical_index is not None and len(self.lexical_index) > 0
+
+    def _depth(self) -> int:
+        # Number of first-stage candidates
+        return max(self.candidate_k, self.k) if self.rerank else self.k
+
+    def _fetch_k(self) -> int:
+        # Length of each ranking fused in hybrid mode
+        return max(self.fetch_k, self._depth())
+
+    def _vector_ranking(
+        self,
+        embedding: List[float],
+        candidate_ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        if candidate_ids is None and self.where is not None:
+            results = filtered_search_by_vector(
+                self.vector_store, embedding, self.where, self._fetch_k(), self.persist_directory
+            )
+            return [chunk_id for chunk_id, _, _ in results]
+
+        if candidate_ids is None:
+            results = search_by_vector_with_ids(self.vector_store, embedding, k=self._fetch_k())
+            return [chunk_id for chunk_id, _, _ in results]
+
+        # Score only the lexical candidates by cosine similarity
+        ids, embeddings = get_embeddings_by_ids(self.vector_store, candidate_ids)
+        if not ids:
+            return []
+        query_vector = np.asarray(embedding, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+        similarities = embeddings @ query_vector / np.where(norms == 0, 1.0, norms)
+        return [ids[i] for i in np.argsort(-similarities)]
+
+    def _retrieve(self, query: str, embedding: Optional[List[float]]) -> List[Document]:
+        """
+        Retrieve documents for a query whose embedding (if needed) is already computed
+
+        Args:
+            query: Query string
+            embedding: Query embedding, or None in lexical mode
+
+        Returns:
+            List of documents, best first
+        """
+        if not self._uses_lexical_index():
+            with span("vector_search"):
+                if self.where is None:
+                    results = search_by_vector_with_ids(self.vector_store, embedding, k=self._depth())
+                else:
+                    results = filtered_search_by_vector(
+                        self.vector_store, embedding, self.where, self._depth(), self.persist_directory
+                    )
+            return self._select(
+                query,
+                embedding,
+                [chunk_id for chunk_id, _, _ in results],
+                {chunk_id: document for chunk_id, document, _ in results},
+            )
+
+        ranked_ids = self._ranked_ids(query, embedding)
+
+        with span("fetch_documents", chunks=len(ranked_ids)):
+            documents = get_documents_by_ids(self.vector_store, ranked_ids)
+        return self._select(query, embedding, ranked_ids, documents)
+
+    def _select(
+        self,
+        query: str,
+        embedding: Optional[List[float]],
+        ranked_ids: List[str],
+        documents: Dict[str, Document],
+    ) -> List[Document]:
+        """
+        Pick the final k documents from the first-stage candidates
+
+        Args:
+            query: Query string
+            embedding: Query embedding, or None in lexical mode
+            ranked_ids: Candidate chunk IDs, best first
+            documents: Candidate documents by chunk ID
+
+        Returns:
+            List of documents, best first
+        """
+        candidate_ids = [chunk_id for chunk_id in ranked_ids if chunk_id in documents]
+        if not self.rerank:
+            return join_document_metadata(
+                [documents[chunk_id] for chunk_id in candidate_ids[:self.k]], self.persist_directory
+            )
+
+        with span("rerank", chunks=len(candidate_ids)):
+            ids, embeddings = get_embeddings_by_ids(self.vector_store, candidate_ids)
+            rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+            candidate_ids = [chunk_id for chunk_id in candidate_ids if chunk_id in rows]
+            # Recency scoring needs the documents' dates
+            candidates = join_document_metadata(
+                [documents[chunk_id] for chunk_id in candidate_ids], self.persist_directory
+            )
+            order = rerank(
+                query,
+                embedding,
+                candidates,
+                embeddings[[rows[chunk_id] for chunk_id in candidate_ids]],
+                self.k,
+                self.mmr_lambda,
+                self.lexical_weight,
+                self.recency_weight,
+                self.recency_half_life_days,
+            )
+        return [candidates[i] for i in order]
+
+    def _ranked_ids(
+        self,
+        query: str,
+        embedding: Optional[List[float]],
+        vector_ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Rank chunk IDs for a query using the lexical index
+
+        Args:
+            query: Query string
+            embedding: Query embedding, or None in lexical mode
+            vector_ids: Vector ranking already computed for the query (hybrid
+                mode without prefilter or where filter only)
+
+        Returns:
+            Up to k chunk IDs (candidate_k with rerank enabled), best first
+        """
+        allowed_ids = None
+        if self.where is not None:
+            allowed_ids = get_metadata_index(self.persist_directory).filter_chunk_ids(self.where)
+            if not allowed_ids:
+                return []
+
+        with span("lexical_search"):
+            lexical_ids = [
+                chunk_id
+                for chunk_id, _ in self.lexical_index.search(query, k=self._fetch_k(), chunk_ids=allowed_ids)
+            ]
+
+        if self.mode == "lexical":
+            return lexical_ids[:self._depth()]
+
+        if vector_ids is None:
+            with span("vector_search"):
+                if self.prefilter and lexical_ids:
+                    vector_ids = self._vector_ranking(embedding, lexical_ids)
+                else:
+                    vector_ids = self._vector_ranking(embedding)
+
+        fused = reciprocal_rank_fusion([lexical_ids, vector_ids], self.rrf_k)
+        return sorted(fused, key=fused.get, reverse=True)[:self._depth()]
+
+    def batch_retrieve(self, queries: List[str]) -> List[List[Document]]:
+        """
+        Retrieve documents for several queries at once
+
+        The queries are embedded in one batched call and, unless a where
+        filter or prefilter needs per-query candidates, searched in one
+        vector store call. Chunks shared between queries are fetched once.
+
+        Args:
+            queries: Query strings
+
+        Returns:
+            One list of documents per query, best first
+        """
+        uses_lexical_index = self._uses_lexical_index()
+        embeddings: List[Optional[List[float]]] = [None] * len(queries)
+        if queries and (self.mode != "lexical" or not uses_lexical_index):
+            with span("embed_query", queries=len(queries)):
+                embeddings = embed_queries(self.vector_store.embeddings, queries)
+
+        if self.where is not None or (uses_lexical_index and (self.mode == "lexical" or self.prefilter)):
+            return [self._retrieve(query, embedding) for query, embedding in zip(queries, embeddings)]
+
+        with span("vector_search", queries=len(queries)):
+            vector_results = batch_search_by_vector_with_ids(
+                self.vector_store, embeddings, k=self._fetch_k() if uses_lexical_index else self._depth()
+            )
+
+        documents = {chunk_id: document for results in vector_results for chunk_id, document, _ in results}
+        rankings = [[chunk_id for chunk_id, _, _ in results] for results in vector_results]
+        if uses_lexical_index:
+            rankings = [
+                self._ranked_ids(query, embedding, ranking)
+                for query, embedding, ranking in zip(queries, embeddings, rankings)
+            ]
+
+        missing_ids = list({chunk_id for ranking in rankings for chunk_id in ranking if chunk_id not in documents})
+        if missing_ids:
+            with span("fetch_documents", chunks=len(missing_ids)):
+                documents.update(get_documents_by_ids(self.vector_store, missing_ids))
+        return [
+            self._select(query, embedding, ranking, documents)
+            for query, embedding, ranking in zip(queries, embeddings, rankings)
+        ]
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        embedding: Optional[List[float]] = None,
+    ) -> List[Document]:
+        # A caller that already embedded the query passes its embedding through invoke()
+        if self.mode == "lexical" and self._uses_lexical_index():
+            embedding = None
+        elif embedding is None:
+            with span("embed_query"):
+                embedding = self.vector_store.embeddings.embed_query(query)
+
+        return self._retrieve(query, embedding)
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        embedding: Optional[List[float]] = None,
+    ) -> List[Document]:
+        # Only the embedding call does network I/O; the local index lookups run in a thread
+        if self.mode == "lexical" and self._uses_lexical_index():
+            embedding = None
+        elif embedding is None:
+            with span("embed_query"):
+                embedding = await self.vector_store.embeddings.aembed_query(query)
+
+        return await asyncio.to_thread(self._retrieve, query, embedding)
+
+
+def retrieve(
+    retriever: BaseRetriever,
+    query: str,
+    embedding: Optional[List[float]] = None,
+) -> List[Document]:
+    """
+    Retrieve documents for a query, reusing its embedding if it was already computed
+
+    Args:
+        retriever: Document retriever
+        query: Query string
+        embedding: Embedding of the query (only HybridRetriever can use it)
+
+    Returns:
+        Documents, best first
+    """
+    if embedding is not None and isinstance(retriever, HybridRetriever):
+        return retriever.invoke(query, embedding=embedding)
+    return retriever.invoke(query)
+
+
+async def aretrieve(
+    retriever: BaseRetriever,
+    query: str,
+    embedding: Optional[List[float]] = None,
+) -> List[Document]:
+    """
+    Async version of retrieve
+
+    Args:
+        retriever: Document retriever
+        query: Query string
+        embedding: Embedding of the query (only HybridRetriever can use it)
+
+    Returns:
+        Documents, best first
+    """
+    if embedding is not None and isinstance(retriever, HybridRetriever):
+        return await retriever.ainvoke(query, embedding=embedding)
+    return await retriever.ainvoke(query)
+
+
+def batch_retrieve(
+    retriever: BaseRetriever,
+    queries: List[str],
+    persist_directory: Optional[Union[str, Path]] = None,
+) -> List[List[Document]]:
+    """
+    Retrieve documents for several queries, batching the embedding and search calls where possible
+
+    Args:
+        retriever: Retriever from get_retriever
+        queries: Query strings
+        persist_directory: Directory of a plain vector store retriever's
+            store, whose metadata index is joined into its results
+            (HybridRetriever knows its own)
+
+    Returns:
+        One list of documents per query, best first
+    """
+    if isinstance(retriever, HybridRetriever):
+        return retriever.batch_retrieve(queries)
+
+    if (
+        isinstance(retriever, VectorStoreRetriever)
+        and retriever.search_type == "similarity"
+        and set(retriever.search_kwargs) <= {"k"}
+    ):
+        if not queries:
+            return []
+        vector_store = retriever.vectorstore
+        with span("embed_query", queries=len(queries)):
+            embeddings = embed_queries(vector_store.embeddings, queries)
+        with span("vector_search", queries=len(queries)):
+            results = batch_search_by_vector_with_ids(
+                vector_store, embeddings, k=retriever.search_kwargs.get("k", 4)
+            )
+        return [
+            join_document_metadata([document for _, document, _ in query_results], persist_directory)
+            for query_results in results
+        ]
+
+    return retriever.batch(queries)
+
+
+def get_retriever(
+    vector_store: VectorStore,
+    persist_directory: Optional[Union[str, Path]] = None,
+    search_kwargs: Optional[Dict[str, Any]] = None,
+    mode: Optional[str] = None,
+    where: Optional[Dict[str, Any]] = None,
+) -> BaseRetriever:
+    """
+    Get the retriever for a vector store according to RETRIEVAL_MODE
+
+    Args:
+        vector_store: Vector store to retrieve from
+        persist_directory: Directory where the vector store is persisted
+        search_kwargs: Search kwargs (k, fetch_k/prefilter for hybrid retrieval,
+            and rerank/candidate_k to override RERANK_ENABLED/RERANK_CANDIDATES)
+        mode: Retrieval mode (defaults to RETRIEVAL_MODE)
+        where: Optional metadata filter applied to every query
+
+    Returns:
+        Document retriever
+    """
+    search_kwargs = dict(search_kwargs or {"k": 4})
+    if mode is None:
+        mode = RETRIEVAL_MODE
+
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+
+    # Always a HybridRetriever (vector mode searches the vector store alone),
+    # since it joins the document metadata into the chunks it returns
+    rerank = search_kwargs.pop("rerank", RERANK_ENABLED)
+    return HybridRetriever(
+        vector_store=vector_store,
+        lexical_index=get_lexical_index(persist_directory) if LEXICAL_INDEX_ENABLED else None,
+        mode=mode,
+        where=where,
+        persist_directory=str(persist_directory) if persist_directory is not None else None,
+        rerank=rerank,
+        **search_kwargs,
+    )
@@ -0,0 +1,681 @@
+# Sharded store module for the RAG system
+
+import heapq
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar, Union
+
+import numpy as np
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+
+SHARDS_DIRNAME = "shards"
+SHARD_MAP_FILENAME = "shards.sqlite"
+SHARD_GRANULARITIES = ("year", "month")
+
+# Shard of chunks whose document has no date
+UNDATED_SHARD = "undated"
+
+# Bounds of an unbounded date range; ISO dates sort between them
+MIN_DATE = "0000-00-00"
+MAX_DATE = "9999-99-99"
+
+T = TypeVar("T")
+
+# Adds chunks with precomputed embeddings to one shard: (shard, ids, embeddings, texts, metadatas)
+ShardAdd = Callable[[VectorStore, List[str], np.ndarray, List[str], List[Dict[str, Any]]], None]
+
+# Searches one shard: (shard, embeddings, k, where, nprobe) -> one result list per embedding
+ShardSearch = Callable[
+    [VectorStore, List[List[float]], int, Optional[Dict], Optional[int]],
+    List[List[Tuple[str, Document, float]]],
+]
+
+
+def _condition_range(field: str, condition: Any) -> Optional[Tuple[str, str]]:
+    """
+    Get the dates a condition on the date or year field can match
+
+    Args:
+        field: "date" or "year"
+        condition: Value or {operator: value} dict
+
+    Returns:
+        (first, last) ISO dates, or None if the condition does not bound them
+    """
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+
+    def bounds(value: Any) -> Tuple[str, str]:
+        if field == "year":
+            return f"{int(value):04d}-01-01", f"{int(value):04d}-12-31"
+        return str(value), str(value)
+
+    first, last = MIN_DATE, MAX_DATE
+    for operator, value in condition.items():
+        if operator == "$eq":
+            first, last = max(first, bounds(value)[0]), min(last, bounds(value)[1])
+        elif operator == "$in" and value:
+            values = [bounds(item) for item in value]
+            first = max(first, min(low for low, _ in values))
+            last = min(last, max(high for _, high in values))
+        elif operator in ("$gt", "$gte"):
+            first = max(first, bounds(value)[0])
+        elif operator in ("$lt", "$lte"):
+            last = min(last, bounds(value)[1])
+
+    if (first, last) == (MIN_DATE, MAX_DATE):
+        return None
+    return first, last
+
+
+def get_date_range(where: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    Get the range of meeting dates a where filter can match
+
+    Conditions on date and year are used, through $and and $or; anything
+    else leaves the range open.
+
+    Args:
+        where: Metadata filter (see src.metadata_index.build_where_clause)
+
+    Returns:
+        (first, last) ISO dates (first > last if nothing can match), or None
+        if the filter does not bound the date
+    """
+    ranges = []
+    for field, condition in where.items():
+        if field == "$and":
+            ranges.extend(date_range for date_range in map(get_date_range, condition) if date_range)
+        elif field == "$or":
+            branches = [get_date_range(branch) for branch in condition]
+            if branches and all(branches):
+                ranges.append((min(first for first, _ in branches), max(last for _, last in branches)))
+        elif field in ("date", "year"):
+            date_range = _condition_range(field, condition)
+            if date_range:
+                ranges.append(date_range)
+
+    if not ranges:
+        return None
+    return max(first for first, _ in ranges), min(last for _, last in ranges)
+
+
+def merge_search_results(
+    results_per_shard: List[List[List[Tuple[str, Document, float]]]],
+    k: int,
+) -> List[List[Tuple[str, Document, float]]]:
+    """
+    Merge the per-shard results of a search into the overall top k
+
+    Args:
+        results_per_shard: For each shard, one result list per query
+        k: Number of results per query
+
+    Returns:
+        One list of (chunk_id, document, distance) tuples per query, nearest first
+    """
+    if not results_per_shard:
+        return []
+
+    return [
+        heapq.nsmallest(k, (result for shard in results_per_shard for result in shard[query]), key=lambda r: r[2])
+        for query in range(len(results_per_shard[0]))
+    ]
+
+
+class ShardedVectorStore(VectorStore):
+    """
+    Vector store partitioned into one store per year or month of meetings
+
+    Chunks are placed in the shard of their meeting's date (chunks without
+    one in an "undated" shard). The shard of each document is recorded in a
+    small SQLite map, so chunks can be fetched and deleted by ID without
+    asking every shard. Searches run on the shards in a thread pool and the
+    per-shard top k are merged; searches with a date filter only visit the
+    shards the date range overlaps.
+
+    Only the newest shard (and the undated one) normally takes writes. On
+    persist() every other shard is frozen: compacted once (stores providing
+    compact() drop deleted rows and spare capacity) and left alone after.
+    A late note or an edit to an old one thaws its shard until the next
+    persist(). Search cost then grows with the number of shards searched,
+    while indexing only ever touches the shards of the notes it changes.
+
+    Provides the same subset of Chroma's API as NumpyVectorStore: get(),
+    persist() and delete_collection().
+    """
+
+    def __init__(
+        self,
+        persist_directory: Union[str, Path],
+        embedding_function: Optional[Embeddings],
+        open_shard: Callable[[str], VectorStore],
+        add_shard: ShardAdd,
+        search_shard: ShardSearch,
+        granularity: str = "month",
+        max_workers: int = 4,
+    ):
+        """
+        Open or create a sharded store
+
+        Args:
+            persist_directory: Directory of the vector store; the shard map
+                is kept in its shards subdirectory
+            embedding_function: Embedding model
+            open_shard: Opens (or creates) the store of a shard by name
+            add_shard: Adds embedded chunks to one shard (see ShardAdd)
+            search_shard: Searches one shard (see ShardSearch)
+            granularity: "year" or "month"
+            max_workers: Threads searching shards in parallel
+        """
+        if granularity not in SHARD_GRANULARITIES:
+            raise ValueError(f"Unknown shard granularity: {granularity}")
+
+        self.path = Path(persist_directory) / SHARDS_DIRNAME
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.embedding_function = embedding_function
+        self.open_shard = open_shard
+        self.add_shard = add_shard
+        self.search_shard = search_shard
+        self.granularity = granularity
+        self.max_workers = max_workers
+        self._shards: Dict[str, VectorStore] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path / SHARD_MAP_FILENAME), check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS shards (
+                name TEXT PRIMARY KEY,
+                frozen INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS routes (
+                key TEXT PRIMARY KEY,
+                shard TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding_function
+
+    # Shards
+
+    def shard_name(self, metadata: Dict[str, Any]) -> str:
+        """
+        Get the shard of a chunk from its document's metadata
+
+        Args:
+            metadata: Chunk metadata with the document's year and month
+
+        Returns:
+            Shard name, e.g. "2024-03" (by month), "2024" (by year) or "undated"
+        """
+        year, month = metadata.get("year"), metadata.get("month")
+        if not year:
+            return UNDATED_SHARD
+        if self.granularity == "year" or not month:
+            return f"{int(year):04d}"
+        return f"{int(year):04d}-{int(month):02d}"
+
+    def shard_names(self) -> List[str]:
+        """
+        Get the names of all shards, oldest first
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT name FROM shards ORDER BY name").fetchall()
+        return [row[0] for row in rows]
+
+    def get_shard(self, name: str, create: bool = False) -> VectorStore:
+        """
+        Get the store of a shard, opening it on first use
+
+        Args:
+            name: Shard name
+            create: Register the shard if it is new (it takes a write)
+
+        Returns:
+            Vector store of the shard
+        """
+        with self._lock:
+            if create:
+                self._conn.execute("INSERT OR IGNORE INTO shards (name) VALUES (?)", (name,))
+            shard = self._shards.get(name)
+            if shard is None:
+                shard = self._shards[name] = self.open_shard(name)
+            return shard
+
+    def select_shards(self, where: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+        """
+        Get the shards a where filter can match chunks in
+
+        Args:
+            where: Metadata filter (see src.metadata_index.build_where_clause)
+
+        Returns:
+            Names of the shards whose period overlaps the filter's date
+            range, or None if the filter does not bound the date
+        """
+        date_range = get_date_range(where) if where else None
+        if date_range is None:
+            return None
+
+        first, last = date_range
+        selected = []
+        for name in self.shard_names():
+            if name == UNDATED_SHARD:
+                # A bounded date never matches a document without one
+                continue
+            start = name + ("-01-01" if len(name) == 4 else "-01")
+            end = name + ("-12-31" if len(name) == 4 else "-31")
+            if start <= last and end >= first:
+                selected.append(name)
+        return selected
+
+    def map_shards(self, fn: Callable[[str, VectorStore], T], names: Iterable[str]) -> List[T]:
+        """
+        Run a function on several shards in the thread pool
+
+        Args:
+            fn: Called with (name, store) of each shard
+            names: Shards to run it on
+
+        Returns:
+            Results in the order of names
+        """
+        names = list(names)
+        if len(names) <= 1 or self.max_workers <= 1:
+            return [fn(name, self.get_shard(name)) for name in names]
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="shard-search")
+        return list(self._executor.map(lambda name: fn(name, self.get_shard(name)), names))
+
+    def record(self, ids: List[str], metadatas: List[Dict[str, Any]], names: List[str]) -> None:
+        """
+        Record the shards chunks were added to, thawing those shards
+
+        Chunks are recorded by document ID, or by chunk ID if they have none.
+        The shard map is committed right away, so other processes can route
+        to the chunks and a crash before persist() does not lose their routes.
+
+        Args:
+            ids: Chunk IDs
+            metadatas: Chunk metadata
+            names: Shard of each chunk
+        """
+        routes = {
+            (metadata or {}).get("doc_id") or chunk_id: name
+            for chunk_id, metadata, name in zip(ids, metadatas, names)
+        }
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO routes (key, shard) VALUES (?, ?)", list(routes.items()))
+            self._conn.executemany(
+                "UPDATE shards SET frozen = 0 WHERE name = ?", [(name,) for name in set(names)]
+            )
+            self._conn.commit()
+
+    def route_ids(self, ids: List[str]) -> Dict[str, List[str]]:
+        """
+        Group chunk IDs by the shard holding them
+
+        Args:
+            ids: Chunk IDs
+
+        Returns:
+            Dict mapping shard names to chunk IDs (unknown IDs are omitted)
+        """
+        # Chunk IDs are "{doc_id}-{index}" (see generate_chunk_ids); chunks
+        # added without a document ID are recorded under their own ID
+        candidates = {chunk_id: (chunk_id.rsplit("-", 1)[0], chunk_id) for chunk_id in ids}
+        keys = list({key for pair in candidates.values() for key in pair})
+        routes = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                routes.update(self._conn.execute(
+                    f"SELECT key, shard FROM routes WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall())
+
+        groups: Dict[str, List[str]] = {}
+        for chunk_id, (doc_key, chunk_key) in candidates.items():
+            name = routes.get(doc_key) or routes.get(chunk_key)
+            if name is not None:
+                groups.setdefault(name, []).append(chunk_id)
+        return groups
+
+    # Writing
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        shard_names: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """
+        Embed texts in one call and add them to the shards of their metadata
+
+        Args:
+            texts: Texts to add
+            metadatas: Metadata of each text
+            ids: IDs of the texts (random if not given)
+            shard_names: Shard of each text (defaults to shard_name of its
+                metadata, for chunks stored without their document's date)
+
+        Returns:
+            IDs of the added texts
+        """
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        if not texts:
+            return ids
+
+        embeddings = np.asarray(self.embedding_function.embed_documents(texts), dtype=np.float32)
+        self.add_vectors(ids, embeddings, texts, metadatas, shard_names)
+        return ids
+
+    def add_vectors(
+        self,
+        ids: List[str],
+        embeddings: np.ndarray,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        shard_names: Optional[List[str]] = None,
+    ) -> None:
+        """
+        Add chunks with precomputed embeddings to their shards
+
+        Args:
+            ids: Chunk IDs
+            embeddings: Embedding matrix with one row per chunk
+            texts: Chunk texts
+            metadatas: Chunk metadata
+            shard_names: Shard of each chunk (see add_texts)
+        """
+        names = shard_names or [self.shard_name(metadata) for metadata in metadatas]
+
+        rows_by_shard: Dict[str, List[int]] = {}
+        for row, name in enumerate(names):
+            rows_by_shard.setdefault(name, []).append(row)
+        for name, rows in rows_by_shard.items():
+            self.add_shard(
+                self.get_shard(name, create=True),
+                [ids[row] for row in rows],
+                embeddings[rows],
+                [texts[row] for row in rows],
+                [metadatas[row] for row in rows],
+            )
+
+        self.record(ids, metadatas, names)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """
+        Delete chunks by ID from the shards holding them
+
+        Args:
+            ids: Chunk IDs
+
+        Returns:
+            True
+        """
+        if not ids:
+            return True
+
+        for name, shard_ids in self.route_ids(ids).items():
+            shard = self.get_shard(name)
+            shard.delete(ids=shard_ids)
+
+            # Forget documents with no chunks left in the shard
+            doc_ids = list({chunk_id.rsplit("-", 1)[0] for chunk_id in shard_ids})
+            remaining = shard.get(where={"doc_id": {"$in": doc_ids}}, include=["metadatas"])["metadatas"]
+            kept = {metadata.get("doc_id") for metadata in remaining if metadata}
+            with self._lock:
+                self._conn.executemany(
+                    "DELETE FROM routes WHERE key = ?",
+                    [(key,) for key in doc_ids + shard_ids if key not in kept],
+                )
+                self._conn.execute("UPDATE shards SET frozen = 0 WHERE name = ?", (name,))
+                self._conn.commit()
+
+        return True
+
+    def persist(self) -> None:
+        """
+        Persist the shards that were written to and freeze all but the newest
+        """
+        with self._lock:
+            opened = list(self._shards.values())
+        for shard in opened:
+            shard.persist()
+
+        with self._lock:
+            rows = self._conn.execute("SELECT name, frozen FROM shards").fetchall()
+        dated = [name for name, _ in rows if name != UNDATED_SHARD]
+        newest = max(dated) if dated else None
+        for name, frozen in rows:
+            if frozen or name in (newest, UNDATED_SHARD):
+                continue
+            shard = self.get_shard(name)
+            if hasattr(shard, "compact"):
+                shard.compact()
+            with self._lock:
+                self._conn.execute("UPDATE shards SET frozen = 1 WHERE name = ?", (name,))
+
+        with self._lock:
+            self._conn.commit()
+
+    def delete_collection(self) -> None:
+        """
+        Delete every shard and the shard map
+        """
+        for name in self.shard_names():
+            self.get_shard(name).delete_collection()
+        with self._lock:
+            self._shards = {}
+            self._conn.execute("DELETE FROM routes")
+            self._conn.execute("DELETE FROM shards")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """
+        Close the shard map and stop the search threads
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            self._conn.close()
+
+    # Reading
+
+    def get(
+        self,
+        ids: Optional[Union[str, List[str]]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        """
+        Get stored chunks, like Chroma's get()
+
+        Without IDs, chunks are returned shard by shard, oldest first, so
+        limit and offset page through the whole store.
+
+        Args:
+            ids: Chunk IDs to fetch (all chunks if not given)
+            where: Metadata filter on the stored chunk metadata
+            limit: Maximum number of chunks
+            offset: Number of chunks to skip
+            include: Fields to return: "documents", "metadatas", "embeddings"
+
+        Returns:
+            Dict with "ids" and the included fields (None for the others)
+        """
+        include = ["documents", "metadatas"] if include is None else include
+        if isinstance(ids, str):
+            ids = [ids]
+
+        if ids is not None:
+            groups = self.route_ids(ids)
+            parts = self.map_shards(
+                lambda name, shard: shard.get(ids=groups[name], where=where, include=include), groups
+            )
+        else:
+            parts = []
+            skip = offset or 0
+            remaining = limit
+            for name in self.shard_names():
+                if remaining is not None and remaining <= 0:
+                    break
+                shard = self.get_shard(name)
+                if where is None:
+                    size = shard._collection.count() if hasattr(shard, "_collection") else len(shard)
+                else:
+                    size = len(shard.get(where=where, include=[])["ids"])
+                if skip >= size:
+                    skip -= size
+                    continue
+                part = shard.get(where=where, limit=remaining, offset=skip, include=include)
+                skip = 0
+                parts.append(part)
+                if remaining is not None:
+                    remaining -= len(part["ids"])
+
+        fields = [field for field in ("documents", "metadatas", "embeddings") if field in include]
+        merged: Dict[str, Any] = {"ids": [], "documents": None, "metadatas": None, "embeddings": None}
+        for field in fields:
+            merged[field] = []
+        for part in parts:
+            for field in ["ids"] + fields:
+                merged[field].extend(part[field])
+        return merged
+
+    def batch_search_with_ids(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        where: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        shards: Optional[List[str]] = None,
+    ) -> List[List[Tuple[str, Document, float]]]:
+        """
+        Search the shards for several query embeddings and merge their top k
+
+        Args:
+            embeddings: Query embeddings
+            k: Number of results per query
+            where: Metadata filter on the stored chunk metadata
+            nprobe: IVF lists to search in NumPy shards
+            shards: Shards to search (defaults to all)
+
+        Returns:
+            One list of (chunk_id, document, distance) tuples per query, nearest first
+        """
+        names = self.shard_names()
+        if shards is not None:
+            names = [name for name in names if name in set(shards)]
+        if not names:
+            return [[] for _ in embeddings]
+
+        results = self.map_shards(
+            lambda name, shard: self.search_shard(shard, embeddings, k, where, nprobe), names
+        )
+        return merge_search_results(results, k)
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k, filter, nprobe)
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        results = self.batch_search_with_ids([embedding], k=k, where=filter, nprobe=nprobe)[0]
+        return [(document, distance) for _, document, distance in results]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [
+            document for document, _ in self.similarity_search_by_vector_with_score(embedding, k, filter, nprobe)
+        ]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k, filter, nprobe)]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        persist_directory: Optional[Union[str, Path]] = None,
+        **kwargs: Any,
+    ) -> "ShardedVectorStore":
+        """
+        Create a sharded store from texts
+
+        The store is opened with src.vector_store.open_vector_store, so its
+        shards use the configured backend and SHARD_BY granularity.
+
+        Args:
+            texts: Texts to add
+            embedding: Embedding model
+            metadatas: Metadata of each text, with the year and month that pick its shard
+            ids: Chunk IDs
+            persist_directory: Directory of the vector store
+
+        Returns:
+            ShardedVectorStore
+        """
+        # src.vector_store builds sharded stores, so it is imported here to avoid a cycle
+        from src.vector_store import open_vector_store
+
+        if persist_directory is None:
+            raise ValueError("persist_directory is required")
+        store = open_vector_store(persist_directory, embedding)
+        if not isinstance(store, cls):
+            raise TypeError("SHARD_BY is none; open the store with src.vector_store.open_vector_store")
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
@@ -0,0 +1,394 @@
+# Structured index module for the RAG system
+
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from langchain_core.documents import Document
+
+from src.config import CHROMA_PERSIST_DIRECTORY
+
+
+STRUCTURED_INDEX_FILENAME = "structured.sqlite"
+
+# Item kinds by the heading of the template section they are listed under
+SECTION_KINDS = {
+    "decisions": "decision",
+    "action items": "action_item",
+    "next meeting": "next_meeting",
+}
+
+HEADING_PATTERN = re.compile(r"^[ \t]{0,3}#{1,6}[ \t]+(.*?)[ \t#]*$")
+LIST_ITEM_PATTERN = re.compile(r"^[ \t]*(?:[-*+]|\d{1,9}[.)])(?:[ \t]+(?:\[[ xX]\][ \t]*)?|$)")
+
+# "Jane: Create mockups" or "@Jane Smith: Create mockups"
+OWNER_PATTERN = re.compile(r"^@?(?P<owner>[A-Z][\w.'-]*(?:[ \t]+[A-Z][\w.'-]*){0,2})[ \t]*:[ \t]+(?P<task>.+)$")
+
+# "(Due: March 15)", "- due 2024-03-15", ", deadline: Friday" at the end of an action item
+DUE_PATTERN = re.compile(
+    r"[ \t]*(?:\((?:due|deadline)(?:[ \t]+by)?[ \t]*:?[ \t]*(?P<enclosed>[^)]+)\)"
+    r"|[-–,;][ \t]*(?:due|deadline)(?:[ \t]+by)?[ \t]*:?[ \t]*(?P<trailing>.+?))[ \t]*$",
+    re.IGNORECASE,
+)
+
+DATE_PATTERN = re.compile(
+    r"\d{4}-\d{2}-\d{2}|(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?[ \t]+\d{1,2}(?:st|nd|rd|th)?(?:,?[ \t]+\d{4})?",
+    re.IGNORECASE,
+)
+DATE_FORMATS = ("%Y-%m-%d", "%B %d %Y", "%b %d %Y", "%B %d", "%b %d")
+
+# A due date this far before the meeting without a year is taken to be in the next year
+YEARLESS_DATE_LOOKBACK = timedelta(days=60)
+
+
+def parse_date(text: str, reference: Optional[str] = None) -> Optional[str]:
+    """
+    Find the first date in a text and normalize it to YYYY-MM-DD
+
+    Args:
+        text: Text containing a date such as "2024-03-20", "March 20, 2024" or "March 20"
+        reference: YYYY-MM-DD date that dates without a year are relative to
+
+    Returns:
+        YYYY-MM-DD string, or None if no date is found
+    """
+    match = DATE_PATTERN.search(text)
+    if not match:
+        return None
+
+    value = re.sub(r"(?<=\d)(?:st|nd|rd|th)|[.,]", "", match.group(0))
+    value = " ".join(value.split())
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+        if "%Y" not in date_format:
+            if reference is None:
+                return None
+            reference_date = date.fromisoformat(reference)
+            try:
+                parsed = parsed.replace(year=reference_date.year)
+            except ValueError:
+                # February 29 outside a leap year
+                return None
+            if parsed < reference_date - YEARLESS_DATE_LOOKBACK:
+                parsed = parsed.replace(year=parsed.year + 1)
+        return parsed.isoformat()
+    return None
+
+
+def _chunk_sections(metadata: Dict[str, Any]) -> List[str]:
+    sections = metadata.get("sections") or []
+    if isinstance(sections, str):
+        # Stored in the vector store as a comma-separated string
+        sections = sections.split(", ")
+    return sections
+
+
+def extract_items(text: str, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Extract decisions, action items and the next meeting from a chunk
+
+    Items are the list entries (or, under Next Meeting, the lines) of the
+    Decisions, Action Items and Next Meeting sections. A chunk that starts in
+    the middle of a section takes that section from its "sections" metadata.
+
+    Args:
+        text: Chunk text
+        metadata: Chunk metadata with source, date and topic
+
+    Returns:
+        List of item dicts with kind, text, owner, due_text and due_date
+    """
+    meeting_date = metadata.get("date")
+    sections = _chunk_sections(metadata)
+    kind = SECTION_KINDS.get(sections[0].lower()) if sections else None
+
+    lines: List[List[str]] = []
+    for line in text.splitlines():
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            kind = SECTION_KINDS.get(heading.group(1).strip().lower())
+            continue
+        if kind is None or not line.strip():
+            continue
+
+        marker = LIST_ITEM_PATTERN.match(line)
+        if marker:
+            lines.append([kind, line[marker.end():].strip()])
+        elif lines and lines[-1][0] == kind and line[:1] in (" ", "\t"):
+            # Continuation of the previous list item
+            lines[-1][1] = f"{lines[-1][1]} {line.strip()}".strip()
+        else:
+            lines.append([kind, line.strip()])
+
+    items = []
+    for item_kind, item_text in lines:
+        if not item_text:
+            # Unfilled template entry
+            continue
+
+        item = {"kind": item_kind, "text": item_text, "owner": None, "due_text": None, "due_date": None}
+        if item_kind == "action_item":
+            owner = OWNER_PATTERN.match(item_text)
+            if owner:
+                item["owner"] = owner.group("owner")
+                item_text = owner.group("task")
+            due = DUE_PATTERN.search(item_text)
+            if due and due.start() > 0:
+                item["due_text"] = (due.group("enclosed") or due.group("trailing")).strip()
+                item["due_date"] = parse_date(item["due_text"], meeting_date)
+                item_text = item_text[:due.start()]
+            item["text"] = item_text
+        elif item_kind == "next_meeting":
+            item["due_date"] = parse_date(item_text, meeting_date)
+        items.append(item)
+
+    return items
+
+
+class StructuredIndex:
+    """
+    SQLite side index of the decisions, action items and next meetings
+    listed in the notes, used to answer structured queries without the LLM
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open (or create) a structured index
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                chunk_id TEXT NOT NULL,
+                source TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                text TEXT NOT NULL,
+                owner TEXT,
+                owner_key TEXT,
+                due_text TEXT,
+                due_date TEXT,
+                meeting_date TEXT,
+                topic TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_items_chunk ON items (chunk_id);
+            CREATE INDEX IF NOT EXISTS idx_items_kind_owner ON items (kind, owner_key);
+            CREATE INDEX IF NOT EXISTS idx_items_kind_meeting_date ON items (kind, meeting_date);
+            """
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def add_documents(self, chunk_ids: List[str], documents: List[Document]) -> None:
+        """
+        Extract and record the items of document chunks
+
+        Args:
+            chunk_ids: IDs of the chunks
+            documents: Chunks to extract items from
+        """
+        rows = []
+        for chunk_id, document in zip(chunk_ids, documents):
+            metadata = document.metadata
+            for item in extract_items(document.page_content, metadata):
+                rows.append((
+                    chunk_id,
+                    metadata.get("source", ""),
+                    item["kind"],
+                    item["text"],
+                    item["owner"],
+                    item["owner"].lower() if item["owner"] else None,
+                    item["due_text"],
+                    item["due_date"],
+                    metadata.get("date"),
+                    metadata.get("topic"),
+                ))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (chunk_id) VALUES (?)", [(chunk_id,) for chunk_id in chunk_ids]
+            )
+            self._conn.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def delete(self, chunk_ids: List[str]) -> None:
+        """
+        Forget the items of chunks
+
+        Args:
+            chunk_ids: IDs of the chunks to delete
+        """
+        params = [(chunk_id,) for chunk_id in chunk_ids]
+        with self._lock:
+            self._conn.executemany("DELETE FROM items WHERE chunk_id = ?", params)
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", params)
+
+    def clear(self) -> None:
+        """
+        Remove all entries
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM items")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    def save(self) -> None:
+        """
+        Commit pending changes
+        """
+        with self._lock:
+            self._conn.commit()
+
+    def latest_meeting_date(self, kinds: Sequence[str]) -> Optional[str]:
+        """
+        Get the date of the most recent meeting with items of the given kinds
+
+        Args:
+            kinds: Item kinds
+
+        Returns:
+            YYYY-MM-DD date, or None if there are no such items
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT MAX(meeting_date) FROM items WHERE kind IN ({','.join('?' * len(kinds))})",
+                list(kinds),
+            ).fetchone()
+        return row[0]
+
+    def find_items(
+        self,
+        kinds: Sequence[str],
+        owner: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Find items, most recent meeting first
+
+        Items repeated in overlapping chunks are returned once.
+
+        Args:
+            kinds: Item kinds (decision, action_item, next_meeting)
+            owner: Owner of action items; a first name matches full names
+                ("Jane" matches "Jane Smith") and the reverse
+            date_from: Earliest meeting date (YYYY-MM-DD)
+            date_to: Latest meeting date (YYYY-MM-DD)
+            limit: Maximum number of items
+
+        Returns:
+            List of item dicts with kind, text, owner, due_text, due_date,
+            meeting_date, topic and source
+        """
+        clauses = [f"kind IN ({','.join('?' * len(kinds))})"]
+        params: List[Any] = list(kinds)
+        if owner is not None:
+            owner_key = owner.lower()
+            first_name = owner_key.split()[0]
+            clauses.append("(owner_key = ? OR owner_key LIKE ? || ' %' OR owner_key = ?)")
+            params.extend([owner_key, owner_key, first_name])
+        if date_from is not None:
+            clauses.append("meeting_date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            clauses.append("meeting_date <= ?")
+            params.append(date_to)
+
+        sql = (
+            "SELECT DISTINCT kind, text, owner, due_text, due_date, meeting_date, topic, source FROM items"
+            f" WHERE {' AND '.join(clauses)}"
+            " ORDER BY meeting_date DESC, source, kind, due_date"
+        )
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        columns = ("kind", "text", "owner", "due_text", "due_date", "meeting_date", "topic", "source")
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+
+_structured_indexes: Dict[str, StructuredIndex] = {}
+_structured_indexes_lock = threading.Lock()
+
+
+def get_structured_index_path(persist_directory: Optional[Union[str, Path]] = None) -> Path:
+    """
+    Get the path of the structured index stored alongside a vector store
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        Path to the structured index database
+    """
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+
+    # Resolved, so an index swapped in behind a link is opened as a different index
+    return Path(persist_directory).resolve() / STRUCTURED_INDEX_FILENAME
+
+
+def get_structured_index(persist_directory: Optional[Union[str, Path]] = None) -> StructuredIndex:
+    """
+    Get the shared structured index of a vector store, opening it on first use
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+
+    Returns:
+        StructuredIndex
+    """
+    path = str(get_structured_index_path(persist_directory))
+    with _structured_indexes_lock:
+        if path not in _structured_indexes:
+            _structured_indexes[path] = StructuredIndex(path)
+
+        return _structured_indexes[path]
+
+
+def close_structured_index(persist_directory: Optional[Union[str, Path]] = None) -> None:
+    """
+    Close the shared structured index of a vector store, if it is open
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+    """
+    path = get_structured_index_path(persist_directory)
+    with _structured_indexes_lock:
+        index = _structured_indexes.pop(str(path), None)
+        if index is not None:
+            index._conn.close()
+
+
+def delete_structured_index(persist_directory: Optional[Union[str, Path]] = None) -> None:
+    """
+    Delete the structured index of a vector store
+
+    Args:
+        persist_directory: Directory where the vector store is persisted
+    """
+    close_structured_index(persist_directory)
+    path = get_structured_index_path(persist_directory)
+    for suffix in ("", "-wal", "-shm"):
+        candidate = Path(f"{path}{suffix}")
+        if candidate.exists():
+            candidate.unlink()
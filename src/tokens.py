@@ -0,0 +1,75 @@
+# Token counting module for the RAG system
+
+from functools import lru_cache
+from typing import List, Optional
+
+import tiktoken
+
+
+@lru_cache(maxsize=1)
+def _get_token_encoding() -> Optional[tiktoken.Encoding]:
+    """
+    Get the tokenizer used to estimate request and chunk sizes
+
+    Returns:
+        tiktoken encoding, or None if it cannot be loaded (e.g. offline)
+    """
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"Error loading tiktoken encoding, estimating tokens from length: {e}")
+        return None
+
+
+def count_tokens_each(texts: List[str]) -> List[int]:
+    """
+    Count the tokens of each text in a list
+
+    Args:
+        texts: Texts to count
+
+    Returns:
+        Number of tokens per text
+    """
+    encoding = _get_token_encoding()
+    if encoding is None:
+        return [len(text) // 4 + 1 for text in texts]
+
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+def count_tokens(texts: List[str]) -> int:
+    """
+    Count the tokens in a list of texts
+
+    Args:
+        texts: Texts to count
+
+    Returns:
+        Total number of tokens
+    """
+    return sum(count_tokens_each(texts))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a text down to at most max_tokens tokens
+
+    Args:
+        text: Text to truncate
+        max_tokens: Maximum number of tokens
+
+    Returns:
+        The text, or its longest prefix within max_tokens
+    """
+    if max_tokens <= 0:
+        return ""
+
+    encoding = _get_token_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
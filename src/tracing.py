@@ -0,0 +1,380 @@
+# Tracing module for the RAG system
+
+import contextvars
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from src.config import METRICS_HOST, METRICS_PORT, TRACE_FILE, TRACING_ENABLED
+
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Integer span attributes that are summed into per-stage counters
+COUNTED_ATTRIBUTES = ("documents", "chunks", "texts", "tokens", "prompt_tokens", "completion_tokens")
+
+_enabled = TRACING_ENABLED
+_trace_writer = None
+_metrics_server = None
+_config_lock = threading.Lock()
+_span_ids = itertools.count(1)
+
+# Span nesting and per-request timing breakdowns follow the current context,
+# which asyncio tasks and asyncio.to_thread inherit
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("timings", default=None)
+
+
+class MetricsRegistry:
+    """
+    Per-stage duration histograms and item counters in Prometheus text format
+    """
+
+    def __init__(self):
+        self._durations: Dict[str, List[float]] = {}
+        self._items: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, duration: float, attrs: Dict[str, Any]) -> None:
+        """
+        Record one execution of a stage
+
+        Args:
+            stage: Stage name
+            duration: Duration in seconds
+            attrs: Span attributes; COUNTED_ATTRIBUTES are added to counters
+        """
+        with self._lock:
+            # Per-bucket counts followed by the sum and the total count
+            values = self._durations.get(stage)
+            if values is None:
+                values = self._durations[stage] = [0.0] * (len(DURATION_BUCKETS) + 2)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    values[i] += 1
+            values[-2] += duration
+            values[-1] += 1
+
+            for item in COUNTED_ATTRIBUTES:
+                value = attrs.get(item)
+                if isinstance(value, (int, float)):
+                    self._items[(stage, item)] = self._items.get((stage, item), 0) + value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize the recorded stages
+
+        Returns:
+            Dict of stage name to count, total seconds, mean milliseconds
+            and item counts
+        """
+        with self._lock:
+            summary = {
+                stage: {
+                    "count": values[-1],
+                    "total_s": values[-2],
+                    "mean_ms": values[-2] / values[-1] * 1000 if values[-1] else 0.0,
+                }
+                for stage, values in self._durations.items()
+            }
+            for (stage, item), value in self._items.items():
+                summary.setdefault(stage, {})[item] = value
+        return summary
+
+    def clear(self) -> None:
+        """
+        Reset all metrics
+        """
+        with self._lock:
+            self._durations.clear()
+            self._items.clear()
+
+    def render(self) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format
+
+        Returns:
+            Metrics text
+        """
+        lines = [
+            "# HELP rag_stage_duration_seconds Time spent in each RAG pipeline stage",
+            "# TYPE rag_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for stage, values in sorted(self._durations.items()):
+                for bound, count in zip(DURATION_BUCKETS, values):
+                    lines.append(f'rag_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count:g}')
+                lines.append(f'rag_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {values[-1]:g}')
+                lines.append(f'rag_stage_duration_seconds_sum{{stage="{stage}"}} {values[-2]}')
+                lines.append(f'rag_stage_duration_seconds_count{{stage="{stage}"}} {values[-1]:g}')
+
+            lines.append("# HELP rag_stage_items_total Items (documents, chunks, tokens) processed by each stage")
+            lines.append("# TYPE rag_stage_items_total counter")
+            for (stage, item), value in sorted(self._items.items()):
+                lines.append(f'rag_stage_items_total{{stage="{stage}",item="{item}"}} {value:g}')
+
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+class TraceWriter:
+    """
+    Appends finished spans to a JSONL file
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class Span:
+    """
+    Timed pipeline stage, used as a context manager
+    """
+
+    __slots__ = ("name", "attrs", "span_id", "parent_id", "trace_id", "start_time", "_start", "_token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> None:
+        """
+        Add attributes such as chunk or token counts
+
+        Args:
+            **attrs: Attribute values
+        """
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self._token = _current_span.set(self)
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _finish(self.name, duration, self.attrs, self)
+
+
+class _NoopSpan:
+    """
+    Span returned when tracing is inactive
+    """
+
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def is_active() -> bool:
+    """
+    Check whether spans are being recorded, so callers can skip computing
+    attributes (e.g. token counts) that would be thrown away
+
+    Returns:
+        True if tracing is enabled or a timing breakdown is being collected
+    """
+    return _enabled or _timings.get() is not None
+
+
+def span(name: str, **attrs: Any) -> Union[Span, _NoopSpan]:
+    """
+    Time a pipeline stage
+
+    Usage:
+        with span("retrieve") as s:
+            docs = retriever.invoke(query)
+            s.set(chunks=len(docs))
+
+    Args:
+        name: Stage name
+        **attrs: Initial attributes
+
+    Returns:
+        Span context manager (a shared no-op when tracing is inactive)
+    """
+    if not _enabled and _timings.get() is None:
+        return NOOP_SPAN
+    return Span(name, attrs)
+
+
+def record(name: str, duration: float, **attrs: Any) -> None:
+    """
+    Record a stage timed elsewhere, e.g. in a worker process
+
+    Args:
+        name: Stage name
+        duration: Duration in seconds
+        **attrs: Attributes
+    """
+    if not _enabled and _timings.get() is None:
+        return
+    _finish(name, duration, attrs, None)
+
+
+def _finish(name: str, duration: float, attrs: Dict[str, Any], finished: Optional[Span]) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + duration
+        for item in COUNTED_ATTRIBUTES:
+            value = attrs.get(item)
+            if isinstance(value, (int, float)):
+                timings[item] = timings.get(item, 0) + value
+
+    if not _enabled:
+        return
+
+    _registry.observe(name, duration, attrs)
+    if _trace_writer is not None:
+        record_ = {"name": name, "duration_ms": round(duration * 1000, 3), **attrs}
+        if finished is not None:
+            record_.update(
+                ts=finished.start_time,
+                trace_id=finished.trace_id,
+                span_id=finished.span_id,
+                parent_id=finished.parent_id,
+            )
+        else:
+            record_["ts"] = time.time() - duration
+            parent = _current_span.get()
+            if parent is not None:
+                record_.update(trace_id=parent.trace_id, parent_id=parent.span_id)
+        _trace_writer.write(record_)
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, float]]:
+    """
+    Collect a per-stage timing breakdown of the enclosed code, even when
+    tracing is disabled
+
+    Durations of repeated stages are summed, as are item counts such as
+    chunks and tokens.
+
+    Yields:
+        Dict of stage name to seconds, filled in as stages finish
+    """
+    timings: Dict[str, float] = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def configure_tracing(
+    enabled: Optional[bool] = None,
+    trace_file: Optional[Union[str, Path]] = None,
+) -> None:
+    """
+    Change the tracing configuration at runtime
+
+    Args:
+        enabled: Record spans into the metrics registry and trace file
+        trace_file: JSONL file to append spans to ("" to stop writing one)
+    """
+    global _enabled, _trace_writer
+    with _config_lock:
+        if enabled is not None:
+            _enabled = enabled
+        if trace_file is not None:
+            if _trace_writer is not None:
+                _trace_writer.close()
+            _trace_writer = TraceWriter(trace_file) if trace_file else None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """
+    Get the process-wide metrics registry
+
+    Returns:
+        MetricsRegistry
+    """
+    return _registry
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = _registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve the metrics at http://host:port/metrics in a background thread
+
+    Only one server is started per process; later calls return it.
+
+    Args:
+        port: Port to listen on (defaults to METRICS_PORT; 0 disables the server)
+        host: Interface to bind (defaults to METRICS_HOST)
+
+    Returns:
+        The running server, or None if disabled or the port is unavailable
+    """
+    global _metrics_server
+    port = METRICS_PORT if port is None else port
+    host = host or METRICS_HOST
+    with _config_lock:
+        if _metrics_server is not None or not port:
+            return _metrics_server
+        try:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            print(f"Error starting metrics server on {host}:{port}: {e}")
+            return None
+        _metrics_server.daemon_threads = True
+        threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+        return _metrics_server
+
+
+if TRACE_FILE:
+    configure_tracing(trace_file=TRACE_FILE)
@@ -1,88 +1,1098 @@
 # Vector store module for the RAG system
 
+import asyncio
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar, Union
+
+import numpy as np
 
-from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.embeddings import OllamaEmbeddings
+from langchain_core.vectorstores import VectorStore
 
+from src.async_utils import LoopSemaphore
 from src.config import (
+    ANN_MIN_ROWS,
+    ANN_NLIST,
+    ANN_NPROBE,
+    BACKEND_OLLAMA,
     CHROMA_PERSIST_DIRECTORY,
+    DEFAULT_BACKEND,
+    DOCUMENT_STORE_DIRECTORY,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_MAX_IN_FLIGHT,
+    EMBEDDING_MAX_RETRIES,
     EMBEDDING_MODEL,
+    EMBEDDING_PROVIDER,
+    EMBEDDING_PROVIDER_HASHING,
+    EMBEDDING_RETRY_BACKOFF,
+    EMBEDDING_TOKENS_PER_MINUTE,
+    FILTER_EXACT_MAX_CANDIDATES,
+    HASHING_EMBEDDING_DIMENSIONS,
+    HASHING_EMBEDDING_WORKERS,
+    INGEST_BATCH_SIZE,
+    LEXICAL_INDEX_ENABLED,
     LOCAL_EMBEDDING_MODEL,
+    NUMPY_STORE_DTYPE,
     OLLAMA_BASE_URL,
     OPENAI_API_KEY,
-    USE_LOCAL_MODELS,
+    OPENAI_BASE_URL,
+    SHARD_BY,
+    SHARD_SEARCH_WORKERS,
+    STRUCTURED_INDEX_ENABLED,
+    VECTOR_STORE_BACKEND,
+    get_embedding_model_name,
+)
+from src.document_processor import SUPPORTED_EXTENSIONS, iter_document_paths, stream_documents
+from src.embedding_cache import CachedEmbeddings, get_embedding_cache
+from src.index_manifest import (
+    CHUNKER_SIGNATURE,
+    delete_manifest,
+    generate_chunk_ids,
+    generate_document_id,
+    is_file_unchanged,
+    load_manifest,
+    make_manifest_entry,
+    record_embedding_model,
+    save_manifest,
+)
+from src.lexical_index import close_lexical_index, delete_lexical_index, get_lexical_index
+from src.metadata_index import (
+    CHUNK_METADATA_FIELDS,
+    MetadataIndex,
+    close_metadata_index,
+    delete_metadata_index,
+    get_metadata_index,
+    has_chunk_conditions,
+    join_document_metadata,
 )
+from src.numpy_store import NumpyVectorStore
+from src.sharded_store import SHARDS_DIRNAME, ShardedVectorStore, merge_search_results
+from src.structured_index import close_structured_index, delete_structured_index, get_structured_index
+from src.tokens import count_tokens
+from src.tracing import span
+
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRY_DELAY = 60.0
+
+# Below this many files, chunking in a thread is faster than starting worker processes
+SMALL_SYNC_FILES = 16
+
+T = TypeVar("T")
+
+
+def get_error_status_code(error: Exception) -> Optional[int]:
+    """
+    Extract an HTTP status code from an embedding client error
+    
+    Handles OpenAI/httpx errors (status_code or response.status_code) and the
+    ValueError messages raised by the Ollama client.
+    
+    Args:
+        error: Exception raised by an embedding call
+        
+    Returns:
+        HTTP status code, or None if it cannot be determined
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        response = getattr(error, "response", None)
+        status_code = getattr(response, "status_code", None)
+    if status_code is None:
+        match = re.search(r"(?:status code|HTTP code):? (\d{3})", str(error))
+        if match:
+            status_code = int(match.group(1))
+    
+    return status_code
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that enforces a tokens-per-minute budget
+    """
+    
+    def __init__(self, tokens_per_minute: int):
+        """
+        Create a token bucket
+        
+        Args:
+            tokens_per_minute: Budget refilled continuously over each minute
+        """
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _try_consume(self, tokens: float) -> float:
+        """
+        Consume tokens if they are available
+        
+        Args:
+            tokens: Number of tokens to consume
+            
+        Returns:
+            0 if the tokens were consumed, otherwise the seconds to wait before retrying
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            
+            return (tokens - self.tokens) / self.rate
+    
+    def acquire(self, tokens: int) -> None:
+        """
+        Block until the requested number of tokens is available, then consume them
+        
+        Requests larger than the whole budget wait for a full bucket.
+        
+        Args:
+            tokens: Number of tokens to consume
+        """
+        tokens = min(float(tokens), self.capacity)
+        while True:
+            wait_seconds = self._try_consume(tokens)
+            if not wait_seconds:
+                return
+            time.sleep(wait_seconds)
+    
+    async def aacquire(self, tokens: int) -> None:
+        """
+        Wait without blocking the event loop until tokens are available, then consume them
+        
+        Args:
+            tokens: Number of tokens to consume
+        """
+        tokens = min(float(tokens), self.capacity)
+        while True:
+            wait_seconds = self._try_consume(tokens)
+            if not wait_seconds:
+                return
+            await asyncio.sleep(wait_seconds)
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Embeddings wrapper that batches requests, runs them concurrently,
+    throttles them to a token budget and retries rate-limit and server errors
+    """
+    
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        model_name: Optional[str] = None,
+    ):
+        """
+        Wrap an embeddings implementation with a scheduler
+        
+        Args:
+            embeddings: Underlying embeddings implementation
+            batch_size: Number of texts per request
+            max_in_flight: Maximum number of concurrent requests
+            tokens_per_minute: Token budget per minute (0 disables throttling)
+            max_retries: Maximum number of retries per request
+            retry_backoff: Base delay in seconds for exponential backoff
+            model_name: Name of the embedding model, e.g. "openai/text-embedding-3-small"
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.batch_size = batch_size or EMBEDDING_BATCH_SIZE
+        self.max_in_flight = max_in_flight or EMBEDDING_MAX_IN_FLIGHT
+        self.max_retries = EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = EMBEDDING_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+        
+        if tokens_per_minute is None:
+            tokens_per_minute = EMBEDDING_TOKENS_PER_MINUTE
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        
+        self.requests = 0
+        self.retries = 0
+        self._stats_lock = threading.Lock()
+        # Shared by all async calls, so concurrent queries cannot exceed max_in_flight
+        self._async_limit = LoopSemaphore(self.max_in_flight)
+    
+    def _call_with_retry(self, fn: Callable[[], T]) -> T:
+        """
+        Call fn, retrying 429 and 5xx errors with exponential backoff and jitter
+        
+        Args:
+            fn: Function performing one embedding request
+            
+        Returns:
+            Result of fn
+        """
+        attempt = 0
+        while True:
+            try:
+                with self._stats_lock:
+                    self.requests += 1
+                return fn()
+            except Exception as e:
+                delay = self._should_retry(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+    
+    def _should_retry(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Decide whether to retry a failed request
+        
+        Args:
+            error: Exception raised by the request
+            attempt: Number of retries so far
+            
+        Returns:
+            Delay in seconds before the retry, or None to give up
+        """
+        status_code = get_error_status_code(error)
+        if status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+            return None
+        
+        with self._stats_lock:
+            self.retries += 1
+        delay = min(MAX_RETRY_DELAY, self.retry_backoff * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+    
+    async def _acall_with_retry(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await fn within the concurrency limit, retrying 429 and 5xx errors
+        
+        Args:
+            fn: Function returning an awaitable that performs one embedding request
+            
+        Returns:
+            Result of fn
+        """
+        attempt = 0
+        while True:
+            try:
+                async with self._async_limit:
+                    with self._stats_lock:
+                        self.requests += 1
+                    return await fn()
+            except Exception as e:
+                delay = self._should_retry(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed one batch within the token budget
+        
+        Args:
+            texts: Texts in the batch
+            
+        Returns:
+            List of embeddings
+        """
+        with span("embedding_request", texts=len(texts)) as s:
+            if self.token_bucket is not None:
+                tokens = count_tokens(texts)
+                s.set(tokens=tokens)
+                self.token_bucket.acquire(tokens)
+            
+            return self._call_with_retry(lambda: self.embeddings.embed_documents(texts))
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents in concurrent batches
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            List of embeddings, in the order of texts
+        """
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.max_in_flight <= 1:
+            return [vector for batch in batches for vector in self._embed_batch(batch)]
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as executor:
+            results = executor.map(self._embed_batch, batches)
+            return [vector for batch_vectors in results for vector in batch_vectors]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query
+        
+        Args:
+            text: Query text
+            
+        Returns:
+            Embedding
+        """
+        with span("embedding_request", texts=1) as s:
+            if self.token_bucket is not None:
+                tokens = count_tokens([text])
+                s.set(tokens=tokens)
+                self.token_bucket.acquire(tokens)
+            
+            return self._call_with_retry(lambda: self.embeddings.embed_query(text))
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several queries
+        
+        OpenAI embeds queries and documents alike, so the queries are sent in
+        batches like documents. Other models may embed queries differently
+        (Ollama prepends a query instruction), so each query is sent as its own
+        request, up to max_in_flight at a time.
+        
+        Args:
+            texts: Query texts
+            
+        Returns:
+            List of embeddings, in the order of texts
+        """
+        # langchain_openai is only loaded once an OpenAI model has been created
+        openai = sys.modules.get("langchain_openai")
+        if openai is not None and isinstance(self.embeddings, openai.OpenAIEmbeddings):
+            return self.embed_documents(texts)
+        
+        if len(texts) <= 1 or self.max_in_flight <= 1:
+            return [self.embed_query(text) for text in texts]
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(texts))) as executor:
+            return list(executor.map(self.embed_query, texts))
+    
+    async def _aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed one batch within the token budget without blocking the event loop
+        
+        Args:
+            texts: Texts in the batch
+            
+        Returns:
+            List of embeddings
+        """
+        with span("embedding_request", texts=len(texts)) as s:
+            if self.token_bucket is not None:
+                tokens = count_tokens(texts)
+                s.set(tokens=tokens)
+                await self.token_bucket.aacquire(tokens)
+            
+            return await self._acall_with_retry(lambda: self.embeddings.aembed_documents(texts))
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents in concurrent batches without blocking the event loop
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            List of embeddings, in the order of texts
+        """
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*(self._aembed_batch(batch) for batch in batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Embed a query without blocking the event loop
+        
+        Args:
+            text: Query text
+            
+        Returns:
+            Embedding
+        """
+        with span("embedding_request", texts=1) as s:
+            if self.token_bucket is not None:
+                tokens = count_tokens([text])
+                s.set(tokens=tokens)
+                await self.token_bucket.aacquire(tokens)
+            
+            return await self._acall_with_retry(lambda: self.embeddings.aembed_query(text))
+
+
+def resolve_embedding_model_name(embedding_model: Optional[Embeddings], backend: Optional[str] = None) -> str:
+    """
+    Get the name of the model an embeddings object embeds with
+    
+    Args:
+        embedding_model: Embedding model (None for the backend's configured model)
+        backend: Backend the model was built for (defaults to DEFAULT_BACKEND)
+        
+    Returns:
+        The model's own name if it has one, else the backend's configured model name
+    """
+    return getattr(embedding_model, "model_name", None) or get_embedding_model_name(backend)
 
 
-def get_embedding_model() -> Embeddings:
+def get_embedding_model(backend: Optional[str] = None) -> Embeddings:
     """
     Get the appropriate embedding model based on configuration
     
+    The model is wrapped in an EmbeddingScheduler for batched, concurrent,
+    rate-limited requests, and in a persistent embedding cache unless
+    EMBEDDING_CACHE_ENABLED is false. With EMBEDDING_PROVIDER=hashing, every
+    backend embeds in-process with HashingEmbeddings instead, which needs
+    neither scheduling nor a cache.
+    
+    Args:
+        backend: Backend to use (defaults to DEFAULT_BACKEND)
+    
     Returns:
         Embeddings model
     """
-    if USE_LOCAL_MODELS:
-        return OllamaEmbeddings(
-            model=LOCAL_EMBEDDING_MODEL,
-            base_url=OLLAMA_BASE_URL,
+    if backend is None:
+        backend = DEFAULT_BACKEND
+    model_name = get_embedding_model_name(backend)
+    
+    if EMBEDDING_PROVIDER == EMBEDDING_PROVIDER_HASHING:
+        from src.hashing_embeddings import HashingEmbeddings
+        
+        # Embedding on CPU is faster than looking the vectors up in the cache
+        return HashingEmbeddings(
+            dimensions=HASHING_EMBEDDING_DIMENSIONS,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            max_workers=HASHING_EMBEDDING_WORKERS,
+        )
+    
+    # Only the selected backend's package is imported
+    if backend == BACKEND_OLLAMA:
+        from langchain_community.embeddings import OllamaEmbeddings
+        
+        embedding_model = EmbeddingScheduler(
+            OllamaEmbeddings(
+                model=LOCAL_EMBEDDING_MODEL,
+                base_url=OLLAMA_BASE_URL,
+            ),
+            # The Ollama client sends one HTTP request per text, so schedule
+            # single texts to get per-request concurrency and retries
+            batch_size=1,
+            # Ollama has no token quota, only a server to avoid overloading
+            tokens_per_minute=0,
+            model_name=model_name,
         )
     else:
-        return OpenAIEmbeddings(
-            model=EMBEDDING_MODEL,
-            openai_api_key=OPENAI_API_KEY,
+        from langchain_openai import OpenAIEmbeddings
+        
+        embedding_model = EmbeddingScheduler(
+            OpenAIEmbeddings(
+                model=EMBEDDING_MODEL,
+                openai_api_key=OPENAI_API_KEY,
+                openai_api_base=OPENAI_BASE_URL,
+                # Retries are handled by the scheduler
+                max_retries=0,
+            ),
+            model_name=model_name,
+        )
+    
+    if not EMBEDDING_CACHE_ENABLED:
+        return embedding_model
+    
+    return CachedEmbeddings(embedding_model, model_name, get_embedding_cache())
+
+
+def embed_queries(embedding_model: Embeddings, queries: List[str]) -> List[List[float]]:
+    """
+    Embed several queries, in as few requests as the model allows
+    
+    Models from get_embedding_model (and others providing embed_queries)
+    batch the queries; other models embed them one by one.
+    
+    Args:
+        embedding_model: Embedding model
+        queries: Query texts
+        
+    Returns:
+        List of embeddings, in the order of queries
+    """
+    if hasattr(embedding_model, "embed_queries"):
+        return embedding_model.embed_queries(queries)
+    
+    return [embedding_model.embed_query(query) for query in queries]
+
+
+def get_side_indexes(persist_directory: Optional[Union[str, Path]] = None) -> List:
+    """
+    Get the indexes maintained alongside the vector store
+    
+    Each side index is kept in sync with the vector store by chunk ID and
+    provides add_documents(chunk_ids, documents), delete(chunk_ids), clear()
+    and save().
+    
+    Args:
+        persist_directory: Directory where the vector store is persisted
+        
+    Returns:
+        List of side indexes
+    """
+    side_indexes = [get_metadata_index(persist_directory)]
+    if LEXICAL_INDEX_ENABLED:
+        side_indexes.append(get_lexical_index(persist_directory))
+    if STRUCTURED_INDEX_ENABLED:
+        side_indexes.append(get_structured_index(persist_directory))
+    
+    return side_indexes
+
+
+def close_side_indexes(persist_directory: Optional[Union[str, Path]] = None) -> None:
+    """
+    Close the shared side indexes of a vector store, e.g. once it has been swapped out
+    
+    Args:
+        persist_directory: Directory where the vector store is persisted
+    """
+    close_metadata_index(persist_directory)
+    close_lexical_index(persist_directory)
+    close_structured_index(persist_directory)
+
+
+def open_vector_store(
+    persist_directory: Union[str, Path],
+    embedding_model: Embeddings,
+) -> VectorStore:
+    """
+    Open (or create) the vector store of the configured backend
+    
+    VECTOR_STORE_BACKEND selects Chroma or the memory-mapped NumpyVectorStore,
+    whose vectors are stored with NUMPY_STORE_DTYPE and searched through an
+    IVF index once it holds ANN_MIN_ROWS chunks. With SHARD_BY set, the store
+    is a ShardedVectorStore with one store of that backend per year or month:
+    a Chroma collection each, or a NumPy store under the shards directory.
+    
+    Args:
+        persist_directory: Directory where the vector store is persisted
+        embedding_model: Embedding model to use
+        
+    Returns:
+        Vector store
+    """
+    # A store swapped in behind a link (see src.index_swap) is opened at its
+    # own path, so clients cached per path are not shared across versions
+    persist_directory = Path(persist_directory).resolve()
+    if SHARD_BY != "none":
+        def open_shard(name: str) -> VectorStore:
+            if VECTOR_STORE_BACKEND == "numpy":
+                return _open_backend_store(persist_directory / SHARDS_DIRNAME / name, embedding_model)
+            return _open_backend_store(persist_directory, embedding_model, collection_name=f"shard-{name}")
+        
+        return ShardedVectorStore(
+            persist_directory,
+            embedding_model,
+            open_shard=open_shard,
+            add_shard=add_embeddings,
+            search_shard=batch_search_by_vector_with_ids,
+            granularity=SHARD_BY,
+            max_workers=SHARD_SEARCH_WORKERS,
+        )
+    
+    return _open_backend_store(persist_directory, embedding_model)
+
+
+def _open_backend_store(
+    persist_directory: Path,
+    embedding_model: Embeddings,
+    collection_name: str = "langchain",
+) -> VectorStore:
+    if VECTOR_STORE_BACKEND == "numpy":
+        return NumpyVectorStore(
+            persist_directory,
+            embedding_model,
+            dtype=NUMPY_STORE_DTYPE,
+            ann_min_rows=ANN_MIN_ROWS or None,
+            nlist=ANN_NLIST,
+            nprobe=ANN_NPROBE,
+        )
+    if VECTOR_STORE_BACKEND != "chroma":
+        raise ValueError(f"Unknown vector store backend: {VECTOR_STORE_BACKEND}")
+    
+    from langchain_community.vectorstores import Chroma
+    
+    return Chroma(
+        collection_name=collection_name,
+        persist_directory=str(persist_directory),
+        embedding_function=embedding_model,
+    )
+
+
+def add_embeddings(
+    vector_store: VectorStore,
+    ids: List[str],
+    embeddings: np.ndarray,
+    texts: List[str],
+    metadatas: List[Dict],
+    shard_names: Optional[List[str]] = None,
+) -> None:
+    """
+    Add chunks with precomputed embeddings, replacing chunks with the same IDs
+    
+    Args:
+        vector_store: Vector store to add to
+        ids: Chunk IDs
+        embeddings: Embedding matrix with one row per chunk
+        texts: Chunk texts
+        metadatas: Chunk metadata, as stored (see to_chroma_metadata)
+        shard_names: Shard of each chunk in a sharded store (see
+            ShardedVectorStore.shard_name; needed when the stored metadata
+            lacks the documents' dates)
+    """
+    if isinstance(vector_store, ShardedVectorStore):
+        vector_store.add_vectors(ids, np.asarray(embeddings, dtype=np.float32), texts, metadatas, shard_names)
+        return
+    if isinstance(vector_store, NumpyVectorStore):
+        vector_store.add_vectors(ids, np.asarray(embeddings, dtype=np.float32), texts, metadatas)
+        return
+    
+    # Chroma rejects empty metadata
+    vector_store._collection.upsert(
+        ids=ids,
+        embeddings=np.asarray(embeddings, dtype=np.float32),
+        documents=texts,
+        metadatas=[metadata or None for metadata in metadatas],
+    )
+
+
+def to_chroma_metadata(metadata: Dict) -> Dict:
+    """
+    Convert chunk metadata to the scalar values Chroma can store
+    
+    Args:
+        metadata: Chunk metadata
+        
+    Returns:
+        Metadata with list values joined into comma-separated strings
+    """
+    return {
+        key: ", ".join(str(item) for item in value) if isinstance(value, (list, tuple)) else value
+        for key, value in metadata.items()
+        if value is not None
+    }
+
+
+def _to_chroma_documents(documents: List[Document]) -> List[Document]:
+    # Chunks with a document ID keep only their own fields; the rest of their
+    # metadata is stored once per document in the metadata index
+    return [
+        Document(
+            page_content=document.page_content,
+            metadata=to_chroma_metadata(
+                {key: value for key, value in document.metadata.items() if key in CHUNK_METADATA_FIELDS}
+                if "doc_id" in document.metadata
+                else document.metadata
+            ),
+        )
+        for document in documents
+    ]
+
+
+def _prepare_indexes(
+    manifest: Dict[str, Dict],
+    vector_store: VectorStore,
+    side_indexes: List,
+    persist_directory: Optional[Union[str, Path]] = None,
+) -> Dict[str, Dict]:
+    """
+    Bring the vector store and side indexes in line with the manifest before indexing
+    
+    With a manifest, empty side indexes are backfilled from the vector store.
+    Without one (new store, or a manifest format change that forces a full
+    re-index) everything is cleared, since every file is about to be
+    re-added; re-adding over old chunks would keep metadata they no longer have.
+    
+    Args:
+        manifest: Index manifest
+        vector_store: Vector store to read from
+        side_indexes: Side indexes to prepare
+        persist_directory: Directory where the vector store is persisted
+        
+    Returns:
+        The manifest to index against: empty if the document metadata was
+        lost and every file has to be re-added
+    """
+    if manifest and not _backfill_side_indexes(vector_store, side_indexes, persist_directory):
+        manifest = {}
+    if not manifest:
+        _clear_vector_store(vector_store)
+        for index in side_indexes:
+            if len(index):
+                index.clear()
+    
+    return manifest
+
+
+def _clear_vector_store(vector_store: VectorStore) -> None:
+    """
+    Delete all chunks from a vector store, keeping the store itself
+    
+    Args:
+        vector_store: Vector store to clear
+    """
+    while True:
+        ids = vector_store.get(limit=1000, include=[])["ids"]
+        if not ids:
+            break
+        vector_store.delete(ids=ids)
+
+
+def _backfill_side_indexes(
+    vector_store: VectorStore,
+    side_indexes: List,
+    persist_directory: Optional[Union[str, Path]] = None,
+) -> bool:
+    """
+    Populate empty side indexes from the chunks already in the vector store
+    
+    Args:
+        vector_store: Vector store to read from
+        side_indexes: Side indexes to check
+        persist_directory: Directory where the vector store is persisted
+        
+    Returns:
+        False if the metadata index is empty but the stored chunks only carry
+        document IDs, so the documents' metadata has to be re-read from the files
+    """
+    empty = [index for index in side_indexes if len(index) == 0]
+    if not empty:
+        return True
+    
+    offset = 0
+    page_size = 1000
+    while True:
+        results = vector_store.get(
+            include=["documents", "metadatas"], limit=page_size, offset=offset
         )
+        if not results["ids"]:
+            break
+        
+        documents = [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(results["documents"], results["metadatas"])
+        ]
+        if offset == 0 and any(isinstance(index, MetadataIndex) for index in empty):
+            if any("doc_id" in document.metadata for document in documents):
+                return False
+        join_document_metadata(documents, persist_directory)
+        for index in empty:
+            index.add_documents(results["ids"], documents)
+        offset += len(results["ids"])
+    
+    for index in empty:
+        index.save()
+    
+    return True
+
+
+def _replace_source_chunks(
+    vector_store: VectorStore,
+    manifest: Dict[str, Dict],
+    batch: List[Tuple[Path, str, List[Document]]],
+    side_indexes: Optional[List] = None,
+) -> None:
+    """
+    Replace the stored chunks of a batch of source files
+    
+    Old vectors of all files in the batch are deleted in one call and the new
+    chunks are embedded and added in one call.
+    
+    Args:
+        vector_store: Vector store to update
+        manifest: Index manifest, updated in place
+        batch: List of (file_path, content_hash, chunks) tuples
+        side_indexes: Side indexes to update alongside the vector store
+    """
+    side_indexes = side_indexes or []
+    
+    # Remove the vectors of the previous versions of the files
+    old_ids = []
+    for file_path, _, _ in batch:
+        entry = manifest.get(str(file_path))
+        if entry and entry.get("chunk_ids"):
+            old_ids.extend(entry["chunk_ids"])
+    if old_ids:
+        with span("delete_chunks", chunks=len(old_ids)):
+            vector_store.delete(ids=old_ids)
+            for index in side_indexes:
+                index.delete(old_ids)
+    
+    # Embed only the new chunks, under deterministic IDs
+    all_chunks = []
+    all_ids = []
+    for file_path, content_hash, chunks in batch:
+        doc_id = generate_document_id(str(file_path), content_hash)
+        chunk_ids = generate_chunk_ids(str(file_path), content_hash, len(chunks))
+        for chunk in chunks:
+            chunk.metadata["doc_id"] = doc_id
+        all_chunks.extend(chunks)
+        all_ids.extend(chunk_ids)
+        manifest[str(file_path)] = make_manifest_entry(file_path, content_hash, chunk_ids)
+    
+    if all_chunks:
+        # Stored chunks keep only their document ID, so shards are picked from the full metadata
+        add_kwargs = {}
+        if isinstance(vector_store, ShardedVectorStore):
+            add_kwargs["shard_names"] = [vector_store.shard_name(chunk.metadata) for chunk in all_chunks]
+        with span("add_documents", documents=len(batch), chunks=len(all_chunks)):
+            vector_store.add_documents(_to_chroma_documents(all_chunks), ids=all_ids, **add_kwargs)
+        with span("update_side_indexes", chunks=len(all_chunks)):
+            for index in side_indexes:
+                index.add_documents(all_ids, all_chunks)
+
+
+def _remove_source(
+    vector_store: VectorStore,
+    manifest: Dict[str, Dict],
+    source: str,
+    side_indexes: Optional[List] = None,
+) -> None:
+    """
+    Remove all stored chunks of a source file
+    
+    Args:
+        vector_store: Vector store to update
+        manifest: Index manifest, updated in place
+        source: Source path of the file
+        side_indexes: Side indexes to update alongside the vector store
+    """
+    entry = manifest.pop(source, None)
+    if entry and entry.get("chunk_ids"):
+        vector_store.delete(ids=entry["chunk_ids"])
+        for index in side_indexes or []:
+            index.delete(entry["chunk_ids"])
 
 
 def create_or_update_vector_store(
     documents: List[Document],
     persist_directory: Optional[Union[str, Path]] = None,
-) -> Chroma:
+    embedding_model: Optional[Embeddings] = None,
+) -> VectorStore:
     """
     Create or update a vector store with the provided documents
     
+    Chunks are grouped by their source file. Files whose content hash matches
+    the index manifest are skipped; changed files have their old chunks
+    replaced.
+    
     Args:
         documents: List of documents to add to the vector store
         persist_directory: Directory to persist the vector store
+        embedding_model: Embedding model to use (defaults to get_embedding_model())
         
     Returns:
-        Chroma vector store
+        Vector store
     """
     if persist_directory is None:
         persist_directory = CHROMA_PERSIST_DIRECTORY
     
     # Get embedding model
-    embedding_model = get_embedding_model()
+    if embedding_model is None:
+        embedding_model = get_embedding_model()
+    record_embedding_model(persist_directory, getattr(embedding_model, "model_name", None))
     
     # Create or load vector store
-    vector_store = Chroma(
-        persist_directory=str(persist_directory),
-        embedding_function=embedding_model,
-    )
+    with span("open_vector_store"):
+        vector_store = open_vector_store(persist_directory, embedding_model)
+    
+    # Group chunks by source file
+    chunks_by_source: Dict[str, List[Document]] = {}
+    for document in documents:
+        source = document.metadata.get("source", "")
+        chunks_by_source.setdefault(source, []).append(document)
+    
+    # Add only new or changed files to the vector store
+    manifest = load_manifest(persist_directory)
+    if manifest and not vector_store.get(limit=1)["ids"]:
+        # Nothing stored despite a manifest (e.g. after switching backends), so re-index everything
+        manifest = {}
+    side_indexes = get_side_indexes(persist_directory)
+    manifest = _prepare_indexes(manifest, vector_store, side_indexes, persist_directory)
+    changed = False
+    for source, chunks in chunks_by_source.items():
+        content_hash = chunks[0].metadata.get("content_hash")
+        entry = manifest.get(source)
+        if (
+            content_hash
+            and entry
+            and entry.get("content_hash") == content_hash
+            and entry.get("chunker") == CHUNKER_SIGNATURE
+        ):
+            continue
+        
+        if not content_hash:
+            # Without a content hash the chunks cannot be tracked in the manifest
+            vector_store.add_documents(_to_chroma_documents(chunks))
+        else:
+            _replace_source_chunks(
+                vector_store, manifest, [(Path(source), content_hash, chunks)], side_indexes
+            )
+        changed = True
     
-    # Add documents to vector store
-    if documents:
-        vector_store.add_documents(documents)
+    if changed:
         vector_store.persist()
+        save_manifest(manifest, persist_directory)
+        for index in side_indexes:
+            index.save()
     
     return vector_store
 
 
+def sync_vector_store(
+    directory: Optional[Path] = None,
+    persist_directory: Optional[Union[str, Path]] = None,
+    embedding_model: Optional[Embeddings] = None,
+    batch_size: Optional[int] = None,
+    paths: Optional[Iterable[Path]] = None,
+) -> Tuple[VectorStore, Dict[str, int]]:
+    """
+    Incrementally synchronize the vector store with a document directory
+    
+    Unchanged files (same mtime and size, or same content hash) are skipped
+    without re-embedding, changed files have their old chunks replaced, and
+    files that no longer exist have their chunks removed. Files are loaded
+    and chunked in parallel by stream_documents while earlier chunks are
+    embedded and upserted in batches of about batch_size chunks.
+    
+    With paths, only those files are synchronized (e.g. the files a watcher
+    saw change), so the rest of the directory is not even listed.
+    
+    Args:
+        directory: Directory containing documents to index
+        persist_directory: Directory to persist the vector store
+        embedding_model: Embedding model to use (defaults to get_embedding_model())
+        batch_size: Number of chunks to embed and upsert per batch
+        paths: Files to synchronize (defaults to every file in directory)
+        
+    Returns:
+        Tuple of (vector store, dict of file counts per outcome)
+    """
+    if directory is None:
+        directory = DOCUMENT_STORE_DIRECTORY
+    if persist_directory is None:
+        persist_directory = CHROMA_PERSIST_DIRECTORY
+    if batch_size is None:
+        batch_size = INGEST_BATCH_SIZE
+    
+    # Get embedding model
+    if embedding_model is None:
+        embedding_model = get_embedding_model()
+    record_embedding_model(persist_directory, getattr(embedding_model, "model_name", None))
+    
+    # Create or load vector store
+    with span("open_vector_store"):
+        vector_store = open_vector_store(persist_directory, embedding_model)
+    
+    manifest = load_manifest(persist_directory)
+    if manifest and not vector_store.get(limit=1)["ids"]:
+        # Nothing stored despite a manifest (e.g. after switching backends), so re-index everything
+        manifest = {}
+    side_indexes = get_side_indexes(persist_directory)
+    manifest = _prepare_indexes(manifest, vector_store, side_indexes, persist_directory)
+    stats = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0, "chunks": 0}
+    current_sources = set()
+    
+    chunk_workers = None
+    if paths is not None:
+        paths = [Path(file_path) for file_path in paths if str(file_path).endswith(SUPPORTED_EXTENSIONS)]
+        if len(paths) <= SMALL_SYNC_FILES:
+            chunk_workers = 1
+    
+    def discover():
+        if paths is None:
+            file_paths = iter_document_paths(directory)
+        else:
+            file_paths = (file_path for file_path in paths if file_path.is_file())
+        
+        # Fast path: files whose mtime and size match are never read
+        for file_path in file_paths:
+            current_sources.add(str(file_path))
+            if is_file_unchanged(manifest.get(str(file_path)), file_path):
+                stats["unchanged"] += 1
+            else:
+                yield file_path
+    
+    def needs_reindex(file_path, metadata):
+        entry = manifest.get(str(file_path))
+        return (
+            not entry
+            or entry.get("content_hash") != metadata["content_hash"]
+            or entry.get("chunker") != CHUNKER_SIGNATURE
+        )
+    
+    batch = []
+    batch_chunks = 0
+    for file_path, metadata, chunks in stream_documents(
+        discover(), filter_fn=needs_reindex, chunk_workers=chunk_workers
+    ):
+        if chunks is None:
+            entry = manifest.get(str(file_path))
+            if entry and metadata.get("content_hash") == entry.get("content_hash"):
+                # Touched but not modified, so only refresh the fingerprint
+                manifest[str(file_path)] = make_manifest_entry(
+                    file_path, entry["content_hash"], entry["chunk_ids"]
+                )
+                stats["unchanged"] += 1
+            continue
+        
+        stats["updated" if str(file_path) in manifest else "added"] += 1
+        stats["chunks"] += len(chunks)
+        batch.append((file_path, metadata["content_hash"], chunks))
+        batch_chunks += len(chunks)
+        
+        if batch_chunks >= batch_size:
+            _replace_source_chunks(vector_store, manifest, batch, side_indexes)
+            batch = []
+            batch_chunks = 0
+    
+    if batch:
+        _replace_source_chunks(vector_store, manifest, batch, side_indexes)
+    
+    # Remove files that were deleted from the directory
+    directory_prefix = str(Path(directory)).rstrip("/") + "/"
+    candidates = list(manifest) if paths is None else [str(file_path) for file_path in paths]
+    for source in candidates:
+        if source in manifest and source.startswith(directory_prefix) and source not in current_sources:
+            _remove_source(vector_store, manifest, source, side_indexes)
+            stats["deleted"] += 1
+    
+    # Persist the vectors first, so the manifest never lists chunks that are not stored
+    changed = stats["added"] or stats["updated"] or stats["deleted"]
+    if changed:
+        vector_store.persist()
+    save_manifest(manifest, persist_directory)
+    if changed:
+        for index in side_indexes:
+            index.save()
+    
+    return vector_store, stats
+
+
 def get_vector_store(
     persist_directory: Optional[Union[str, Path]] = None,
-) -> Optional[Chroma]:
+    embedding_model: Optional[Embeddings] = None,
+) -> Optional[VectorStore]:
     """
     Get the vector store
     
     Args:
         persist_directory: Directory where the vector store is persisted
+        embedding_model: Embedding model to use (defaults to get_embedding_model())
         
     Returns:
-        Chroma vector store or None if it doesn't exist
+        Vector store or None if it doesn't exist
     """
     if persist_directory is None:
         persist_directory = CHROMA_PERSIST_DIRECTORY
@@ -92,32 +1102,266 @@ def get_vector_store(
         return None
     
     # Get embedding model
-    embedding_model = get_embedding_model()
+    if embedding_model is None:
+        embedding_model = get_embedding_model()
     
     # Load vector store
     try:
-        vector_store = Chroma(
-            persist_directory=str(persist_directory),
-            embedding_function=embedding_model,
-        )
+        with span("open_vector_store"):
+            vector_store = open_vector_store(persist_directory, embedding_model)
         return vector_store
     except Exception as e:
         print(f"Error loading vector store: {e}")
         return None
 
 
+def search_by_vector_with_ids(
+    vector_store: VectorStore,
+    embedding: List[float],
+    k: int = 4,
+    where: Optional[Dict] = None,
+    nprobe: Optional[int] = None,
+    shards: Optional[List[str]] = None,
+) -> List[Tuple[str, Document, float]]:
+    """
+    Search the vector store by embedding, returning chunk IDs with the documents
+    
+    Args:
+        vector_store: Vector store to search
+        embedding: Query embedding
+        k: Number of results to return
+        where: Optional Chroma metadata filter
+        nprobe: IVF lists to search in the NumPy store (defaults to
+            ANN_NPROBE, 0 for exact search; ignored by Chroma)
+        shards: Shards to search in a sharded store (defaults to all)
+        
+    Returns:
+        List of (chunk_id, document, distance) tuples, nearest first
+        (squared L2 for Chroma, cosine for the NumPy store)
+    """
+    return batch_search_by_vector_with_ids(vector_store, [embedding], k, where, nprobe, shards)[0]
+
+
+def batch_search_by_vector_with_ids(
+    vector_store: VectorStore,
+    embeddings: List[List[float]],
+    k: int = 4,
+    where: Optional[Dict] = None,
+    nprobe: Optional[int] = None,
+    shards: Optional[List[str]] = None,
+) -> List[List[Tuple[str, Document, float]]]:
+    """
+    Search the vector store for several query embeddings in one call
+    
+    The NumPy store scores all queries with one matrix product per block of
+    rows; Chroma answers all of them in a single collection query. A sharded
+    store runs this on each shard in parallel and merges the results.
+    
+    Args:
+        vector_store: Vector store to search
+        embeddings: Query embeddings
+        k: Number of results per query
+        where: Optional Chroma metadata filter
+        nprobe: IVF lists to search in the NumPy store (see search_by_vector_with_ids)
+        shards: Shards to search in a sharded store (defaults to all)
+        
+    Returns:
+        One list of (chunk_id, document, distance) tuples per query, nearest first
+    """
+    if not embeddings:
+        return []
+    
+    if isinstance(vector_store, ShardedVectorStore):
+        return vector_store.batch_search_with_ids(embeddings, k=k, where=where, nprobe=nprobe, shards=shards)
+    if isinstance(vector_store, NumpyVectorStore):
+        return vector_store.batch_search_with_ids(embeddings, k=k, where=where, nprobe=nprobe)
+    
+    results = vector_store._collection.query(
+        query_embeddings=list(embeddings),
+        n_results=k,
+        where=where,
+        include=["documents", "metadatas", "distances"],
+    )
+    
+    return [
+        [
+            (chunk_id, Document(page_content=text, metadata=metadata or {}), distance)
+            for chunk_id, text, metadata, distance in zip(ids, texts, metadatas, distances)
+        ]
+        for ids, texts, metadatas, distances in zip(
+            results["ids"], results["documents"], results["metadatas"], results["distances"]
+        )
+    ]
+
+
+def get_documents_by_ids(
+    vector_store: VectorStore,
+    ids: List[str],
+) -> Dict[str, Document]:
+    """
+    Fetch stored chunks by ID
+    
+    Args:
+        vector_store: Vector store to read from
+        ids: Chunk IDs
+        
+    Returns:
+        Dict mapping chunk IDs to documents (missing IDs are omitted)
+    """
+    if not ids:
+        return {}
+    
+    results = vector_store.get(ids=ids, include=["documents", "metadatas"])
+    return {
+        chunk_id: Document(page_content=text, metadata=metadata or {})
+        for chunk_id, text, metadata in zip(
+            results["ids"], results["documents"], results["metadatas"]
+        )
+    }
+
+
+def get_embeddings_by_ids(
+    vector_store: VectorStore,
+    ids: List[str],
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Fetch stored embeddings by chunk ID
+    
+    Args:
+        vector_store: Vector store to read from
+        ids: Chunk IDs
+        
+    Returns:
+        Tuple of (found chunk IDs, float32 matrix with one row per found ID)
+    """
+    if not ids:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    
+    results = vector_store.get(ids=ids, include=["embeddings"])
+    return list(results["ids"]), np.asarray(results["embeddings"], dtype=np.float32)
+
+
+def search_by_vector_in_ids(
+    vector_store: VectorStore,
+    embedding: List[float],
+    ids: List[str],
+    k: int = 4,
+) -> List[Tuple[str, Document, float]]:
+    """
+    Exactly rank a candidate set of chunks by distance to an embedding
+    
+    Distances are squared L2, like Chroma's default collection metric, so
+    results are comparable with search_by_vector_with_ids. The NumPy store
+    ranks the candidates itself and returns cosine distances.
+    
+    Args:
+        vector_store: Vector store to read from
+        embedding: Query embedding
+        ids: Candidate chunk IDs
+        k: Number of results to return
+        
+    Returns:
+        List of (chunk_id, document, distance) tuples, nearest first
+    """
+    if isinstance(vector_store, ShardedVectorStore):
+        groups = vector_store.route_ids(ids)
+        results = vector_store.map_shards(
+            lambda name, shard: [search_by_vector_in_ids(shard, embedding, groups[name], k)], groups
+        )
+        return merge_search_results(results, k)[0] if results else []
+    if isinstance(vector_store, NumpyVectorStore):
+        return vector_store.search_with_ids(embedding, k=k, ids=ids)
+    
+    found_ids, embeddings = get_embeddings_by_ids(vector_store, ids)
+    if not found_ids:
+        return []
+    
+    query_vector = np.asarray(embedding, dtype=np.float32)
+    distances = np.square(embeddings - query_vector).sum(axis=1)
+    if k < len(found_ids):
+        top = np.argpartition(distances, k)[:k]
+    else:
+        top = np.arange(len(found_ids))
+    top = top[np.argsort(distances[top])]
+    
+    ranked_ids = [found_ids[i] for i in top]
+    documents = get_documents_by_ids(vector_store, ranked_ids)
+    return [
+        (found_ids[i], documents[found_ids[i]], float(distances[i]))
+        for i in top
+        if found_ids[i] in documents
+    ]
+
+
+def filtered_search_by_vector(
+    vector_store: VectorStore,
+    embedding: List[float],
+    where: Dict,
+    k: int = 4,
+    persist_directory: Optional[Union[str, Path]] = None,
+    nprobe: Optional[int] = None,
+) -> List[Tuple[str, Document, float]]:
+    """
+    Search the chunks whose document metadata matches a where filter
+    
+    The filter is resolved against the metadata index first. Small candidate
+    sets (up to FILTER_EXACT_MAX_CANDIDATES chunks) are ranked exactly, so the
+    cost shrinks with the selectivity of the filter; larger ones are searched
+    by the vector store restricted to the IDs of the matching documents (and,
+    in a sharded store, to the shards the filter's dates fall in).
+    Filters on chunk fields (sections) cannot be expressed by document, so their
+    candidates are always ranked exactly.
+    
+    Args:
+        vector_store: Vector store to search
+        embedding: Query embedding
+        where: Metadata filter (see src.metadata_index.build_where_clause)
+        k: Number of results to return
+        persist_directory: Directory where the vector store is persisted
+        nprobe: IVF lists to search for large candidate sets (see
+            search_by_vector_with_ids)
+        
+    Returns:
+        List of (chunk_id, document, distance) tuples, nearest first
+    """
+    metadata_index = get_metadata_index(persist_directory)
+    chunk_ids = metadata_index.filter_chunk_ids(where)
+    if not chunk_ids:
+        return []
+    
+    if len(chunk_ids) <= FILTER_EXACT_MAX_CANDIDATES or has_chunk_conditions(where):
+        return search_by_vector_in_ids(vector_store, embedding, chunk_ids, k)
+    
+    doc_ids = metadata_index.filter_doc_ids(where)
+    shards = vector_store.select_shards(where) if isinstance(vector_store, ShardedVectorStore) else None
+    return search_by_vector_with_ids(
+        vector_store, embedding, k=k, where={"doc_id": {"$in": doc_ids}}, nprobe=nprobe, shards=shards
+    )
+
+
 def similarity_search(
     query: str,
     k: int = 4,
     persist_directory: Optional[Union[str, Path]] = None,
+    where: Optional[Dict] = None,
+    nprobe: Optional[int] = None,
 ) -> List[Document]:
     """
     Perform similarity search on the vector store
     
+    Example filter for meetings in March 2024 attended by Jane::
+    
+        {"date": {"$gte": "2024-03-01", "$lte": "2024-03-31"},
+         "participants": {"$contains": "Jane"}}
+    
     Args:
         query: Query string
         k: Number of results to return
         persist_directory: Directory where the vector store is persisted
+        where: Optional filter on date, year, month, day, topic, source,
+            filename, participants and sections
+        nprobe: IVF lists to search in the NumPy store, trading latency
+            for recall (defaults to ANN_NPROBE, 0 for exact search)
         
     Returns:
         List of similar documents
@@ -126,7 +1370,16 @@ def similarity_search(
     if not vector_store:
         return []
     
-    return vector_store.similarity_search(query, k=k)
+    # Chroma passes extra arguments on to its collection, so nprobe is only given to the NumPy store
+    search_kwargs = {"nprobe": nprobe} if isinstance(vector_store, (NumpyVectorStore, ShardedVectorStore)) else {}
+    if where is None:
+        documents = vector_store.similarity_search(query, k=k, **search_kwargs)
+    else:
+        embedding = vector_store.embeddings.embed_query(query)
+        results = filtered_search_by_vector(vector_store, embedding, where, k, persist_directory, nprobe)
+        documents = [document for _, document, _ in results]
+    
+    return join_document_metadata(documents, persist_directory)
 
 
 def delete_vector_store(
@@ -153,11 +1406,12 @@ def delete_vector_store(
         embedding_model = get_embedding_model()
         
         # Load and delete vector store
-        vector_store = Chroma(
-            persist_directory=str(persist_directory),
-            embedding_function=embedding_model,
-        )
+        vector_store = open_vector_store(persist_directory, embedding_model)
         vector_store.delete_collection()
+        delete_manifest(persist_directory)
+        delete_lexical_index(persist_directory)
+        delete_metadata_index(persist_directory)
+        delete_structured_index(persist_directory)
         return True
     except Exception as e:
         print(f"Error deleting vector store: {e}")
@@ -0,0 +1,410 @@
+# Watcher module for the RAG system
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from src.config import (
+    DOCUMENT_STORE_DIRECTORY,
+    WATCH_DEBOUNCE_SECONDS,
+    WATCH_MAX_DELAY_SECONDS,
+    WATCH_POLL_INTERVAL,
+    WATCH_POLLING,
+)
+from src.document_processor import SUPPORTED_EXTENSIONS
+
+
+# inotify event flags (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+def _walk_directories(directory: Path) -> Iterator[Path]:
+    # Paths are built like iter_document_paths builds them, so they match the manifest
+    for root, _, _ in os.walk(directory):
+        yield Path(root)
+
+
+def _is_document(path: Path) -> bool:
+    return path.name.endswith(SUPPORTED_EXTENSIONS)
+
+
+class InotifyWatcher:
+    """
+    Watch a directory tree for changed documents with Linux inotify
+
+    Waiting costs no CPU: the thread blocks until the kernel reports an
+    event. Files are reported when they are closed after writing, moved in
+    or out, or deleted, so a file being written is not reported until the
+    writer is done.
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        """
+        Start watching a directory and all its subdirectories
+
+        Args:
+            directory: Directory to watch
+
+        Raises:
+            OSError: If inotify is not available
+        """
+        self.directory = Path(directory)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1 failed: {os.strerror(errno)}")
+
+        # interrupt() writes to a pipe, so wait() can block without a timeout;
+        # the lock keeps close() from closing it under an interrupt() in another thread
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_write, False)
+        self._close_lock = threading.Lock()
+        self._paths: Dict[int, Path] = {}
+        for path in _walk_directories(self.directory):
+            self._add_watch(path)
+
+    def _add_watch(self, path: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            print(f"Error watching {path}: {os.strerror(errno)}")
+            return
+        self._paths[wd] = path
+
+    def _read_events(self) -> Iterator[Tuple[int, int, str]]:
+        while True:
+            try:
+                data = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                yield wd, mask, name
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Set[Path]]:
+        """
+        Wait for changes
+
+        Args:
+            timeout: Seconds to wait (None to wait until something changes or
+                the watcher is interrupted)
+
+        Returns:
+            Changed document paths (empty on timeout or interrupt), or None if
+            events were lost and the whole directory must be rescanned
+        """
+        readable, _, _ = select.select([self._fd, self._wake_read], [], [], timeout)
+        if self._fd not in readable:
+            return set()
+
+        changed: Set[Path] = set()
+        rescan = False
+        for wd, mask, name in self._read_events():
+            if mask & IN_Q_OVERFLOW:
+                rescan = True
+                continue
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+
+            parent = self._paths.get(wd)
+            if parent is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # A watched directory went away; its files are found missing by a rescan
+                rescan = rescan or parent == self.directory or bool(mask & IN_MOVE_SELF)
+                continue
+
+            path = parent / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may have been written before the watch was added
+                    for subdirectory in _walk_directories(path):
+                        self._add_watch(subdirectory)
+                        changed.update(
+                            entry for entry in subdirectory.iterdir() if entry.is_file() and _is_document(entry)
+                        )
+                elif mask & IN_MOVED_FROM:
+                    rescan = True
+            elif _is_document(path) and mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE):
+                changed.add(path)
+
+        return None if rescan else changed
+
+    def interrupt(self) -> None:
+        """
+        Wake up a pending wait() and make later calls return at once; safe to call from any thread
+        """
+        with self._close_lock:
+            if self._fd < 0:
+                return
+            try:
+                os.write(self._wake_write, b"\0")
+            except BlockingIOError:
+                # The pipe is full, so a wake-up is already pending
+                pass
+
+    def close(self) -> None:
+        """
+        Stop watching; call from the thread that waits, or when no thread is waiting
+        """
+        with self._close_lock:
+            if self._fd < 0:
+                return
+            for fd in (self._fd, self._wake_read, self._wake_write):
+                os.close(fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """
+    Watch a directory tree for changed documents by comparing file listings
+
+    Portable fallback for InotifyWatcher. Each scan stats every document, so
+    its cost grows with the directory; WATCH_POLL_INTERVAL trades latency
+    against idle CPU.
+    """
+
+    def __init__(self, directory: Union[str, Path], interval: Optional[float] = None):
+        """
+        Take the initial listing of a directory
+
+        Args:
+            directory: Directory to watch
+            interval: Seconds between scans (defaults to WATCH_POLL_INTERVAL)
+        """
+        self.directory = Path(directory)
+        self.interval = interval if interval is not None else WATCH_POLL_INTERVAL
+        self._interrupted = threading.Event()
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for root in _walk_directories(self.directory):
+            try:
+                entries = list(os.scandir(root))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.endswith(SUPPORTED_EXTENSIONS) and entry.is_file():
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    snapshot[root / entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Set[Path]]:
+        """
+        Wait for changes
+
+        Args:
+            timeout: Seconds to wait (None to wait until something changes or
+                the watcher is interrupted)
+
+        Returns:
+            Changed document paths (empty on timeout or interrupt)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval if deadline is None else min(self.interval, max(deadline - time.monotonic(), 0.0))
+            if self._interrupted.wait(delay):
+                return set()
+
+            snapshot = self._scan()
+            changed = {
+                path for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def interrupt(self) -> None:
+        """
+        Wake up a pending wait() and make later calls return at once
+        """
+        self._interrupted.set()
+
+    def close(self) -> None:
+        """
+        Stop watching
+        """
+        self._interrupted.set()
+
+
+def create_watcher(directory: Union[str, Path], polling: Optional[bool] = None):
+    """
+    Create the best available watcher for a directory
+
+    Args:
+        directory: Directory to watch
+        polling: Force polling (defaults to WATCH_POLLING); inotify is used
+            on Linux otherwise
+
+    Returns:
+        InotifyWatcher or PollingWatcher
+    """
+    if polling is None:
+        polling = WATCH_POLLING
+
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            print(f"Error starting inotify, falling back to polling: {e}")
+
+    return PollingWatcher(directory)
+
+
+class DocumentIndexer:
+    """
+    Long-running indexer that keeps the index in sync with a document directory
+
+    The whole directory is synchronized once at start, to catch changes made
+    while nothing was watching. After that, each burst of changes is
+    debounced and only the changed files are synchronized.
+    """
+
+    def __init__(
+        self,
+        sync: Callable[[Optional[List[Path]]], Dict[str, int]],
+        directory: Optional[Union[str, Path]] = None,
+        debounce: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        polling: Optional[bool] = None,
+        on_sync: Optional[Callable[[Dict[str, int], float], None]] = None,
+    ):
+        """
+        Initialize the indexer
+
+        Args:
+            sync: Synchronizes the given files, or the whole directory when
+                called with None (e.g. a wrapper of sync_vector_store(paths=...));
+                returns file counts per outcome
+            directory: Directory to watch (defaults to DOCUMENT_STORE_DIRECTORY)
+            debounce: Seconds without changes before a burst is indexed
+                (defaults to WATCH_DEBOUNCE_SECONDS)
+            max_delay: Longest wait after the first change of a burst
+                (defaults to WATCH_MAX_DELAY_SECONDS)
+            polling: Force polling instead of inotify (defaults to WATCH_POLLING)
+            on_sync: Called with (stats, seconds) after each synchronization
+        """
+        self.sync = sync
+        self.directory = Path(directory) if directory is not None else DOCUMENT_STORE_DIRECTORY
+        self.debounce = debounce if debounce is not None else WATCH_DEBOUNCE_SECONDS
+        self.max_delay = max_delay if max_delay is not None else WATCH_MAX_DELAY_SECONDS
+        self.polling = polling
+        self.on_sync = on_sync
+        self._watcher = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sync(self, paths: Optional[Set[Path]]) -> None:
+        start = time.perf_counter()
+        try:
+            stats = self.sync(sorted(paths) if paths is not None else None)
+        except Exception as e:
+            print(f"Error indexing changed documents: {e}")
+            return
+        if self.on_sync is not None:
+            self.on_sync(stats, time.perf_counter() - start)
+
+    def _collect_burst(self, changed: Optional[Set[Path]]) -> Optional[Set[Path]]:
+        """
+        Keep collecting changes until the directory has been quiet for the debounce time
+
+        Args:
+            changed: First changes of the burst (None for a rescan)
+
+        Returns:
+            All changed paths of the burst, or None if a rescan is needed
+        """
+        first = time.monotonic()
+        last = first
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            remaining = min(last + self.debounce, first + self.max_delay) - now
+            if remaining <= 0:
+                break
+            more = self._watcher.wait(remaining)
+            if more is None:
+                changed = None
+                last = time.monotonic()
+            elif more:
+                if changed is not None:
+                    changed |= more
+                last = time.monotonic()
+        return changed
+
+    def run(self) -> None:
+        """
+        Index changes until stop() is called
+        """
+        # Start watching before the initial sync, so changes made during it are not missed
+        self._watcher = create_watcher(self.directory, self.polling)
+        try:
+            self._sync(None)
+            while not self._stopped.is_set():
+                changed = self._watcher.wait()
+                if self._stopped.is_set():
+                    break
+                if changed is not None and not changed:
+                    continue
+                self._sync(self._collect_burst(changed))
+        finally:
+            self._watcher.close()
+
+    def start(self) -> "DocumentIndexer":
+        """
+        Run the indexer in a daemon thread
+
+        Returns:
+            The indexer
+        """
+        self._thread = threading.Thread(target=self.run, name="document-indexer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the indexer, waiting for a running synchronization to finish
+
+        Args:
+            timeout: Seconds to wait for the indexer thread
+        """
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.interrupt()
+        if self._thread is not None:
+            self._thread.join(timeout)
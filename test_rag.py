@@ -7,9 +7,8 @@ import sys
 from pathlib import Path
 
 from src.config import validate_config
-from src.document_processor import process_documents
-from src.vector_store import create_or_update_vector_store, get_vector_store
-from src.llm import generate_response, format_source_documents
+from src.llm import format_source_documents
+from src.rag_service import get_rag_service
 
 def main():
     """
@@ -21,18 +20,16 @@ def main():
         print(f"Error: {error}")
         sys.exit(1)
     
-    # Process documents
-    print("Processing documents...")
-    documents = process_documents()
-    print(f"Processed {len(documents)} document chunks")
+    service = get_rag_service()
     
-    # Create or update vector store
-    print("Creating vector store...")
-    vector_store = create_or_update_vector_store(documents)
-    print(f"Vector store created with {len(documents)} documents")
-    
-    # Create retriever
-    retriever = vector_store.as_retriever(search_kwargs={"k": 4})
+    # Incrementally index documents (only new or changed files are embedded)
+    print("Indexing documents...")
+    stats = service.index_documents()
+    print(
+        f"Indexed {stats['added']} new and {stats['updated']} changed files "
+        f"({stats['chunks']} chunks), removed {stats['deleted']}, "
+        f"skipped {stats['unchanged']} unchanged"
+    )
     
     # Test query
     query = "What technology stack was chosen for the project?"
@@ -40,7 +37,7 @@ def main():
     
     # Generate response
     print("Generating response...")
-    response, source_docs = generate_response(query, retriever)
+    response, source_docs = service.query(query)
     
     # Print response
     print("\nResponse:")
@@ -48,7 +45,7 @@ def main():
     
     # Print sources
     print("\nSources:")
-    print(format_source_documents(source_docs))
+    print(format_source_documents(source_docs, service.get_index_directory()))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
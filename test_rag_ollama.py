@@ -3,23 +3,25 @@
 Simple script to test the RAG system with Ollama.
 """
 
-import os
 import sys
 from pathlib import Path
 
-from src.config import validate_config
-from src.vector_store import get_vector_store
-from src.llm import generate_response, format_source_documents
+from src.config import BACKEND_OLLAMA, validate_config
+from src.llm import (
+    STREAM_DONE,
+    STREAM_SOURCES,
+    STREAM_TOKEN,
+    format_source_documents,
+    format_stream_metrics,
+)
+from src.rag_service import RagService
 
 def main():
     """
     Main function to test the RAG system with Ollama.
     """
-    # Set environment variable to use local models
-    os.environ["USE_LOCAL_MODELS"] = "true"
-    
-    # Validate configuration
-    is_valid, error = validate_config()
+    # Validate configuration for the Ollama backend
+    is_valid, error = validate_config(BACKEND_OLLAMA)
     if not is_valid:
         print(f"Error: {error}")
         print("Note: Make sure Ollama is installed and running.")
@@ -29,30 +31,34 @@ def main():
         print("  ollama pull llama3")
         sys.exit(1)
     
-    # Get vector store
-    vector_store = get_vector_store()
-    if not vector_store:
+    # Select the Ollama backend at runtime
+    service = RagService(auto_index=False)
+    try:
+        service.get_backend(BACKEND_OLLAMA)
+    except ValueError as e:
+        print(f"Error: {e}")
         print("Vector store not found. Please run test_rag.py first.")
         sys.exit(1)
     
-    # Create retriever
-    retriever = vector_store.as_retriever(search_kwargs={"k": 4})
-    
     # Test query
     query = "What technology stack was chosen for the project?"
     print(f"\nQuery: {query}")
     
-    # Generate response
+    # Stream the response, printing tokens as Ollama generates them
     print("Generating response using Ollama...")
-    response, source_docs = generate_response(query, retriever)
-    
-    # Print response
     print("\nResponse:")
-    print(response)
+    source_docs = []
+    for event, payload in service.stream_query(query, BACKEND_OLLAMA):
+        if event == STREAM_SOURCES:
+            source_docs = payload
+        elif event == STREAM_TOKEN:
+            print(payload, end="", flush=True)
+        elif event == STREAM_DONE:
+            print(f"\n\n{format_stream_metrics(payload)}")
     
     # Print sources
     print("\nSources:")
-    print(format_source_documents(source_docs))
+    print(format_source_documents(source_docs, service.get_index_directory(BACKEND_OLLAMA)))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
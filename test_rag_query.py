@@ -7,8 +7,8 @@ import sys
 from pathlib import Path
 
 from src.config import validate_config
-from src.vector_store import get_vector_store
-from src.llm import generate_response, format_source_documents
+from src.llm import format_source_documents
+from src.rag_service import RagService
 
 def main():
     """
@@ -20,15 +20,15 @@ def main():
         print(f"Error: {error}")
         sys.exit(1)
     
-    # Get vector store
-    vector_store = get_vector_store()
-    if not vector_store:
+    # Build the service once; every query below reuses its vector store and chain
+    service = RagService(auto_index=False)
+    try:
+        service.get_backend()
+    except ValueError as e:
+        print(f"Error: {e}")
         print("Vector store not found. Please run test_rag.py first.")
         sys.exit(1)
     
-    # Create retriever
-    retriever = vector_store.as_retriever(search_kwargs={"k": 4})
-    
     # Test queries
     queries = [
         "What are the action items for Jane?",
@@ -44,7 +44,7 @@ def main():
         
         # Generate response
         print("Generating response...")
-        response, source_docs = generate_response(query, retriever)
+        response, source_docs = service.query(query)
         
         # Print response
         print("\nResponse:")
@@ -52,7 +52,7 @@ def main():
         
         # Print sources
         print("\nSources:")
-        print(format_source_documents(source_docs))
+        print(format_source_documents(source_docs, service.get_index_directory()))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,82 +3,62 @@
 Simple script to run a web interface for the RAG system.
 """
 
-import os
 import sys
 from pathlib import Path
 
 import gradio as gr
 
-from src.config import validate_config
-from src.document_processor import process_documents
-from src.vector_store import create_or_update_vector_store, get_vector_store
-from src.llm import generate_response, format_source_documents
+from src.llm import (
+    STREAM_DONE,
+    STREAM_SOURCES,
+    STREAM_TOKEN,
+    format_source_documents,
+    format_stream_metrics,
+)
+from src.rag_service import backend_from_flag, get_rag_service
 
-def initialize_system():
+async def query_rag(query, use_local_models=False):
     """
-    Initialize the RAG system.
-    """
-    # Validate configuration
-    is_valid, error = validate_config()
-    if not is_valid:
-        return False, error
-    
-    # Get vector store
-    vector_store = get_vector_store()
-    
-    # If vector store doesn't exist, create it
-    if not vector_store:
-        print("Vector store not found. Creating new vector store...")
-        
-        # Process documents
-        print("Processing documents...")
-        documents = process_documents()
-        print(f"Processed {len(documents)} document chunks")
-        
-        if not documents:
-            return False, "No documents found to process."
-        
-        # Create vector store
-        print("Creating vector store...")
-        vector_store = create_or_update_vector_store(documents)
-        print(f"Vector store created with {len(documents)} documents")
+    Query the RAG system, streaming the answer as it is generated.
     
-    return True, vector_store
-
-def query_rag(query, use_local_models=False):
-    """
-    Query the RAG system.
+    The vector store, embedding client and chain of each backend are built
+    once per process by the shared RagService; the checkbox only selects
+    which backend answers. Sources are shown as soon as retrieval is done,
+    then the answer grows token by token. The handler is async, so several
+    users are served concurrently up to the backend's concurrency limit.
     
     Args:
         query: Query string
         use_local_models: Whether to use local models
         
-    Returns:
-        Response and sources
+    Yields:
+        Response so far, sources and latency
     """
-    # Set environment variable for model selection
-    os.environ["USE_LOCAL_MODELS"] = str(use_local_models).lower()
+    backend = backend_from_flag(use_local_models)
     
-    # Initialize system
-    success, result = initialize_system()
-    if not success:
-        return f"Error: {result}", ""
-    
-    vector_store = result
-    
-    # Create retriever
-    retriever = vector_store.as_retriever(search_kwargs={"k": 4})
+    # Get (or build on first use) the backend resources
+    try:
+        service = get_rag_service()
+        await service.aget_backend(backend)
+    except ValueError as e:
+        yield f"Error: {e}", "", ""
+        return
     
+    response = ""
+    sources = ""
     try:
-        # Generate response
-        response, source_docs = generate_response(query, retriever)
-        
-        # Format sources
-        sources = format_source_documents(source_docs)
-        
-        return response, sources
+        # Stream the response
+        async for event, payload in service.astream_query(query, backend):
+            if event == STREAM_SOURCES:
+                sources = format_source_documents(payload, service.get_index_directory(backend))
+            elif event == STREAM_TOKEN:
+                response += payload
+            elif event == STREAM_DONE:
+                yield response, sources, format_stream_metrics(payload)
+                continue
+            yield response, sources, ""
     except Exception as e:
-        return f"Error generating response: {str(e)}", ""
+        yield f"Error generating response: {str(e)}", sources, ""
 
 def create_web_interface():
     """
@@ -112,11 +92,18 @@ def create_web_interface():
                     lines=5,
                     interactive=False,
                 )
+                latency_output = gr.Textbox(
+                    label="Latency",
+                    lines=1,
+                    interactive=False,
+                )
         
         submit_button.click(
             fn=query_rag,
             inputs=[query_input, use_local_models],
-            outputs=[response_output, sources_output],
+            outputs=[response_output, sources_output, latency_output],
+            # Concurrency is bounded per backend by RagService instead
+            concurrency_limit=None,
         )
         
         gr.Examples(
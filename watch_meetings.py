@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Script to keep the index in sync with the meeting summaries directory.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from src.config import BACKEND_OLLAMA, BACKEND_OPENAI, DEFAULT_BACKEND, DOCUMENT_STORE_DIRECTORY, validate_config
+from src.rag_service import RagService
+
+
+def print_stats(stats: dict, seconds: float) -> None:
+    """
+    Print the outcome of a synchronization
+
+    Args:
+        stats: File counts per outcome
+        seconds: Duration of the synchronization
+    """
+    if not (stats["added"] or stats["updated"] or stats["deleted"]):
+        return
+    print(
+        f"[{time.strftime('%H:%M:%S')}] Indexed {stats['added']} new and {stats['updated']} changed files "
+        f"({stats['chunks']} chunks), removed {stats['deleted']} in {seconds:.2f}s",
+        flush=True,
+    )
+
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Index new and changed meeting summaries as they are written")
+    parser.add_argument(
+        "--directory",
+        "-d",
+        type=str,
+        default=str(DOCUMENT_STORE_DIRECTORY),
+        help=f"Directory to watch (default: {DOCUMENT_STORE_DIRECTORY})",
+    )
+    parser.add_argument(
+        "--backend",
+        "-b",
+        type=str,
+        choices=(BACKEND_OPENAI, BACKEND_OLLAMA),
+        default=DEFAULT_BACKEND,
+        help=f"Backend whose embedding model indexes the documents (default: {DEFAULT_BACKEND})",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Scan the directory periodically instead of using inotify",
+    )
+    args = parser.parse_args()
+
+    # Validate configuration
+    is_valid, error = validate_config(args.backend)
+    if not is_valid:
+        print(f"Error: {error}")
+        sys.exit(1)
+
+    service = RagService(auto_index=False)
+    indexer = service.watch_documents(
+        Path(args.directory).absolute(),
+        backend=args.backend,
+        on_sync=print_stats,
+        polling=True if args.poll else None,
+    )
+    print(f"Watching {args.directory} for changes (Ctrl+C to stop)", flush=True)
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("Stopping...")
+        indexer.stop()